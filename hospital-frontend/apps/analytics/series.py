@@ -0,0 +1,156 @@
+"""
+Chart series pipeline for the analytics dashboards
+
+analytics-service returns trends as one dict per day
+(``[{'trend_date': ..., 'appointments_count': ..., 'daily_revenue': ...}]``).
+Feeding those straight into Chart.js means payload size and drawing time
+grow with the history.  ``build_series`` instead
+
+1. resamples the rows into the visible bucket size (day, week or month),
+2. downsamples with Largest-Triangle-Three-Buckets when more buckets than the
+   point budget remain, and
+3. returns compact columnar JSON: one ``timestamps`` array and one values
+   array per series.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Buckets are labelled by their first day (weeks start on Monday)
+BUCKETS = {
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS',
+}
+
+#: Points a chart is given at most, whatever the history length
+DEFAULT_POINT_BUDGET = 120
+MAX_POINT_BUDGET = 1000
+
+# Trend lists embedded in dashboard payloads: endpoint -> (list key, time key, value keys)
+TREND_SERIES = {
+    'admin_dashboard': ('daily_trends', 'trend_date', ('appointments_count', 'daily_revenue')),
+    'doctor_dashboard': ('recent_trends', 'appointment_date', ('daily_count',)),
+}
+
+
+def choose_bucket(span_days):
+    """Pick the bucket that keeps a span readable when none was requested"""
+    if span_days <= 92:
+        return 'day'
+    if span_days <= 731:
+        return 'week'
+    return 'month'
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    ``x`` must be increasing.  The first and last points are always kept; in
+    between, each bucket keeps the point forming the largest triangle with
+    the previously kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    every = (n - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        indices[i + 1] = previous
+    return indices
+
+
+def build_series(rows, time_key, value_keys, bucket=None, max_points=DEFAULT_POINT_BUDGET):
+    """
+    Turn a list of trend dicts into a columnar, bounded-size series
+
+    ``value_keys`` are summed per bucket; the first one drives LTTB and the
+    others follow the same selected timestamps so the lines stay aligned.
+    """
+    value_keys = tuple(value_keys)
+    empty = {'timestamps': [], 'values': {key: [] for key in value_keys}, 'bucket': bucket or 'day', 'sourcePoints': 0}
+    if not rows:
+        return empty
+
+    frame = pd.DataFrame.from_records(
+        [[row.get(time_key)] + [row.get(key) for key in value_keys] for row in rows if isinstance(row, dict)],
+        columns=('time',) + value_keys,
+    )
+    # Dates are local wall-clock values; the date prefix is the calendar day
+    frame['time'] = pd.to_datetime(frame['time'].astype(str).str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+    frame = frame.dropna(subset=['time'])
+    if frame.empty:
+        return empty
+    for key in value_keys:
+        frame[key] = pd.to_numeric(frame[key], errors='coerce').fillna(0)
+
+    span_days = (frame['time'].max() - frame['time'].min()).days
+    if bucket not in BUCKETS:
+        bucket = choose_bucket(span_days)
+    resampled = frame.set_index('time').sort_index().resample(BUCKETS[bucket], label='left', closed='left').sum()
+
+    times = resampled.index
+    columns = {key: resampled[key].to_numpy(dtype='float64') for key in value_keys}
+    max_points = max(3, min(int(max_points or DEFAULT_POINT_BUDGET), MAX_POINT_BUDGET))
+    if len(times) > max_points:
+        x = times.asi8.astype('float64')
+        keep = lttb(x, columns[value_keys[0]], max_points)
+        times = times[keep]
+        columns = {key: values[keep] for key, values in columns.items()}
+
+    return {
+        'timestamps': times.strftime('%Y-%m-%d').tolist(),
+        'values': {key: _compact(values) for key, values in columns.items()},
+        'bucket': bucket,
+        'sourcePoints': len(frame),
+    }
+
+
+def _compact(values):
+    # Whole numbers are sent as ints so counts do not serialise as 12.0
+    if np.all(np.mod(values, 1) == 0):
+        return values.astype(np.int64).tolist()
+    return np.round(values, 2).tolist()
+
+
+def series_for(endpoint, payload, bucket=None, max_points=DEFAULT_POINT_BUDGET):
+    """Build the chart series for a dashboard response, or ``None`` if it has no trends"""
+    spec = TREND_SERIES.get(endpoint)
+    if spec is None or not isinstance(payload, dict):
+        return None
+    list_key, time_key, value_keys = spec
+    dashboard = (payload.get('data') or {}).get('dashboard') or {}
+    return build_series(dashboard.get(list_key) or [], time_key, value_keys, bucket, max_points)
+
+
+def with_series(endpoint, payload, bucket=None, max_points=DEFAULT_POINT_BUDGET):
+    """
+    Copy of a dashboard response with the raw trend list replaced by ``series``
+
+    Used by the JSON API so polling clients receive bounded payloads.
+    """
+    spec = TREND_SERIES.get(endpoint)
+    if spec is None or not isinstance(payload, dict) or not payload.get('success'):
+        return payload
+    series = series_for(endpoint, payload, bucket, max_points)
+    data = dict(payload.get('data') or {})
+    dashboard = dict(data.get('dashboard') or {})
+    dashboard.pop(spec[0], None)
+    data['dashboard'] = dashboard
+    return dict(payload, data=data, series=series)
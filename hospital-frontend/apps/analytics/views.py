@@ -2,14 +2,69 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseNotModified
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.api_client import APIClient
 from utils.decorators import login_required, role_required
+from utils.gateway_proxy import json_response
+from utils.swr_cache import StaleWhileRevalidateCache, etag_matches
+
+from .series import DEFAULT_POINT_BUDGET, series_for, with_series
 
 logger = logging.getLogger(__name__)
 
+analytics_cache = StaleWhileRevalidateCache(
+    'analytics',
+    fresh_for=getattr(settings, 'ANALYTICS_CACHE_FRESH', 60),
+    max_age=getattr(settings, 'ANALYTICS_CACHE_MAX_AGE', 3600),
+)
+
+# endpoint name -> (APIClient method, needs doctor_id)
+ANALYTICS_ENDPOINTS = {
+    'doctor_dashboard': ('get_doctor_dashboard', True),
+    'admin_dashboard': ('get_admin_dashboard', False),
+    'doctor_patients': ('get_doctor_patients_analytics', True),
+    'appointment_trends': ('get_doctor_appointment_trends', True),
+}
+
+
+def get_cached_analytics(token, endpoint, doctor_id=None):
+    """Fetch an analytics endpoint through the stale-while-revalidate cache"""
+    method_name, needs_doctor = ANALYTICS_ENDPOINTS[endpoint]
+
+    def load():
+        api_client = APIClient(token=token)
+        method = getattr(api_client, method_name)
+        if needs_doctor:
+            return method(token=token, doctor_id=doctor_id)
+        return method(token=token)
+
+    key = analytics_cache.make_key(endpoint, doctor_id if needs_doctor else None)
+    return analytics_cache.get(key, load)
+
+
+def check_analytics_access(endpoint, doctor_id, user_role, user_id):
+    """Return an error message if the session may not read ``endpoint``, else ``None``"""
+    spec = ANALYTICS_ENDPOINTS.get(endpoint)
+    if spec is None or (spec[1] and not doctor_id) or (endpoint == 'admin_dashboard' and user_role != 'admin'):
+        return 'Invalid endpoint or missing parameters'
+    if spec[1] and user_role == 'doctor' and user_id != doctor_id:
+        return 'Access denied'
+    return None
+
+
+def series_options(request):
+    """``(bucket, max_points)`` requested for chart series (``?bucket=week&points=200``)"""
+    try:
+        max_points = int(request.GET.get('points', DEFAULT_POINT_BUDGET))
+    except (TypeError, ValueError):
+        max_points = DEFAULT_POINT_BUDGET
+    return request.GET.get('bucket'), max_points
+
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff']), name='dispatch')
 class AnalyticsDashboardView(View):
@@ -33,8 +88,6 @@ class DoctorAnalyticsView(View):
                 messages.error(request, 'Please login to access analytics.')
                 return redirect('auth:login')
 
-            api_client = APIClient(token=token)
-
             # If no doctor_id provided and user is doctor, use their own ID
             if not doctor_id and user_role == 'doctor':
                 doctor_id = user_id
@@ -43,7 +96,8 @@ class DoctorAnalyticsView(View):
                 return redirect('dashboard:index')
 
             # Get all doctor analytics data from the single, refactored endpoint
-            response = api_client.get_doctor_dashboard(token=token, doctor_id=doctor_id)
+            result = get_cached_analytics(token, 'doctor_dashboard', doctor_id)
+            response = result.data or {}
 
             if not response.get('success'):
                 messages.error(request, 'Failed to load analytics data for the doctor.')
@@ -65,7 +119,9 @@ class DoctorAnalyticsView(View):
                 'doctor_id': doctor_id,
                 'dashboard': dashboard_data,
                 'user_role': user_role,
-                'is_own_dashboard': user_role == 'doctor' and user_id == doctor_id
+                'is_own_dashboard': user_role == 'doctor' and user_id == doctor_id,
+                'data_as_of': result.as_of,
+                'trend_series': series_for('doctor_dashboard', response, *series_options(request)),
             }
 
             return render(request, 'analytics/doctor_dashboard.html', context)
@@ -89,10 +145,9 @@ class AdminAnalyticsView(View):
                 messages.error(request, 'Please login to access analytics.')
                 return redirect('auth:login')
 
-            api_client = APIClient(token=token)
-
             # Get all admin analytics data from the single, refactored endpoint
-            response = api_client.get_admin_dashboard(token=token)
+            result = get_cached_analytics(token, 'admin_dashboard')
+            response = result.data or {}
 
             if not response.get('success'):
                 messages.error(request, 'Failed to load analytics data from the API.')
@@ -113,7 +168,9 @@ class AdminAnalyticsView(View):
 
             context = {
                 'dashboard': dashboard_data,
-                'user_role': request.session.get('user_role')
+                'user_role': request.session.get('user_role'),
+                'data_as_of': result.as_of,
+                'trend_series': series_for('admin_dashboard', response, *series_options(request)),
             }
 
             return render(request, 'analytics/admin_dashboard.html', context)
@@ -138,39 +195,95 @@ class AnalyticsAPIView(View):
             if not token:
                 return JsonResponse({'success': False, 'message': 'Authentication required'})
 
-            api_client = APIClient(token=token)
-            endpoint = request.GET.get('endpoint')
             doctor_id = request.GET.get('doctor_id')
+            if request.GET.get('endpoints'):
+                return self.get_batch(request, token, doctor_id, user_role, user_id)
 
-            if endpoint == 'doctor_dashboard' and doctor_id:
-                # Check permissions
-                if user_role == 'doctor' and user_id != doctor_id:
-                    return JsonResponse({'success': False, 'message': 'Access denied'})
-
-                response = api_client.get_doctor_dashboard(token=token, doctor_id=doctor_id)
-                return JsonResponse(response)
-
-            elif endpoint == 'admin_dashboard' and user_role == 'admin':
-                response = api_client.get_admin_dashboard(token=token)
-                return JsonResponse(response)
-
-            elif endpoint == 'doctor_patients' and doctor_id:
-                if user_role == 'doctor' and user_id != doctor_id:
-                    return JsonResponse({'success': False, 'message': 'Access denied'})
-
-                response = api_client.get_doctor_patients_analytics(token=token, doctor_id=doctor_id)
-                return JsonResponse(response)
-
-            elif endpoint == 'appointment_trends' and doctor_id:
-                if user_role == 'doctor' and user_id != doctor_id:
-                    return JsonResponse({'success': False, 'message': 'Access denied'})
-
-                response = api_client.get_doctor_appointment_trends(token=token, doctor_id=doctor_id)
-                return JsonResponse(response)
-
+            endpoint = request.GET.get('endpoint')
+            error = check_analytics_access(endpoint, doctor_id, user_role, user_id)
+            if error:
+                return JsonResponse({'success': False, 'message': error})
+
+            result = get_cached_analytics(token, endpoint, doctor_id)
+            etag = self.variant_etag(request, result.etag)
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
             else:
-                return JsonResponse({'success': False, 'message': 'Invalid endpoint or missing parameters'})
+                data = result.data or {}
+                if request.GET.get('series'):
+                    data = with_series(endpoint, data, *series_options(request))
+                response = json_response(dict(data, asOf=result.as_of.isoformat()))
+            return self.add_cache_headers(response, etag, result.age)
 
         except Exception as e:
             logger.error(f"Error in analytics API: {str(e)}")
             return JsonResponse({'success': False, 'message': 'Failed to fetch analytics data'})
+
+    def get_batch(self, request, token, doctor_id, user_role, user_id):
+        """
+        Serve ``?endpoints=a,b,c`` as one document
+
+        Permissions are checked once up front, then the upstream calls run
+        concurrently and are combined as ``{'results': {endpoint: response}}``.
+        """
+        endpoints = list(dict.fromkeys(name.strip() for name in request.GET['endpoints'].split(',') if name.strip()))
+        if not endpoints:
+            return JsonResponse({'success': False, 'message': 'Invalid endpoint or missing parameters'})
+        for endpoint in endpoints:
+            error = check_analytics_access(endpoint, doctor_id, user_role, user_id)
+            if error:
+                return JsonResponse({'success': False, 'message': f"{endpoint}: {error}"})
+
+        with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+            futures = {
+                endpoint: executor.submit(get_cached_analytics, token, endpoint, doctor_id)
+                for endpoint in endpoints
+            }
+        results = {}
+        for endpoint, future in futures.items():
+            try:
+                results[endpoint] = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching analytics endpoint {endpoint}: {str(e)}")
+                results[endpoint] = None
+
+        etags = [result.etag if result else None for result in results.values()]
+        etag = None
+        if all(etags):
+            etag = self.variant_etag(request, f'"{hashlib.sha1(",".join(etags).encode()).hexdigest()}"')
+        oldest = min((result for result in results.values() if result), key=lambda r: r.fetched_at, default=None)
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            documents = {}
+            for endpoint, result in results.items():
+                if result is None:
+                    documents[endpoint] = {'success': False, 'message': 'Failed to fetch analytics data'}
+                elif request.GET.get('series'):
+                    documents[endpoint] = with_series(endpoint, result.data, *series_options(request))
+                else:
+                    documents[endpoint] = result.data
+            response = json_response({
+                'success': all(result and (result.data or {}).get('success') for result in results.values()),
+                'results': documents,
+                'asOf': oldest.as_of.isoformat() if oldest else None,
+            })
+        return self.add_cache_headers(response, etag, oldest.age if oldest else 0)
+
+    @staticmethod
+    def variant_etag(request, etag):
+        """Distinguish series renderings of the same upstream data by their options"""
+        if not etag or not request.GET.get('series'):
+            return etag
+        bucket, max_points = series_options(request)
+        return f'{etag[:-1]}-{bucket or "auto"}-{max_points}"'
+
+    @staticmethod
+    def add_cache_headers(response, etag, age):
+        if etag:
+            response['ETag'] = etag
+            response['Age'] = str(int(age))
+            # Browsers must revalidate, which the ETag turns into a cheap 304
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,199 @@
+"""
+iCalendar (.ics) feeds of a doctor's or patient's appointments
+
+Calendar apps cannot log in, so each feed URL carries a signed token naming
+the user and role it belongs to (``feed_token``); the appointment service is
+then read without a session.  Rotating ``SECRET_KEY`` revokes every feed URL.
+
+A feed covers a rolling window around today, ``ICAL_FEED_PAST_DAYS`` back and
+``ICAL_FEED_FUTURE_DAYS`` ahead.  Appointment pages are encoded into
+calendar lines as they arrive, and the finished body is cached per user with
+an ETag (a hash of the body) and Last-Modified (the newest ``updated_at``), so
+clients polling every few minutes get ``304 Not Modified`` from the cache.
+After the cache expires the feed is rebuilt, but an unchanged body keeps its
+ETag and clients still get a 304.
+"""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from utils import dates
+from utils.export import field, iter_pages
+
+logger = logging.getLogger(__name__)
+
+FEED_SALT = 'appointments.ical-feed'
+FEED_ROLES = ('doctor', 'patient')
+
+APPOINTMENTS_URL = 'http://localhost:3003/api/appointments'
+
+#: Maximum octets per content line before folding (RFC 5545, 3.1)
+LINE_LIMIT = 75
+
+STATUS_MAP = {
+    'cancelled': 'CANCELLED',
+    'no_show': 'CANCELLED',
+    'confirmed': 'CONFIRMED',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+}
+
+
+def feed_token(user_id, role):
+    """Opaque token for the feed of ``user_id`` seen as ``role``"""
+    return signing.dumps([str(user_id), role], salt=FEED_SALT, compress=True)
+
+
+def read_feed_token(token):
+    """``(user_id, role)`` for a token; raises ``signing.BadSignature`` if forged"""
+    user_id, role = signing.loads(token, salt=FEED_SALT)
+    if role not in FEED_ROLES:
+        raise signing.BadSignature(f"Unsupported feed role {role!r}")
+    return user_id, role
+
+
+FEEDS_GENERATION_KEY = 'appointments:ical:generation'
+
+
+def feed_cache_key(user_id, role):
+    return f"appointments:ical:g{cache.get(FEEDS_GENERATION_KEY, 0)}:{role}:{user_id}"
+
+
+def forget_feeds():
+    """Rebuild every feed on its next request (when the affected users are unknown)"""
+    try:
+        cache.incr(FEEDS_GENERATION_KEY)
+    except ValueError:
+        cache.set(FEEDS_GENERATION_KEY, 1, None)
+
+
+def escape_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Fold a content line to 75-octet pieces without splitting UTF-8 sequences"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LIMIT:
+        return line + '\r\n'
+    parts = []
+    start = 0
+    limit = LINE_LIMIT
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Back off to a character boundary
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+        limit = LINE_LIMIT - 1  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def local_stamp(value):
+    """Floating local date-time; appointment times are wall-clock values"""
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def utc_stamp(value):
+    """UTC date-time; naive values are taken as server local time"""
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(row, role, now):
+    """Content lines for one appointment row, or nothing if it has no time"""
+    start = dates.parse_datetime(field('scheduledDate', 'scheduled_date')(row))
+    if start is None or not row.get('id'):
+        return []
+    end = start + timedelta(minutes=int(field('durationMinutes', 'duration_minutes')(row) or 30))
+    kind = (field('appointmentType', 'appointment_type')(row) or 'appointment').replace('_', ' ').title()
+    if role == 'doctor':
+        summary = f"{kind}: {field('patientName', 'patient_name')(row) or 'Patient'}"
+    else:
+        summary = f"{kind} with {field('doctorName', 'doctor_name')(row) or 'your doctor'}"
+    updated = dates.parse_datetime(field('updatedAt', 'updated_at', 'createdAt', 'created_at')(row), aware=True) or now
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{row['id']}@hospital-appointments",
+        f"DTSTAMP:{utc_stamp(updated)}",
+        f"DTSTART:{local_stamp(start)}",
+        f"DTEND:{local_stamp(end)}",
+        f"SUMMARY:{escape_text(summary)}",
+        f"STATUS:{STATUS_MAP.get((row.get('status') or '').lower(), 'TENTATIVE')}",
+    ]
+    number = field('appointmentNumber', 'appointment_number')(row)
+    details = [f"Appointment {number}" if number else '', row.get('reason') or '']
+    if any(details):
+        lines.append(f"DESCRIPTION:{escape_text(chr(10).join(part for part in details if part))}")
+    lines.append('END:VEVENT')
+    return lines
+
+
+def feed_params(user_id, role, today):
+    past = getattr(settings, 'ICAL_FEED_PAST_DAYS', 30)
+    future = getattr(settings, 'ICAL_FEED_FUTURE_DAYS', 180)
+    params = {
+        'dateFrom': f"{(today - timedelta(days=past)).isoformat()}T00:00:00",
+        'dateTo': f"{(today + timedelta(days=future)).isoformat()}T23:59:59",
+    }
+    params['doctorId' if role == 'doctor' else 'patientId'] = user_id
+    return params
+
+
+def build_feed(api_client, user_id, role, now=None):
+    """
+    ``{'body', 'etag', 'last_modified'}`` for a user's feed
+
+    ``now`` is a naive local time.  ``last_modified`` is a UTC timestamp
+    (seconds).  Raises ``PageError`` (a ``RuntimeError``) when any page cannot
+    be loaded, so an outage is not served, or cached, as an empty or partial
+    calendar.
+    """
+    now = now or datetime.now()
+    params = feed_params(user_id, role, now.date())
+
+    def fetch_page(page, limit):
+        return api_client.get_direct(APPOINTMENTS_URL, params=dict(params, page=page, limit=limit))
+
+    newest = None
+    chunks = [fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Hospital Management//Appointments//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f"X-WR-CALNAME:{'My patients' if role == 'doctor' else 'My appointments'}",
+        'X-PUBLISHED-TTL:PT15M',
+    )]
+    for row in iter_pages(fetch_page, 'appointments', page_size=100):
+        lines = event_lines(row, role, now)
+        chunks.extend(fold(line) for line in lines)
+        updated = dates.parse_datetime(field('updatedAt', 'updated_at', 'createdAt', 'created_at')(row), aware=True)
+        if lines and updated and (newest is None or updated > newest):
+            newest = updated
+    chunks.append(fold('END:VCALENDAR'))
+
+    body = ''.join(chunks).encode('utf-8')
+    modified = (newest or now).astimezone(timezone.utc)
+    return {
+        'body': body,
+        'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        'last_modified': int(modified.timestamp()),
+    }
+
+
+def cached_feed(api_client, user_id, role):
+    """The user's feed from the cache, rebuilt when it has expired"""
+    key = feed_cache_key(user_id, role)
+    feed = cache.get(key)
+    if feed is None:
+        feed = build_feed(api_client, user_id, role)
+        cache.set(key, feed, getattr(settings, 'ICAL_FEED_CACHE_TTL', 300))
+    return feed
@@ -0,0 +1,329 @@
+"""
+Bookable appointment slots for a doctor over a range of days
+
+Each day is described by two interval indexes over minutes since midnight:
+the doctor's working windows (``/api/doctor-availability``) and the time
+already taken by live appointments.  Candidate slots step through each window
+on a fixed grid and are kept when the busy index has nothing overlapping them,
+which is a binary search instead of a scan of the day's appointments.  Where
+the appointment service has generated explicit slots for a date
+(``/api/appointment-slots/available``) those are offered instead of the grid,
+and days with an open holiday or unavailability record
+(``/api/appointments/conflicts``) offer nothing.
+
+Day plans (windows, busy intervals, explicit slots) are cached per
+(doctor, day), so a week view refetches only the days that expired, with one
+availability call and one appointment list query covering all of them (plus
+the per-date explicit slot lookup for working days).  Slots are
+computed from the cached plans on every request because they depend on the
+requested duration and on the current time.  The same plans back
+``SlotFinder.check``, which validates a single requested time before booking.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+
+from utils import dates
+from utils.export import field, iter_pages
+
+logger = logging.getLogger(__name__)
+
+#: Spacing of generated slots inside an availability window
+SLOT_STEP_MINUTES = 30
+
+#: Default and allowed appointment durations, matching the booking form
+DEFAULT_DURATION = 30
+DURATIONS = (15, 30, 45, 60)
+
+#: Longest range a single request may ask for
+MAX_DAYS = 14
+
+DAY_PLAN_TTL = 60
+
+#: Appointments in these states do not block their time
+FREE_STATUSES = ('cancelled', 'no_show')
+
+#: Conflict records that close the whole day
+CLOSING_CONFLICTS = ('holiday', 'unavailable')
+
+AVAILABILITY_URL = 'http://localhost:3003/api/doctor-availability'
+APPOINTMENTS_URL = 'http://localhost:3003/api/appointments'
+SLOTS_URL = 'http://localhost:3003/api/appointment-slots/available/{doctor_id}/{day}'
+CONFLICTS_URL = 'http://localhost:3003/api/appointments/conflicts'
+
+
+class IntervalIndex:
+    """
+    Sorted, non-overlapping half-open ``[start, end)`` intervals
+
+    Overlapping and touching intervals are merged on construction, so both
+    bounds stay sorted and an overlap test is a single ``bisect``.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        """Whether any interval intersects ``[start, end)``"""
+        i = bisect_right(self.ends, start)
+        return start < end and i < len(self.starts) and self.starts[i] < end
+
+    def covers(self, start, end):
+        """Whether a single interval contains all of ``[start, end)``"""
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.ends[i] >= end
+
+    def to_list(self):
+        return [[start, end] for start, end in self]
+
+
+def minutes(value):
+    """Minutes since midnight for ``HH:MM[:SS]`` strings, or None"""
+    try:
+        hours, mins = str(value).split(':')[:2]
+        return int(hours) * 60 + int(mins)
+    except (TypeError, ValueError):
+        return None
+
+
+def clock(total):
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def day_plan_key(doctor_id, day):
+    return f"appointments:slots:{doctor_id}:{day.isoformat()}"
+
+
+def free_slots(plan, day, duration=DEFAULT_DURATION, not_before=None):
+    """
+    Bookable slots of ``duration`` minutes for one day plan
+
+    ``not_before`` is a naive datetime; earlier slots on that day are dropped.
+    """
+    if plan.get('closed'):
+        return []
+    busy = IntervalIndex(plan['busy'])
+    cutoff = 0
+    if not_before is not None:
+        if day < not_before.date():
+            return []
+        if day == not_before.date():
+            cutoff = not_before.hour * 60 + not_before.minute
+
+    if plan.get('slots'):
+        # Upstream slots carry their own length and capacity; only single-seat
+        # slots are blocked by appointments overlapping them
+        candidates = [
+            (start, start + length) for start, length, shared in plan['slots']
+            if start >= cutoff and (shared or not busy.overlaps(start, start + length))
+        ]
+    else:
+        candidates = []
+        for window_start, window_end in IntervalIndex(plan['windows'] or ()):
+            start = window_start
+            while start + duration <= window_end:
+                if start >= cutoff and not busy.overlaps(start, start + duration):
+                    candidates.append((start, start + duration))
+                start += SLOT_STEP_MINUTES
+
+    prefix = day.isoformat()
+    return [
+        {'start': clock(start), 'end': clock(end), 'value': f"{prefix}T{clock(start)}"}
+        for start, end in candidates
+    ]
+
+
+class SlotFinder:
+    """
+    Free slots for one doctor, backed by per-day cached plans
+
+    ``api_client`` is an ``APIClient``; only ``get_direct`` is used.
+    """
+
+    def __init__(self, api_client, doctor_id):
+        self.api_client = api_client
+        self.doctor_id = doctor_id
+
+    def find(self, start_day, days, duration=DEFAULT_DURATION, now=None):
+        """``[{'date': 'YYYY-MM-DD', 'slots': [...]}, ...]`` for ``days`` days from ``start_day``"""
+        span = [start_day + timedelta(days=offset) for offset in range(days)]
+        plans = self.day_plans(span)
+        now = now or datetime.now()
+        return [
+            {'date': day.isoformat(), 'slots': free_slots(plans[day], day, duration, not_before=now)}
+            for day in span
+        ]
+
+    def check(self, scheduled, duration=DEFAULT_DURATION, now=None):
+        """
+        Reasons a booking at ``scheduled`` (naive datetime) cannot be made
+
+        Returns a list of ``{'code', 'message'}`` dicts, empty when the time is
+        free.  Hours are not enforced when the doctor's availability could not
+        be loaded; the appointment service still has the final say.  Raises
+        ``PageError`` when the doctor's appointments could not be loaded, since
+        a double booking could not be ruled out.
+        """
+        now = now or datetime.now()
+        if scheduled <= now:
+            return [{'code': 'past', 'message': 'The selected time is in the past'}]
+
+        day = scheduled.date()
+        plan = self.day_plans([day])[day]
+        start = scheduled.hour * 60 + scheduled.minute
+        end = start + duration
+        if plan.get('closed'):
+            return [{'code': plan['closed'], 'message': f"The doctor is not available on this day ({plan['closed']})"}]
+
+        conflicts = []
+        slot = next((row for row in plan.get('slots') or () if row[0] == start), None)
+        if plan.get('slots'):
+            if slot is None:
+                conflicts.append({'code': 'no_slot', 'message': 'The selected time is not one of the open slots'})
+        elif plan['windows'] is not None and not IntervalIndex(plan['windows']).covers(start, end):
+            conflicts.append({'code': 'outside_hours', 'message': "The selected time is outside the doctor's working hours"})
+
+        # Shared upstream slots take several bookings at once
+        if not (slot and slot[2]) and IntervalIndex(plan['busy']).overlaps(start, end):
+            conflicts.append({'code': 'double_booking', 'message': 'The doctor already has an appointment at this time'})
+        return conflicts
+
+    def forget(self, day):
+        """Drop the cached plan for ``day`` after its schedule changed"""
+        cache.delete(day_plan_key(self.doctor_id, day))
+
+    def day_plans(self, span):
+        keys = {day: day_plan_key(self.doctor_id, day) for day in span}
+        cached = cache.get_many(list(keys.values()))
+        plans = {day: cached[key] for day, key in keys.items() if key in cached}
+        missing = [day for day in span if day not in plans]
+        if not missing:
+            return plans
+
+        windows = self._windows()
+        # Raises rather than planning the days as free, which would cache
+        # already-booked slots as open until expiry
+        busy = self._busy(missing[0], missing[-1])
+        closures = self._closures()
+        fresh = {}
+        for day in missing:
+            # Service weekdays count from Sunday=0, Python's from Monday=0
+            day_windows = (windows or {}).get((day.weekday() + 1) % 7, ())
+            plan = {
+                'windows': IntervalIndex(day_windows).to_list() if windows is not None else None,
+                'busy': IntervalIndex(busy.get(day, ())).to_list(),
+                'slots': self._upstream_slots(day) if day_windows else [],
+                'closed': closures.get(day),
+            }
+            plans[day] = plan
+            fresh[keys[day]] = plan
+        # An availability failure would otherwise read as a day off until expiry
+        if windows is not None:
+            cache.set_many(fresh, DAY_PLAN_TTL)
+        return plans
+
+    def _windows(self):
+        """Working windows per service weekday (0=Sunday), or None if unavailable"""
+        try:
+            response = self.api_client.get_direct(AVAILABILITY_URL, params={'doctorId': self.doctor_id})
+        except Exception as e:
+            logger.error(f"Error loading availability for doctor {self.doctor_id}: {str(e)}")
+            return None
+        if not response.get('success'):
+            logger.error(f"Failed to get availability for doctor {self.doctor_id}: {response.get('message', 'Unknown error')}")
+            return None
+
+        windows = {}
+        for row in response.get('data') or []:
+            if row.get('is_available') is False:
+                continue
+            start = minutes(field('start_time', 'startTime')(row))
+            end = minutes(field('end_time', 'endTime')(row))
+            weekday = field('day_of_week', 'dayOfWeek')(row)
+            if start is None or end is None or weekday is None:
+                continue
+            windows.setdefault(int(weekday), []).append((start, end))
+        return windows
+
+    def _busy(self, first_day, last_day):
+        """Intervals taken by live appointments, per day; raises ``PageError`` if any page fails"""
+        def fetch_page(page, limit):
+            return self.api_client.get_direct(APPOINTMENTS_URL, params={
+                'doctorId': self.doctor_id,
+                'dateFrom': f"{first_day.isoformat()}T00:00:00",
+                'dateTo': f"{last_day.isoformat()}T23:59:59",
+                'page': page,
+                'limit': limit,
+            })
+
+        busy = {}
+        for row in iter_pages(fetch_page, 'appointments', page_size=100):
+            if (row.get('status') or '').lower() in FREE_STATUSES:
+                continue
+            scheduled = dates.parse_datetime(field('scheduledDate', 'scheduled_date')(row))
+            if scheduled is None:
+                continue
+            start = scheduled.hour * 60 + scheduled.minute
+            length = int(field('durationMinutes', 'duration_minutes')(row) or DEFAULT_DURATION)
+            busy.setdefault(scheduled.date(), []).append((start, start + length))
+        return busy
+
+    def _closures(self):
+        """Days closed by open holiday/unavailability records, with the record type"""
+        try:
+            response = self.api_client.get_direct(CONFLICTS_URL, params={'doctorId': self.doctor_id})
+        except Exception as e:
+            logger.error(f"Error loading conflicts for doctor {self.doctor_id}: {str(e)}")
+            return {}
+        if not response.get('success'):
+            logger.error(f"Failed to get conflicts for doctor {self.doctor_id}: {response.get('message', 'Unknown error')}")
+            return {}
+
+        closures = {}
+        for row in response.get('data') or []:
+            kind = field('conflict_type', 'conflictType')(row)
+            if row.get('resolved') or kind not in CLOSING_CONFLICTS:
+                continue
+            day = dates.parse_date(field('conflict_date', 'conflictDate')(row))
+            if day:
+                closures[day] = kind
+        return closures
+
+    def _upstream_slots(self, day):
+        """Explicit open slots for ``day`` as ``(start, length, shared)``, empty if none were generated"""
+        try:
+            response = self.api_client.get_direct(SLOTS_URL.format(doctor_id=self.doctor_id, day=day.isoformat()))
+        except Exception as e:
+            logger.error(f"Error loading slots for doctor {self.doctor_id} on {day}: {str(e)}")
+            return []
+        if not response.get('success'):
+            return []
+
+        slots = []
+        for row in response.get('data') or []:
+            start = minutes(field('slot_time', 'slotTime')(row))
+            capacity = int(field('max_bookings', 'maxBookings')(row) or 1)
+            booked = int(field('current_bookings', 'currentBookings')(row) or 0)
+            if start is None or row.get('is_available') is False or booked >= capacity:
+                continue
+            length = int(field('duration_minutes', 'durationMinutes')(row) or DEFAULT_DURATION)
+            slots.append((start, length, capacity > 1))
+        return sorted(slots)
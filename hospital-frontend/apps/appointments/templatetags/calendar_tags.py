@@ -1,6 +1,6 @@
 from django import template
-from datetime import datetime, timedelta
-import calendar
+from datetime import datetime
+from utils import dates
 
 register = template.Library()
 
@@ -28,9 +28,8 @@ def get_calendar(year, month):
         year = now.year
         month = now.month
 
-    # Use simpler approach with calendar.monthcalendar
-    cal = calendar.Calendar(firstweekday=6)  # Start with Sunday
-    month_calendar = cal.monthdatescalendar(year, month)  # This returns actual date objects
+    # Month grid of date objects (Sunday first), shared across requests
+    month_calendar = dates.month_weeks(year, month)
 
     today = datetime.now().date()
     calendar_data = []
@@ -8,9 +8,15 @@ urlpatterns = [
     path('', views.AppointmentListView.as_view(), name='list'),
     path('book/', views.BookAppointmentView.as_view(), name='book'),
     path('calendar/', views.AppointmentCalendarView.as_view(), name='calendar'),
+    path('worklist/', views.DoctorWorklistView.as_view(), name='worklist'),
+    path('worklist/changes/', views.DoctorWorklistChangesView.as_view(), name='worklist_changes'),
+    path('feed/<str:token>.ics', views.AppointmentFeedView.as_view(), name='ical_feed'),
 
     # API endpoints
     path('api/search/', views.AppointmentSearchAPIView.as_view(), name='search_api'),
+    path('api/slots/', views.AppointmentSlotsAPIView.as_view(), name='slots_api'),
+    path('api/check/', views.AppointmentConflictCheckAPIView.as_view(), name='check_api'),
+    path('bulk/', views.AppointmentBulkActionView.as_view(), name='bulk_action'),
 
     # Appointment actions (must come before detail view)
     path('<str:appointment_id>/update-status/', views.UpdateAppointmentStatusView.as_view(), name='update_status'),
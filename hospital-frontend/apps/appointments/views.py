@@ -1,7 +1,14 @@
 from django.shortcuts import render, redirect
 from django.views import View
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
+from django.conf import settings
+from django.core.cache import cache
+from django.core import signing
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.utils.decorators import method_decorator
 from utils.decorators import (
     login_required,
@@ -11,12 +18,78 @@ from utils.decorators import (
     read_only_for_role
 )
 from utils.api_client import APIClient
+from utils.records import AppointmentRecord
+from utils import dates
+from utils.export import export_response, field, iter_pages, requested_format
+from utils.bulk_actions import BulkAction, bulk_action_response
+from utils.fragments import is_fragment_request, render_list
+from apps.analytics.views import analytics_cache
+from apps.appointments.ical import FEED_ROLES, cached_feed, feed_token, read_feed_token
+from apps.appointments.slots import DEFAULT_DURATION, DURATIONS, MAX_DAYS, SlotFinder
+from apps.appointments.worklist import load_worklist, touch as touch_worklists
+from apps.dashboard.live import counters_changed
 import logging
 from datetime import datetime, timedelta
 import json
 
 logger = logging.getLogger(__name__)
 
+DOCTOR_DIRECTORY_KEY = 'appointments:doctor_directory'
+DOCTOR_DIRECTORY_TTL = 300
+
+
+def doctor_directory(api_client):
+    """Doctor names and specializations keyed by user id, cached for a few minutes"""
+    directory = cache.get(DOCTOR_DIRECTORY_KEY)
+    if directory is not None:
+        return directory
+
+    try:
+        doctors_response = api_client._make_request(
+            'GET',
+            '/api/doctors',
+            token=None  # Public endpoint
+        )
+    except Exception as e:
+        logger.error(f"Error loading doctors: {str(e)}")
+        return {}
+
+    if not doctors_response.get('success'):
+        logger.error(f"Failed to get doctors: {doctors_response.get('message', 'Unknown error')}")
+        return {}
+
+    directory = {}
+    for doctor in doctors_response.get('data', {}).get('doctors', []):
+        first_name = doctor.get('firstName', '')
+        last_name = doctor.get('lastName', '')
+        full_name = f"{first_name} {last_name}".strip() if first_name or last_name else doctor.get('username', 'Unknown Doctor')
+        directory[doctor.get('userId')] = {
+            'fullName': full_name,
+            'specialization': doctor.get('specialization', 'General Medicine'),
+            'username': doctor.get('username', '')
+        }
+    logger.info(f"Retrieved {len(directory)} doctors for the directory")
+    if doctors_response.get('stale'):
+        return directory
+    cache.set(DOCTOR_DIRECTORY_KEY, directory, getattr(settings, 'DOCTOR_DIRECTORY_TTL', DOCTOR_DIRECTORY_TTL))
+    return directory
+
+
+def find_patient(api_client, token, patient_id):
+    """Fetch a single patient by id, or None if it cannot be loaded"""
+    if not (token and patient_id):
+        return None
+    try:
+        response = api_client.get_patient(token=token, patient_id=patient_id)
+    except Exception as e:
+        logger.error(f"Error loading patient {patient_id}: {str(e)}")
+        return None
+    if not response.get('success'):
+        logger.warning(f"Patient {patient_id} not found: {response.get('message', 'Unknown error')}")
+        return None
+    return response.get('data') or None
+
+
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff', 'doctor', 'patient']), name='dispatch')
 @method_decorator(doctor_own_data_required, name='dispatch')
@@ -49,6 +122,9 @@ class AppointmentListView(View):
             if doctor_id:
                 params['doctorId'] = doctor_id
 
+            if requested_format(request):
+                return self.export(request, api_client, params)
+
             # Add pagination parameters
             try:
                 page_num = int(page)
@@ -64,106 +140,35 @@ class AppointmentListView(View):
             logger.info(f"Appointments API response: {appointments_response}")
 
             if appointments_response.get('success'):
-                appointments = appointments_response.get('data', {}).get('appointments', [])
-                pagination = appointments_response.get('data', {}).get('pagination', {})
+                # Decode rows once; scheduled_date is parsed lazily on first access
+                appointments, pagination = AppointmentRecord.decode_page(appointments_response, 'appointments')
                 logger.info(f"Found {len(appointments)} appointments")
-
-                # Parse scheduled_date for each appointment
-                from datetime import datetime
-                for appointment in appointments:
-                    if appointment.get('scheduled_date'):
-                        try:
-                            # Parse ISO datetime string to Python datetime
-                            scheduled_date_str = appointment['scheduled_date']
-
-                            # If it ends with Z, it's UTC time - treat as local time instead
-                            if scheduled_date_str.endswith('Z'):
-                                # Remove Z and parse as naive datetime (local time)
-                                scheduled_date_str = scheduled_date_str[:-5]  # Remove .000Z
-                                appointment['scheduled_date'] = datetime.fromisoformat(scheduled_date_str)
-                            else:
-                                appointment['scheduled_date'] = datetime.fromisoformat(scheduled_date_str)
-
-                        except Exception as e:
-                            logger.error(f"Error parsing scheduled_date for appointment {appointment.get('id')}: {str(e)}")
-                            appointment['scheduled_date'] = None
             else:
                 logger.error(f"Failed to get appointments: {appointments_response.get('message', 'Unknown error')}")
                 appointments = []
                 pagination = {}
 
-            # Get patients and doctors for filters
-            token = request.session.get('access_token')
-            if token:
-                patients_response = api_client.get_patients(
-                    token=token,
-                    page=1,
-                    limit=100,
-                    sort_by='fullName',
-                    sort_order='asc'
-                )
-                patients = patients_response.get('data', {}).get('patients', []) if patients_response.get('success') else []
-            else:
-                patients = []
-
-            # Get doctors from doctor profiles API
-            try:
-                doctors_response = api_client._make_request(
-                    'GET',
-                    '/api/doctors',
-                    token=None  # Public endpoint
-                )
-
-                doctors = []
-                if doctors_response.get('success'):
-                    all_doctors = doctors_response.get('data', {}).get('doctors', [])
-                    logger.info(f"Retrieved {len(all_doctors)} total doctors for filters")
-
-                    # Transform doctor data for filter dropdown
-                    for doctor in all_doctors:
-                        first_name = doctor.get('firstName', '')
-                        last_name = doctor.get('lastName', '')
-                        full_name = f"{first_name} {last_name}".strip() if first_name or last_name else doctor.get('username', 'Unknown Doctor')
-
-                        doctors.append({
-                            'id': doctor.get('userId'),
-                            'fullName': full_name,
-                            'specialization': doctor.get('specialization', 'General Medicine')
-                        })
-
-                    logger.info(f"Processed {len(doctors)} doctors for filters")
-
-                    # Create doctor lookup map for appointments
-                    doctor_lookup = {}
-                    for doctor in all_doctors:
-                        first_name = doctor.get('firstName', '')
-                        last_name = doctor.get('lastName', '')
-                        full_name = f"{first_name} {last_name}".strip() if first_name or last_name else doctor.get('username', 'Unknown Doctor')
-                        doctor_lookup[doctor.get('userId')] = {
-                            'fullName': full_name,
-                            'specialization': doctor.get('specialization', 'General Medicine')
-                        }
-
-                    # Update appointment doctor names with real names
-                    for appointment in appointments:
-                        doctor_id = appointment.get('doctor_id')
-                        if doctor_id in doctor_lookup:
-                            appointment['doctor_name'] = doctor_lookup[doctor_id]['fullName']
-                            appointment['doctor_specialization'] = doctor_lookup[doctor_id]['specialization']
-
-                    logger.info(f"Updated {len(appointments)} appointments with real doctor names")
-                else:
-                    logger.error(f"Failed to get doctors: {doctors_response.get('message', 'Unknown error')}")
-
-            except Exception as e:
-                logger.error(f"Error loading doctors: {str(e)}")
-                doctors = []
+            # Show real doctor names; the directory is cached so paging stays cheap
+            doctor_lookup = doctor_directory(api_client)
+            for appointment in appointments:
+                doctor = doctor_lookup.get(appointment.doctor_id)
+                if doctor:
+                    appointment.doctor_name = doctor['fullName']
+                    appointment.doctor_specialization = doctor['specialization']
+
+            # Labels for the patient/doctor typeahead filters; fragments only swap the results
+            filter_labels = {}
+            if not is_fragment_request(request):
+                if doctor_id in doctor_lookup:
+                    filter_labels['doctor'] = doctor_lookup[doctor_id]['fullName']
+                patient = find_patient(api_client, token, patient_id)
+                if patient:
+                    filter_labels['patient'] = patient.get('fullName', '')
 
             context = {
                 'appointments': appointments,
                 'pagination': pagination,
-                'patients': patients,
-                'doctors': doctors,
+                'filter_labels': filter_labels,
                 'filters': {
                     'status': status,
                     'date_from': date_from,
@@ -181,18 +186,38 @@ class AppointmentListView(View):
 
             logger.info(f"Rendering template with {len(appointments)} appointments")
 
-            return render(request, 'appointments/list.html', context)
+            return render_list(request, 'appointments/list.html',
+                               'appointments/partials/list_results.html', context)
 
         except Exception as e:
             logger.error(f"Error loading appointments: {str(e)}")
             messages.error(request, "An error occurred while loading appointments")
             return render(request, 'appointments/list.html', {
                 'appointments': [],
-                'patients': [],
-                'doctors': [],
                 'error_message': "Appointment information could not be loaded. Please try again later."
             })
 
+    EXPORT_COLUMNS = (
+        ('Appointment #', field('appointmentNumber', 'appointment_number')),
+        ('Scheduled', lambda row: dates.format_datetime(field('scheduledDate', 'scheduled_date')(row), 'Y-m-d H:i')),
+        ('Duration (min)', field('durationMinutes', 'duration_minutes')),
+        ('Patient', field('patientName', 'patient_name')),
+        ('Patient phone', field('patientPhone', 'patient_phone')),
+        ('Doctor', field('doctorName', 'doctor_name')),
+        ('Type', field('appointmentType', 'appointment_type')),
+        ('Status', 'status'),
+        ('Priority', 'priority'),
+        ('Reason', 'reason'),
+    )
+
+    def export(self, request, api_client, params):
+        """Stream every appointment matching the list filters as CSV/XLSX"""
+        def fetch_page(page, limit):
+            return api_client.get_direct('http://localhost:3003/api/appointments', params=dict(params, page=page, limit=limit))
+
+        rows = iter_pages(fetch_page, 'appointments')
+        return export_response(request, rows, self.EXPORT_COLUMNS, 'appointments')
+
 
 @method_decorator(login_required, name='dispatch')
 class AppointmentDetailView(View):
@@ -210,18 +235,7 @@ class AppointmentDetailView(View):
                 return redirect('appointments:list')
 
             # Parse datetime fields for proper timeline display
-            from datetime import datetime
-            def parse_iso(dt_str):
-                try:
-                    if not dt_str:
-                        return None
-                    # Remove trailing 'Z' if present; keep milliseconds if any
-                    if isinstance(dt_str, str) and dt_str.endswith('Z'):
-                        dt_str = dt_str[:-1]
-                    return datetime.fromisoformat(dt_str) if isinstance(dt_str, str) else dt_str
-                except Exception as e:
-                    logger.error(f"Error parsing datetime '{dt_str}': {e}")
-                    return None
+            parse_iso = dates.parse_datetime
 
             # Support both snake_case and camelCase from API
             appointment['scheduled_date'] = parse_iso(appointment.get('scheduled_date') or appointment.get('scheduledDate'))
@@ -267,142 +281,13 @@ class AppointmentDetailView(View):
 class BookAppointmentView(View):
     def get(self, request):
         try:
-            token = request.session.get('access_token')
-            api_client = APIClient(token=token)
-
-            # Get URL parameters
-            selected_doctor_id = request.GET.get('doctor', '')
-            selected_patient_id = request.GET.get('patient', '')
-
-            logger.info(f"Book appointment - doctor: {selected_doctor_id}, patient: {selected_patient_id}")
-
-            # Get patients
-            patients = []
-            try:
-                token = request.session.get('access_token')
-                if token:
-                    patients_response = api_client.get_patients(
-                        token=token,
-                        page=1,
-                        limit=100,  # Get more patients for dropdown
-                        sort_by='fullName',
-                        sort_order='asc'
-                    )
-                    if patients_response.get('success'):
-                        patients = patients_response.get('data', {}).get('patients', [])
-                        logger.info(f"Loaded {len(patients)} patients from API")
-                    else:
-                        logger.error(f"Patients API failed: {patients_response.get('message', 'Unknown error')}")
-                        patients = []
-                else:
-                    logger.error("No access token available for patients API")
-                    patients = []
-            except Exception as e:
-                logger.error(f"Error loading patients from API: {str(e)}")
-                patients = []
-
-            # If no patients loaded (either due to error or empty response), use fallback
-            if not patients:
-                logger.info("No patients loaded from API, trying fallback...")
-                try:
-                    appointments_response = api_client.get_direct('http://localhost:3003/api/appointments')
-                    appointments_data = appointments_response.get('data', {}).get('appointments', [])
-
-                    seen_patients = set()
-                    for appointment in appointments_data:
-                        patient_id = appointment.get('patient_id')
-                        patient_name = appointment.get('patient_name')
-                        patient_phone = appointment.get('patient_phone')
-                        if patient_id and patient_id not in seen_patients:
-                            patients.append({
-                                'id': patient_id,
-                                'fullName': patient_name or f"Patient {patient_id[:8]}",
-                                'phone': patient_phone or 'N/A',
-                                'patientNumber': f"PT{patient_id[:8].upper()}"
-                            })
-                            seen_patients.add(patient_id)
-
-                    logger.info(f"Loaded {len(patients)} patients from appointments fallback")
-                except Exception as fallback_error:
-                    logger.error(f"Fallback patient loading also failed: {str(fallback_error)}")
-
-                # If still no patients, provide a default patient
-                if not patients:
-                    patients = [{
-                        'id': '550e8400-e29b-41d4-a716-446655440001',
-                        'fullName': 'Test Patient',
-                        'phone': '123-456-7890',
-                        'patientNumber': 'PT550E8400'
-                    }]
-                    logger.info("Using default patient as last resort")
-
-            # Get doctors from doctor profiles API (only accepting patients)
-            doctors = []
-            try:
-                # Get all doctor profiles
-                doctors_response = api_client._make_request(
-                    'GET',
-                    '/api/doctors',
-                    token=None  # Public endpoint
-                )
-
-                if doctors_response.get('success'):
-                    all_doctors = doctors_response.get('data', {}).get('doctors', [])
-                    logger.info(f"Retrieved {len(all_doctors)} total doctors from API")
-
-                    # Filter only doctors accepting patients
-                    for doctor in all_doctors:
-                        if doctor.get('isAcceptingPatients', False):
-                            # Get availability info for display
-                            availability_text = "Available"
-                            availability_hours = doctor.get('availabilityHours', {})
-                            if availability_hours:
-                                # Show first available day as example
-                                for day, hours in availability_hours.items():
-                                    if hours and hours.get('start') and hours.get('end'):
-                                        availability_text = f"{day.title()}: {hours['start']}-{hours['end']}"
-                                        break
-
-                            # Transform doctor data for template
-                            first_name = doctor.get('firstName', '')
-                            last_name = doctor.get('lastName', '')
-                            full_name = f"{first_name} {last_name}".strip() if first_name or last_name else doctor.get('username', 'Unknown Doctor')
-
-                            doctors.append({
-                                'id': doctor.get('userId'),
-                                'fullName': full_name,
-                                'specialization': doctor.get('specialization', 'General Medicine'),
-                                'availability': availability_text,
-                                'consultationFee': doctor.get('consultationFee', 0),
-                                'yearsOfExperience': doctor.get('yearsOfExperience', 0)
-                            })
-
-                    logger.info(f"Filtered to {len(doctors)} doctors accepting patients")
-                else:
-                    logger.error(f"Failed to get doctors: {doctors_response.get('message', 'Unknown error')}")
-
-            except Exception as e:
-                logger.error(f"Error loading doctors from profiles API: {str(e)}")
-
-            # Fallback if no doctors found
-            if not doctors:
-                logger.warning("No accepting doctors found, using fallback")
-                doctors = [{
-                    'id': '6f529dc6-ee6f-4b8b-8ddb-f177614026d7',
-                    'fullName': 'Dr. Smith',
-                    'specialization': 'General Medicine',
-                    'availability': 'Available',
-                    'consultationFee': 100,
-                    'yearsOfExperience': 5
-                }]
-
-            # Get pre-selected patient/doctor from query params
+            # Patient and doctor are picked with the search typeaheads on the form,
+            # which also pre-select these ids
             selected_patient_id = request.GET.get('patient')
             selected_doctor_id = request.GET.get('doctor')
+            logger.info(f"Book appointment - doctor: {selected_doctor_id}, patient: {selected_patient_id}")
 
             context = {
-                'patients': patients,
-                'doctors': doctors,
                 'selected_patient_id': selected_patient_id,
                 'selected_doctor_id': selected_doctor_id,
                 'appointment_types': [
@@ -426,8 +311,6 @@ class BookAppointmentView(View):
             logger.error(f"Error loading booking form: {str(e)}")
             messages.error(request, "An error occurred while loading the booking form")
             return render(request, 'appointments/book.html', {
-                'patients': [],
-                'doctors': [],
                 'error_message': "Booking form could not be loaded. Please try again later."
             })
 
@@ -439,27 +322,23 @@ class BookAppointmentView(View):
             # Get form data
             scheduled_datetime = request.POST.get('scheduled_date')
 
-            # Parse datetime and format for API
-            if scheduled_datetime:
-                from datetime import datetime
-                try:
-                    # Parse datetime-local format (YYYY-MM-DDTHH:MM)
-                    dt = datetime.fromisoformat(scheduled_datetime)
-
-                    # Send as local time without timezone conversion
-                    # Let the API handle timezone if needed
-                    scheduled_date_iso = dt.strftime('%Y-%m-%dT%H:%M:%S')
-
-                    # Keep local time for display
-                    appointment_date = dt.strftime('%Y-%m-%d')
-                    appointment_time = dt.strftime('%H:%M')
-
-                    logger.info(f"Datetime conversion: Input={scheduled_datetime}, Parsed={dt}, ISO={scheduled_date_iso}")
-                except ValueError as e:
-                    logger.error(f"Datetime parsing error: {e}")
-                    scheduled_date_iso = scheduled_datetime
-                    appointment_date = None
-                    appointment_time = None
+            # Parse datetime-local format (YYYY-MM-DDTHH:MM) and format for API
+            dt = dates.parse_datetime(scheduled_datetime)
+            if dt:
+                # Send as local time without timezone conversion
+                # Let the API handle timezone if needed
+                scheduled_date_iso = dt.strftime('%Y-%m-%dT%H:%M:%S')
+
+                # Keep local time for display
+                appointment_date = dt.strftime('%Y-%m-%d')
+                appointment_time = dt.strftime('%H:%M')
+
+                logger.info(f"Datetime conversion: Input={scheduled_datetime}, Parsed={dt}, ISO={scheduled_date_iso}")
+            elif scheduled_datetime:
+                logger.error(f"Datetime parsing error: {scheduled_datetime!r}")
+                scheduled_date_iso = scheduled_datetime
+                appointment_date = None
+                appointment_time = None
             else:
                 scheduled_date_iso = None
                 appointment_date = None
@@ -475,101 +354,47 @@ class BookAppointmentView(View):
             if doctor_id == 'None' or not doctor_id:
                 doctor_id = None
 
-            # Load patients and doctors data for getting names
-            patients = []
-            doctors = []
-            try:
-                token = request.session.get('access_token')
-                if token:
-                    # Get patients
-                    patients_response = api_client.get_patients(
-                        token=token,
-                        page=1,
-                        limit=100,
-                        sort_by='fullName',
-                        sort_order='asc'
-                    )
-                    if patients_response.get('success'):
-                        patients = patients_response.get('data', {}).get('patients', [])
-
-                    # Get doctors from availability and user service
-                    doctors_response = api_client.get_direct('http://localhost:3003/api/doctor-availability')
-                    if doctors_response.get('success'):
-                        availability_data = doctors_response.get('data', [])
-                        seen_doctors = set()
-                        for avail in availability_data:
-                            doctor_id_avail = avail.get('doctor_id')
-                            if doctor_id_avail and doctor_id_avail not in seen_doctors:
-                                # Get doctor details from user service
-                                try:
-                                    doctor_profile_response = api_client.get_direct(f'http://localhost:3001/api/users/{doctor_id_avail}')
-                                    if doctor_profile_response.get('success'):
-                                        doctor_data = doctor_profile_response.get('data', {})
-                                        doctor_name = doctor_data.get('fullName') or doctor_data.get('username', f"Doctor {doctor_id_avail[:8]}")
-                                        specialization = doctor_data.get('specialization', 'General')
-                                    else:
-                                        doctor_name = f"Doctor {doctor_id_avail[:8]}"
-                                        specialization = 'General'
-                                except:
-                                    doctor_name = f"Doctor {doctor_id_avail[:8]}"
-                                    specialization = 'General'
-
-                                doctors.append({
-                                    'id': doctor_id_avail,
-                                    'name': doctor_name,
-                                    'specialization': specialization,
-                                    'availability': {
-                                        'day_of_week': avail.get('day_of_week'),
-                                        'start_time': avail.get('start_time'),
-                                        'end_time': avail.get('end_time')
-                                    }
-                                })
-                                seen_doctors.add(doctor_id_avail)
-            except Exception as e:
-                logger.error(f"Error loading patients/doctors for booking: {str(e)}")
-
-            # Get patient and doctor info for service
-            selected_patient = next((p for p in patients if p['id'] == patient_id), None)
-            selected_doctor = next((d for d in doctors if d['id'] == doctor_id), None)
-
-            # If doctor not found in initial list, try to get from API
+            # Validate before any lookups so rejected bookings cost no upstream calls
+            if not patient_id:
+                messages.error(request, "Please select a patient")
+                return redirect('appointments:book')
+            if not doctor_id:
+                messages.error(request, "Please select a doctor")
+                return redirect('appointments:book')
+            if not scheduled_date_iso:
+                messages.error(request, "Please select a date and time")
+                return redirect('appointments:book')
+
+            duration = int(request.POST.get('duration_minutes', DEFAULT_DURATION))
+            slot_finder = SlotFinder(api_client, doctor_id)
+            if dt:
+                conflicts = slot_finder.check(dt, duration)
+                if conflicts:
+                    messages.error(request, f"Cannot book this time: {conflicts[0]['message']}")
+                    return redirect('appointments:book')
+
+            # Look up only the chosen patient and doctor for their names
+            selected_patient = find_patient(api_client, token, patient_id)
+            selected_doctor = None
+            if doctor_id:
+                doctor = doctor_directory(api_client).get(doctor_id)
+                if doctor:
+                    selected_doctor = dict(doctor, id=doctor_id, name=doctor['fullName'])
+
+            # Doctors missing from the directory are looked up in the user service
             if not selected_doctor and doctor_id:
                 try:
-                    # Search all doctors and find by userId
-                    doctors_response = api_client._make_request('GET', '/api/doctors', token=None)
-                    if doctors_response.get('success'):
-                        all_doctors = doctors_response.get('data', {}).get('doctors', [])
-                        doctor_data = next((d for d in all_doctors if d.get('userId') == doctor_id), None)
-
-                        if doctor_data:
-                            full_name = f"{doctor_data.get('firstName', '')} {doctor_data.get('lastName', '')}".strip()
-                            if not full_name:
-                                full_name = doctor_data.get('username', 'Unknown Doctor')
-
-                            selected_doctor = {
-                                'id': doctor_data.get('userId'),
-                                'fullName': full_name,
-                                'name': full_name,
-                                'specialization': doctor_data.get('specialization', 'General Medicine'),
-                                'username': doctor_data.get('username', '')
-                            }
-                            logger.info(f"Found doctor from doctors API: {selected_doctor}")
-                        else:
-                            logger.warning(f"Doctor with userId {doctor_id} not found in doctors API")
-
-                    # Fallback to user service if still not found
-                    if not selected_doctor:
-                        user_response = api_client.get_direct(f'http://localhost:3001/api/users/{doctor_id}')
-                        if user_response.get('success'):
-                            user_data = user_response.get('data', {})
-                            selected_doctor = {
-                                'id': doctor_id,
-                                'fullName': user_data.get('fullName') or user_data.get('username', 'Unknown Doctor'),
-                                'name': user_data.get('fullName') or user_data.get('username', 'Unknown Doctor'),
-                                'specialization': user_data.get('specialization', 'General Medicine'),
-                                'username': user_data.get('username', '')
-                            }
-                            logger.info(f"Found doctor from user service: {selected_doctor}")
+                    user_response = api_client.get_direct(f'http://localhost:3001/api/users/{doctor_id}')
+                    if user_response.get('success'):
+                        user_data = user_response.get('data', {})
+                        selected_doctor = {
+                            'id': doctor_id,
+                            'fullName': user_data.get('fullName') or user_data.get('username', 'Unknown Doctor'),
+                            'name': user_data.get('fullName') or user_data.get('username', 'Unknown Doctor'),
+                            'specialization': user_data.get('specialization', 'General Medicine'),
+                            'username': user_data.get('username', '')
+                        }
+                        logger.info(f"Found doctor from user service: {selected_doctor}")
 
                 except Exception as e:
                     logger.error(f"Error fetching doctor details: {str(e)}")
@@ -605,7 +430,7 @@ class BookAppointmentView(View):
                 'appointmentDate': appointment_date,  # Separate date field YYYY-MM-DD
                 'appointmentTime': appointment_time,  # Separate time field HH:MM
                 'scheduledDate': scheduled_date_iso,  # Combined datetime for service
-                'durationMinutes': int(request.POST.get('duration_minutes', 30)),
+                'durationMinutes': duration,
                 'priority': request.POST.get('priority', 'normal'),
                 'reason': request.POST.get('reason', ''),
                 'symptoms': request.POST.get('symptoms', ''),
@@ -614,17 +439,6 @@ class BookAppointmentView(View):
                 'createdByUserId': current_user_id or 'temp-user-id',  # Use real user ID
             }
 
-            # Validate required fields
-            if not appointment_data['patientId']:
-                messages.error(request, "Please select a patient")
-                return redirect('appointments:book')
-            if not appointment_data['doctorId']:
-                messages.error(request, "Please select a doctor")
-                return redirect('appointments:book')
-            if not appointment_data['scheduledDate']:
-                messages.error(request, "Please select a date and time")
-                return redirect('appointments:book')
-
             # Log the data being sent for debugging
             logger.info(f"Booking appointment with data: {appointment_data}")
 
@@ -632,6 +446,10 @@ class BookAppointmentView(View):
             response = api_client.post_direct('http://localhost:3003/api/appointments', appointment_data)
 
             if response.get('success'):
+                if dt:
+                    slot_finder.forget(dt.date())
+                touch_worklists()
+                counters_changed(doctor_id)
                 messages.success(request, "Appointment booked successfully!")
                 appointment_id = response.get('data', {}).get('id')
                 if appointment_id:
@@ -697,6 +515,8 @@ class UpdateAppointmentStatusView(View):
                 response = {'success': False, 'message': 'Invalid next status'}
 
             if response.get('success'):
+                touch_worklists()
+                counters_changed(field('doctorId', 'doctor_id')(current_appt))
                 messages.success(request, f"Appointment status updated to {allowed_next}")
             else:
                 messages.error(request, f"Failed to update appointment: {response.get('message', 'Unknown error')}")
@@ -726,6 +546,8 @@ class CancelAppointmentView(View):
             )
 
             if response.get('success'):
+                touch_worklists()
+                counters_changed(request.session.get('user_id') if request.session.get('user_role') == 'doctor' else None)
                 messages.success(request, "Appointment cancelled successfully")
             else:
                 messages.error(request, f"Failed to cancel appointment: {response.get('message', 'Unknown error')}")
@@ -738,6 +560,59 @@ class CancelAppointmentView(View):
             return redirect('appointments:list')
 
 
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class AppointmentBulkActionView(View):
+    """Confirm or cancel many appointments at once"""
+
+    def post(self, request):
+        token = request.session.get('access_token')
+        if not token:
+            return JsonResponse({'success': False, 'message': 'Authentication required'})
+
+        api_client = APIClient(token=token)
+        user_role = request.session.get('user_role')
+        user_id = request.session.get('user_id')
+
+        def status(appointment):
+            return (appointment.get('status') or '').lower()
+
+        def own_appointment(appointment):
+            # Doctors may only act on their own schedule
+            if user_role == 'doctor' and str(field('doctorId', 'doctor_id')(appointment)) != str(user_id):
+                return 'Not your appointment'
+            return None
+
+        def load(appointment_id):
+            return api_client.get_direct(f'http://localhost:3003/api/appointments/{appointment_id}')
+
+        def doctor_of(appointment):
+            return {'doctor_id': field('doctorId', 'doctor_id')(appointment)}
+
+        actions = {
+            'confirm': BulkAction(
+                'confirm', load,
+                lambda appointment_id, appointment: api_client._make_request(
+                    'PUT', f'/api/appointments/{appointment_id}/confirm', token=token),
+                status, allowed_from=('scheduled',), check=own_appointment, describe=doctor_of,
+            ),
+            'cancel': BulkAction(
+                'cancel', load,
+                lambda appointment_id, appointment: api_client._make_request(
+                    'PUT', f'/api/appointments/{appointment_id}', token=token, data={'status': 'cancelled'}),
+                status, allowed_from=('scheduled', 'confirmed'), check=own_appointment, describe=doctor_of,
+            ),
+        }
+
+        def invalidate(changed):
+            analytics_cache.invalidate_all()
+            touch_worklists()
+            for doctor_id in {result['doctor_id'] for result in changed if result.get('doctor_id')}:
+                counters_changed(doctor_id)
+
+        return bulk_action_response(request, actions, invalidate=invalidate)
+
+
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff', 'doctor', 'patient']), name='dispatch')
 @method_decorator(doctor_own_data_required, name='dispatch')
@@ -778,40 +653,26 @@ class AppointmentCalendarView(View):
 
             logger.info(f"Calendar: Fetching appointments with params: {params}")
             appointments_response = api_client.get_direct('http://localhost:3003/api/appointments', params=params)
-            all_appointments = appointments_response.get('data', {}).get('appointments', [])
+            all_appointments, _ = AppointmentRecord.decode_page(appointments_response, 'appointments')
 
             logger.info(f"Calendar: Retrieved {len(all_appointments)} appointments after filtering")
 
-            # Parse scheduled_date and filter for current month
+            # Filter for current month and group by date for calendar display
             appointments_by_date = {}
             month_appointments = []
 
+            month_prefix = f"{year:04d}-{month:02d}-"
             for appointment in all_appointments:
-                scheduled_date_str = appointment.get('scheduled_date') or appointment.get('scheduledDate') or ''
-                if scheduled_date_str:
-                    try:
-                        # Parse ISO datetime string to Python datetime
-                        if isinstance(scheduled_date_str, str) and scheduled_date_str.endswith('Z'):
-                            # Remove trailing Z only
-                            scheduled_date_str = scheduled_date_str[:-1]
-                        scheduled_datetime = datetime.fromisoformat(scheduled_date_str) if isinstance(scheduled_date_str, str) else scheduled_date_str
-                        appointment['scheduled_date'] = scheduled_datetime
-
-                        # Check if appointment is in current month
-                        if (scheduled_datetime.year == year and
-                            scheduled_datetime.month == month):
-
-                            month_appointments.append(appointment)
-
-                            # Group by date for calendar display
-                            date_key = scheduled_datetime.strftime('%Y-%m-%d')
-                            if date_key not in appointments_by_date:
-                                appointments_by_date[date_key] = []
-                            appointments_by_date[date_key].append(appointment)
-
-                    except Exception as e:
-                        logger.error(f"Error parsing scheduled_date for appointment {appointment.get('id')}: {str(e)}")
-                        continue
+                date_key = appointment.date_key
+                if not date_key:
+                    if appointment.scheduled_date_raw:
+                        logger.error(f"Error parsing scheduled_date for appointment {appointment.id}")
+                    continue
+
+                # Only appointments in the current month; datetimes are parsed lazily at render
+                if date_key.startswith(month_prefix):
+                    month_appointments.append(appointment)
+                    appointments_by_date.setdefault(date_key, []).append(appointment)
 
             logger.info(f"Calendar: Found {len(month_appointments)} appointments for {year}-{month:02d}")
             logger.info(f"Calendar: Appointments by date: {list(appointments_by_date.keys())}")
@@ -820,7 +681,7 @@ class AppointmentCalendarView(View):
             for date_key, appts in appointments_by_date.items():
                 logger.info(f"Calendar: Date {date_key} has {len(appts)} appointments")
                 for appt in appts:
-                    logger.info(f"  - {appt.get('patient_name', 'Unknown')} at {appt.get('scheduled_date', 'No time')} (Status: {appt.get('status', 'scheduled')})")
+                    logger.info(f"  - {appt.get('patient_name', 'Unknown')} at {appt.scheduled_date} (Status: {appt.get('status', 'scheduled')})")
 
             # Calculate statistics
             total_appointments = len(month_appointments)
@@ -836,6 +697,7 @@ class AppointmentCalendarView(View):
                 'total_appointments': total_appointments,
                 'days_with_appointments': days_with_appointments,
                 'month_appointments': month_appointments,  # For debugging
+                'feed_url': feed_url(request),
             }
 
             return render(request, 'appointments/calendar.html', context)
@@ -849,6 +711,176 @@ class AppointmentCalendarView(View):
             })
 
 
+def worklist_params(request):
+    """Doctor and day a worklist request is for; doctors only see their own"""
+    if request.session.get('user_role') == 'doctor':
+        doctor_id = request.session.get('user_id')
+    else:
+        doctor_id = request.GET.get('doctor_id', '').strip() or None
+    day = dates.parse_date(request.GET.get('date')) if request.GET.get('date') else datetime.now().date()
+    return doctor_id, day
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class DoctorWorklistView(View):
+    """A doctor's appointments for one day, kept current by polling for changes"""
+
+    def get(self, request):
+        doctor_id, day = worklist_params(request)
+        if day is None:
+            messages.error(request, "Invalid date")
+            return redirect('appointments:worklist')
+
+        context = {
+            'doctor_id': doctor_id,
+            'doctor': None,
+            'day': day,
+            'prev_day': day - timedelta(days=1),
+            'next_day': day + timedelta(days=1),
+            'appointments': [],
+            'version': '',
+            'user_role': request.session.get('user_role'),
+        }
+        if doctor_id:
+            api_client = APIClient(token=request.session.get('access_token'))
+            worklist = load_worklist(api_client, doctor_id, day)
+            context.update({
+                'doctor': doctor_directory(api_client).get(doctor_id),
+                'appointments': AppointmentRecord.from_list(list(worklist)),
+                'version': worklist.version,
+            })
+        return render(request, 'appointments/worklist.html', context)
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class DoctorWorklistChangesView(View):
+    """Rows of a worklist that changed after the client's version, pre-rendered"""
+
+    def get(self, request):
+        doctor_id, day = worklist_params(request)
+        if not doctor_id or day is None:
+            return JsonResponse({'success': False, 'message': 'doctor_id and a valid date are required'}, status=400)
+
+        api_client = APIClient(token=request.session.get('access_token'))
+        worklist = load_worklist(api_client, doctor_id, day)
+        changes = worklist.changes_since(request.GET.get('version'))
+        if changes is None:
+            return JsonResponse({'success': True, 'reset': True, 'version': worklist.version})
+
+        changed, removed = changes
+        user_role = request.session.get('user_role')
+        rows = [
+            {
+                'id': str(row['id']),
+                'before': worklist.next_id(str(row['id'])),
+                'html': render_to_string('appointments/partials/worklist_row.html', {
+                    'appointment': AppointmentRecord.from_dict(row), 'user_role': user_role}, request=request),
+            }
+            for row in changed
+        ]
+        return JsonResponse({
+            'success': True,
+            'reset': False,
+            'version': worklist.version,
+            'rows': rows,
+            'removed': removed,
+            'count': len(worklist),
+        })
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class AppointmentSlotsAPIView(View):
+    """Free slots for a doctor, one entry per day, for the booking form"""
+
+    def get(self, request):
+        doctor_id = request.GET.get('doctor_id', '').strip()
+        if not doctor_id:
+            return JsonResponse({'success': False, 'message': 'doctor_id is required'}, status=400)
+
+        start_day = dates.parse_date(request.GET.get('date')) if request.GET.get('date') else datetime.now().date()
+        try:
+            days = min(max(int(request.GET.get('days', 7)), 1), MAX_DAYS)
+            duration = int(request.GET.get('duration', DEFAULT_DURATION))
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'days and duration must be numbers'}, status=400)
+        if start_day is None or duration not in DURATIONS:
+            return JsonResponse({'success': False, 'message': 'Invalid date or duration'}, status=400)
+
+        try:
+            api_client = APIClient(token=request.session.get('access_token'))
+            data = SlotFinder(api_client, doctor_id).find(start_day, days, duration)
+        except Exception as e:
+            logger.error(f"Error finding slots for doctor {doctor_id}: {str(e)}")
+            return JsonResponse({'success': False, 'message': 'Slots could not be loaded'}, status=502)
+
+        return JsonResponse({'success': True, 'data': data})
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class AppointmentConflictCheckAPIView(View):
+    """Whether a doctor can take a booking at a given time, for the booking form"""
+
+    def get(self, request):
+        doctor_id = request.GET.get('doctor_id', '').strip()
+        scheduled = dates.parse_datetime(request.GET.get('scheduled_date'))
+        try:
+            duration = int(request.GET.get('duration', DEFAULT_DURATION))
+        except ValueError:
+            duration = None
+        if not doctor_id or scheduled is None or duration not in DURATIONS:
+            return JsonResponse({'success': False, 'message': 'doctor_id, scheduled_date and duration are required'}, status=400)
+
+        try:
+            api_client = APIClient(token=request.session.get('access_token'))
+            conflicts = SlotFinder(api_client, doctor_id).check(scheduled, duration)
+        except Exception as e:
+            logger.error(f"Error checking conflicts for doctor {doctor_id}: {str(e)}")
+            return JsonResponse({'success': False, 'message': 'Conflicts could not be checked'}, status=502)
+
+        return JsonResponse({'success': True, 'data': {'available': not conflicts, 'conflicts': conflicts}})
+
+
+def feed_url(request):
+    """Absolute calendar subscription URL for the current user, if they have one"""
+    user_id = request.session.get('user_id')
+    role = request.session.get('user_role')
+    if not user_id or role not in FEED_ROLES:
+        return None
+    return request.build_absolute_uri(reverse('appointments:ical_feed', args=[feed_token(user_id, role)]))
+
+
+class AppointmentFeedView(View):
+    """
+    Token-authenticated iCalendar feed for calendar apps
+
+    No session is needed: the token in the URL names the user.  Responses
+    carry ETag and Last-Modified so polling clients mostly get 304s.
+    """
+
+    def get(self, request, token):
+        try:
+            user_id, role = read_feed_token(token)
+        except signing.BadSignature:
+            return HttpResponse('Unknown calendar feed', status=404, content_type='text/plain')
+
+        try:
+            feed = cached_feed(APIClient(), user_id, role)
+        except Exception as e:
+            logger.error(f"Error building calendar feed for {role} {user_id}: {str(e)}")
+            return HttpResponse('Calendar temporarily unavailable', status=503, content_type='text/plain')
+
+        response = HttpResponse(feed['body'], content_type='text/calendar; charset=utf-8')
+        response['ETag'] = feed['etag']
+        response['Last-Modified'] = http_date(feed['last_modified'])
+        response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+        patch_cache_control(response, private=True, max_age=300)
+        return get_conditional_response(request, etag=feed['etag'], last_modified=feed['last_modified'], response=response)
+
+
 class AppointmentSearchAPIView(View):
     def get(self, request):
         try:
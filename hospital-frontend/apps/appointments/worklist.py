@@ -0,0 +1,164 @@
+"""
+Doctor day worklists refreshed with small deltas
+
+A worklist holds one doctor's appointments for one day, read from
+``/api/appointments/doctor/:doctorId/schedule``, as rows keyed by id plus a
+list of ``(scheduled, id)`` keys kept sorted with ``bisect``.  Each refresh
+compares incoming rows with the stored ones by ``updated_at`` and bumps a
+sequence number for the rows that changed or disappeared, so a browser that
+reports the version it has gets back only those rows, each with the id of the
+row it sorts before.
+
+Worklists live in the Django cache.  Refreshes are throttled per
+(doctor, day) so every open worklist shares one upstream call per interval,
+and ``touch()`` lets views that change appointments skip the wait.
+"""
+
+import logging
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+
+from django.core.cache import cache
+
+from utils.export import field
+
+logger = logging.getLogger(__name__)
+
+#: Seconds between upstream refreshes of the same worklist
+REFRESH_INTERVAL = 15
+
+WORKLIST_TTL = 60 * 60
+
+#: Set whenever this frontend changes an appointment
+CHANGED_KEY = 'appointments:worklist:changed'
+
+SCHEDULE_URL = 'http://localhost:3003/api/appointments/doctor/{doctor_id}/schedule'
+
+
+def worklist_key(doctor_id, day):
+    return f"appointments:worklist:{doctor_id}:{day.isoformat()}"
+
+
+def touch():
+    """Make the next poll of every worklist refresh from upstream"""
+    cache.set(CHANGED_KEY, time.time(), WORKLIST_TTL)
+
+
+def sort_key(row):
+    return (field('scheduledDate', 'scheduled_date')(row) or '', str(row['id']))
+
+
+def stamp(row):
+    """What identifies a row's revision: ``updated_at``, or the whole row when missing"""
+    return field('updatedAt', 'updated_at')(row) or row
+
+
+class Worklist:
+    """One doctor's appointments for one day, in schedule order"""
+
+    def __init__(self, doctor_id, day):
+        self.doctor_id = doctor_id
+        self.day = day
+        # Versions from an evicted worklist must not match a new one
+        self.generation = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.rows = {}
+        self.order = []
+        self.changed = {}
+        self.removed = {}
+        self.refreshed_at = 0
+
+    @property
+    def version(self):
+        return f"{self.generation}:{self.seq}"
+
+    def __iter__(self):
+        return (self.rows[row_id] for _, row_id in self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def apply(self, rows):
+        """Merge a full schedule; returns the ids that changed or disappeared"""
+        incoming = {str(row['id']): row for row in rows if row.get('id')}
+        seq = self.seq + 1
+        touched = []
+
+        for row_id, row in incoming.items():
+            old = self.rows.get(row_id)
+            if old is not None and stamp(old) == stamp(row):
+                continue
+            if old is not None:
+                del self.order[bisect_left(self.order, sort_key(old))]
+            insort(self.order, sort_key(row))
+            self.rows[row_id] = row
+            self.changed[row_id] = seq
+            self.removed.pop(row_id, None)
+            touched.append(row_id)
+
+        for row_id in [row_id for row_id in self.rows if row_id not in incoming]:
+            del self.order[bisect_left(self.order, sort_key(self.rows.pop(row_id)))]
+            self.changed.pop(row_id, None)
+            self.removed[row_id] = seq
+            touched.append(row_id)
+
+        if touched:
+            self.seq = seq
+        return touched
+
+    def next_id(self, row_id):
+        """Id of the row after ``row_id`` in schedule order, or None"""
+        i = bisect_right(self.order, sort_key(self.rows[row_id]))
+        return self.order[i][1] if i < len(self.order) else None
+
+    def changes_since(self, version):
+        """
+        ``(changed_rows, removed_ids)`` after ``version``, oldest change first
+
+        Returns None when ``version`` is not from this worklist and the client
+        has to reload it.
+        """
+        generation, _, seq = (version or '').partition(':')
+        if generation != self.generation or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        since = int(seq)
+        changed = sorted((row_id for row_id, at in self.changed.items() if at > since), key=self.changed.get)
+        removed = [row_id for row_id, at in self.removed.items() if at > since]
+        return [self.rows[row_id] for row_id in changed], removed
+
+
+def schedule_rows(response):
+    data = response.get('data') or []
+    if isinstance(data, dict):
+        data = data.get('appointments') or data.get('schedule') or []
+    return data
+
+
+def load_worklist(api_client, doctor_id, day, now=None):
+    """The cached worklist for (doctor, day), refreshed if it is due"""
+    now = now or time.time()
+    key = worklist_key(doctor_id, day)
+    worklist = cache.get(key) or Worklist(doctor_id, day)
+    changed_at = cache.get(CHANGED_KEY) or 0
+    if worklist.refreshed_at and now - worklist.refreshed_at < REFRESH_INTERVAL and changed_at <= worklist.refreshed_at:
+        return worklist
+
+    try:
+        response = api_client.get_direct(SCHEDULE_URL.format(doctor_id=doctor_id), params={
+            'dateFrom': f"{day.isoformat()}T00:00:00",
+            'dateTo': f"{day.isoformat()}T23:59:59",
+        })
+    except Exception as e:
+        logger.error(f"Error loading schedule for doctor {doctor_id} on {day}: {str(e)}")
+        return worklist
+    if not response.get('success'):
+        logger.error(f"Failed to get schedule for doctor {doctor_id} on {day}: {response.get('message', 'Unknown error')}")
+        return worklist
+
+    touched = worklist.apply(schedule_rows(response))
+    worklist.refreshed_at = now
+    cache.set(key, worklist, WORKLIST_TTL)
+    if touched:
+        logger.info(f"Worklist {doctor_id} {day}: {len(touched)} rows changed, version {worklist.version}")
+    return worklist
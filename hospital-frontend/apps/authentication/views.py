@@ -14,9 +14,9 @@ from django.http import JsonResponse
 from django.conf import settings
 from utils.api_client import api_client
 from utils.decorators import login_required
+from utils.gateway_proxy import proxy
 from .forms import LoginForm, ChangePasswordForm, RegistrationForm, ProfileEditForm, ForgotPasswordForm
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 
@@ -467,115 +467,45 @@ class ProfileEditView(View):
 
 
 # Doctor Profile API Proxy Views
+# The gateway's JSON is streamed through untouched (utils.gateway_proxy)
+
+def authentication_required():
+    return JsonResponse({
+        'success': False,
+        'message': 'Authentication required. Please login again.'
+    }, status=401)
+
 
 @csrf_exempt
 @require_http_methods(["GET", "PUT"])
 def doctor_profile_detail(request, user_id):
     """Get or update doctor profile by user ID"""
-    try:
-        if request.method == 'GET':
-            response = api_client._make_request(
-                'GET',
-                f'/api/doctors/profile/{user_id}',
-                token=None  # Public endpoint
-            )
-        elif request.method == 'PUT':
-            data = json.loads(request.body)
-            token = request.session.get('access_token')
+    if request.method == 'GET':
+        # Public endpoint
+        return proxy(request, f'/api/doctors/profile/{user_id}',
+                     max_age=getattr(settings, 'DOCTOR_PROFILE_MAX_AGE', 300))
 
-            # Debug logging
-            logger.info(f"PUT request for user {user_id}, token exists: {bool(token)}")
-
-            # Check if user is authenticated
-            if not token:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'Authentication required. Please login again.'
-                }, status=401)
-
-            response = api_client._make_request(
-                'PUT',
-                f'/api/doctors/profile/{user_id}',
-                data=data,
-                token=token
-            )
-
-        return JsonResponse(response)
-    except Exception as e:
-        logger.error(f"Error with doctor profile: {e}")
-        return JsonResponse({
-            'success': False,
-            'message': 'Error with doctor profile operation'
-        }, status=500)
+    token = request.session.get('access_token')
+    if not token:
+        return authentication_required()
+    return proxy(request, f'/api/doctors/profile/{user_id}', token=token)
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def doctor_profile_create(request):
     """Create new doctor profile"""
-    try:
-        data = json.loads(request.body)
-        token = request.session.get('access_token')
-
-        # Check if user is authenticated
-        if not token:
-            return JsonResponse({
-                'success': False,
-                'message': 'Authentication required. Please login again.'
-            }, status=401)
-
-        response = api_client._make_request(
-            'POST',
-            '/api/doctors/profile',
-            data=data,
-            token=token
-        )
-        return JsonResponse(response)
-    except Exception as e:
-        logger.error(f"Error creating doctor profile: {e}")
-        return JsonResponse({
-            'success': False,
-            'message': 'Error creating doctor profile'
-        }, status=500)
+    token = request.session.get('access_token')
+    if not token:
+        return authentication_required()
+    return proxy(request, '/api/doctors/profile', token=token)
 
 @csrf_exempt
 @require_http_methods(["GET", "POST", "PUT"])
 def doctor_my_profile(request):
     """Doctor's own profile management (GET, POST, PUT)"""
-    try:
-        token = request.session.get('access_token')
-
-        # Debug logging
-        logger.info(f"{request.method} request for my profile, token exists: {bool(token)}")
-
-        # Check if user is authenticated
-        if not token:
-            return JsonResponse({
-                'success': False,
-                'message': 'Authentication required. Please login again.'
-            }, status=401)
-
-        if request.method == 'GET':
-            response = api_client._make_request(
-                'GET',
-                '/api/doctors/my/profile',
-                token=token
-            )
-        elif request.method in ['POST', 'PUT']:
-            data = json.loads(request.body)
-
-            response = api_client._make_request(
-                request.method,
-                '/api/doctors/my/profile',
-                data=data,
-                token=token
-            )
-
-        return JsonResponse(response)
-    except Exception as e:
-        logger.error(f"Error with my doctor profile: {e}")
-        return JsonResponse({
-            'success': False,
-            'message': 'Error with doctor profile operation'
-        }, status=500)
+    token = request.session.get('access_token')
+    if not token:
+        return authentication_required()
+    return proxy(request, '/api/doctors/my/profile', token=token)
 
 
@@ -0,0 +1,92 @@
+"""
+WebSocket consumer for live topics (``ws/live/?topic=unread_count&topic=...``)
+
+Pages showing the unread badge also receive the user's notifications, relayed
+from the gateway's socket through ``utils.notification_relay``.
+"""
+
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from utils.live_updates import TICK, topic_group
+from utils.notification_relay import relay, user_group
+
+from .live import publisher, subscriptions
+
+logger = logging.getLogger(__name__)
+
+
+class LiveUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes each subscribed topic when its version changes
+
+    Updates loaded by any connection reach every watcher through the topic's
+    group; the connection's own ticker only drives loads that are due.
+    """
+
+    async def connect(self):
+        specs = parse_qs(self.scope.get('query_string', b'').decode()).get('topic', [])
+        # Off the shared sync thread, so a slow session read does not hold up
+        # other sockets' ticks and handshakes
+        self.subscriptions, self.token = await database_sync_to_async(self._resolve, thread_sensitive=False)(specs)
+        self.sent = {}
+        self.ticker = None
+        self.notifications = None
+        if not self.subscriptions:
+            await self.close(code=4403)
+            return
+        for name, key in self.subscriptions:
+            await self.channel_layer.group_add(topic_group(name, key), self.channel_name)
+        user_ids = [key for name, key in self.subscriptions if name == 'unread_count']
+        if user_ids and self.token:
+            self.notifications = user_ids[0]
+            await self.channel_layer.group_add(await relay.subscribe(self.notifications, self.token),
+                                               self.channel_name)
+        await self.accept()
+        self.ticker = asyncio.ensure_future(self._tick())
+
+    def _resolve(self, specs):
+        # The session is loaded lazily from the database, so read it off the event loop
+        session = self.scope.get('session') or {}
+        return subscriptions(session, specs), session.get('access_token')
+
+    async def disconnect(self, code):
+        if getattr(self, 'ticker', None) is not None:
+            self.ticker.cancel()
+        for name, key in getattr(self, 'subscriptions', []):
+            await self.channel_layer.group_discard(topic_group(name, key), self.channel_name)
+        if getattr(self, 'notifications', None) is not None:
+            await self.channel_layer.group_discard(user_group(self.notifications), self.channel_name)
+            await relay.unsubscribe(self.notifications)
+
+    async def _tick(self):
+        # Upstream loads can take up to the gateway timeout; run them in the
+        # thread pool rather than queueing every connection on one thread
+        refresh = sync_to_async(publisher.refresh, thread_sensitive=False)
+        while True:
+            for name, key in self.subscriptions:
+                try:
+                    entry = await refresh(name, key, token=self.token)
+                except Exception as e:
+                    logger.error(f"Live topic {name} refresh failed: {str(e)}")
+                    continue
+                if entry is not None:
+                    await self._send_entry(name, key, entry)
+            await asyncio.sleep(TICK)
+
+    async def notification_message(self, event):
+        await self.send_json({'topic': 'notification', 'key': None, 'data': event['message']})
+
+    async def live_update(self, event):
+        await self._send_entry(event['topic'], event['key'], event)
+
+    async def _send_entry(self, name, key, entry):
+        if self.sent.get((name, key)) == entry['version']:
+            return
+        self.sent[(name, key)] = entry['version']
+        await self.send_json({'topic': name, 'key': key, 'version': entry['version'], 'data': entry['data']})
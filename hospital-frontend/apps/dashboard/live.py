@@ -0,0 +1,102 @@
+"""
+Live topics pushed to open pages (see ``utils.live_updates``)
+
+* ``unread_count`` - the notification badge, keyed by user
+* ``retry_stats`` - notification retry statistics, admins only
+* ``dashboard`` - numeric dashboard counters, keyed ``admin`` or by doctor
+
+Pages ask for topics as ``name`` or ``name:key``; ``subscriptions`` drops the
+ones the session may not see and fills in the default keys.
+"""
+
+import logging
+
+from django.conf import settings
+
+from apps.analytics.views import ANALYTICS_ENDPOINTS, check_analytics_access
+from utils.api_client import APIClient
+from utils.live_updates import LivePublisher, LiveTopic
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_URL = 'http://localhost:3005/api/notifications'
+
+publisher = LivePublisher()
+
+
+def load_unread_count(user_id, token):
+    response = APIClient(token=token).get_direct(f'{NOTIFICATIONS_URL}/unread-count', params={'userId': user_id})
+    if not response.get('success'):
+        return None
+    return {'unread_count': (response.get('data') or {}).get('unreadCount', 0)}
+
+
+def load_retry_stats(key, token):
+    response = APIClient(token=token).get_direct(f'{NOTIFICATIONS_URL}/admin/retry-stats')
+    if not response.get('success'):
+        return None
+    return response.get('data') or {}
+
+
+def load_dashboard_counters(key, token):
+    endpoint = 'admin_dashboard' if key == 'admin' else 'doctor_dashboard'
+    api_client = APIClient(token=token)
+    method = getattr(api_client, ANALYTICS_ENDPOINTS[endpoint][0])
+    if key == 'admin':
+        response = method(token=token)
+    else:
+        response = method(token=token, doctor_id=key)
+    if not response.get('success'):
+        return None
+    dashboard = (response.get('data') or {}).get('dashboard') or {}
+    # Trend lists and nested breakdowns stay with the analytics API
+    return {name: value for name, value in dashboard.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+publisher.register(LiveTopic('unread_count', load_unread_count,
+                             interval=getattr(settings, 'LIVE_UNREAD_INTERVAL', 15)))
+publisher.register(LiveTopic('retry_stats', load_retry_stats,
+                             interval=getattr(settings, 'LIVE_RETRY_STATS_INTERVAL', 30)))
+publisher.register(LiveTopic('dashboard', load_dashboard_counters,
+                             interval=getattr(settings, 'LIVE_DASHBOARD_INTERVAL', 60)))
+
+
+def subscription_for(spec, session):
+    """``(name, key)`` for a requested ``name[:key]``, or ``None`` if not allowed"""
+    name, _, key = str(spec).partition(':')
+    user_role = session.get('user_role')
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    if name == 'unread_count':
+        return name, str(user_id)
+    if name == 'retry_stats':
+        return (name, None) if user_role == 'admin' else None
+    if name == 'dashboard':
+        key = key or ('admin' if user_role == 'admin' else str(user_id))
+        if key == 'admin':
+            return (name, key) if user_role == 'admin' else None
+        if user_role not in ('admin', 'staff', 'doctor'):
+            return None
+        if check_analytics_access('doctor_dashboard', key, user_role, str(user_id)) is not None:
+            return None
+        return name, key
+    return None
+
+
+def subscriptions(session, specs):
+    """Allowed, de-duplicated subscriptions for the requested topic specs"""
+    allowed = []
+    for spec in specs:
+        subscription = subscription_for(spec, session)
+        if subscription is not None and subscription not in allowed:
+            allowed.append(subscription)
+    return allowed
+
+
+def counters_changed(doctor_id=None):
+    """Push dashboard counters affected by an appointment change soon"""
+    publisher.mark_dirty('dashboard', 'admin')
+    if doctor_id:
+        publisher.mark_dirty('dashboard', str(doctor_id))
@@ -0,0 +1,11 @@
+"""
+WebSocket routes for the Dashboard app
+"""
+
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/live/', consumers.LiveUpdatesConsumer.as_asgi()),
+]
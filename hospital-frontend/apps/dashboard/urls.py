@@ -9,5 +9,6 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.DashboardView.as_view(), name='index'),
+    path('live/stream/', views.LiveUpdatesStreamView.as_view(), name='live_stream'),
     path('test-api/', test_views.APITestView.as_view(), name='test_api'),
 ]
@@ -2,12 +2,17 @@
 Views for Dashboard app
 """
 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views import View
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from utils.api_client import api_client
 from utils.decorators import login_required
+from utils.live_updates import event_stream
+from . import live
 import logging
 
 logger = logging.getLogger(__name__)
@@ -151,6 +156,32 @@ class DashboardView(View):
             logger.error(f"Error loading patient data: {str(e)}")
             return {'my_appointments': [], 'my_prescriptions': []}
 
+@method_decorator(login_required, name='dispatch')
+class LiveUpdatesStreamView(View):
+    """
+    Server-sent events fallback for live topics (``?topic=unread_count&topic=...``)
+
+    Used where the WebSocket cannot connect; each stream ends after
+    ``LIVE_SSE_DURATION`` seconds and the browser reconnects.  Only served
+    under ASGI and with ``LIVE_SSE_ENABLED``: a sync worker would be held for
+    the whole stream.
+    """
+
+    def get(self, request):
+        if not getattr(settings, 'LIVE_SSE_ENABLED', False) or not isinstance(request, ASGIRequest):
+            return JsonResponse({'success': False, 'message': 'Live updates stream is not available'}, status=404)
+
+        allowed = live.subscriptions(request.session, request.GET.getlist('topic'))
+        if not allowed:
+            return JsonResponse({'success': False, 'message': 'No live topics available'}, status=400)
+
+        stream = event_stream(live.publisher, allowed, token=request.session.get('access_token'),
+                              duration=getattr(settings, 'LIVE_SSE_DURATION', 300))
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 # Error handlers
 def handler404(request, exception):
     """Custom 404 error handler"""
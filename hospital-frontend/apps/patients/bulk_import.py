@@ -0,0 +1,517 @@
+"""
+Bulk patient import from CSV
+
+Onboarding a partner clinic means tens of thousands of patients, which the
+one-record create form cannot handle.  An import runs in two passes over the
+uploaded file:
+
+1. a streaming validation pass that counts rows and writes every invalid row
+   straight to the error report, and
+2. a processing pass that feeds valid rows to a bounded pool of workers, each
+   doing the same ``register`` -> ``create_patient`` pair as
+   ``PatientCreateView`` with retries and exponential backoff.
+
+Every row gets an idempotency key (``externalId`` or name + date of birth +
+phone).  Completed rows and registered accounts are recorded in the database
+(``apps.tasks.models.ImportedRow``), so re-running a file after a failure
+skips what already succeeded instead of creating duplicates.  A create that
+timed out may still have gone through upstream, so the row is recorded as
+uncertain and the patient is looked up (by account id, or phone and date of
+birth) before the create is tried again, in this run or the next.
+
+The import runs with the uploader's access token.  It is never written to
+the task row: the task payload holds a reference to a copy in the cache,
+where ``patient_import:`` entries are encrypted (``utils.encrypted_cache``),
+so the task worker must share the web workers' cache (CACHE_BACKEND=redis).
+If the gateway rejects the token part-way (it expired), the import stops and
+asks for the file to be uploaded again; the rows already imported are skipped
+on that run.
+
+An import is a ``patients.import`` background task (see ``apps.tasks``), so
+it runs in the task worker rather than the web process; the job's progress
+is stored on the task row and served by ``PatientImportStatusView``.
+"""
+
+import csv
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from apps.tasks import queue
+from apps.tasks.models import ImportedRow, Task
+from utils import dates
+from utils.api_client import api_client
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('fullName', 'dateOfBirth', 'gender', 'phone')
+OPTIONAL_COLUMNS = (
+    'externalId', 'email', 'street', 'ward', 'district', 'city', 'zipCode',
+    'bloodType', 'allergies', 'medicalHistory',
+    'emergencyName', 'emergencyPhone', 'emergencyRelationship', 'emergencyAddress',
+    'username', 'password',
+)
+GENDERS = ('male', 'female', 'other')
+BLOOD_TYPES = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+
+IMPORT_TASK = 'patients.import'
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+PROGRESS_INTERVAL = 1.0
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_PHONE_RE = re.compile(r'^\+?[\d\s().-]{8,20}$')
+
+
+def import_dir():
+    path = Path(settings.PATIENT_IMPORT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def error_report_path(job_id):
+    return import_dir() / f'{job_id}-errors.csv'
+
+
+def new_job(job_id, owner, filename):
+    return {
+        'id': job_id,
+        'owner': owner,
+        'filename': filename,
+        'status': 'queued',
+        'total': 0,
+        'valid': 0,
+        'processed': 0,
+        'created': 0,
+        'skipped': 0,
+        'failed': 0,
+        'message': '',
+        'finished_at': None,
+    }
+
+
+def get_job(job_id):
+    """Progress of an import job (the id of its task), or ``None``"""
+    if not str(job_id).isdigit():
+        return None
+    task = Task.objects.filter(pk=job_id, name=IMPORT_TASK).first()
+    if task is None:
+        return None
+    job = task.progress or new_job(task.pk, task.owner, task.payload.get('filename', ''))
+    if task.status == Task.FAILED and job['status'] not in ('completed', 'failed'):
+        # The worker died or the handler crashed before the importer could report
+        job = dict(job, status='failed', message='The import stopped unexpectedly')
+    return job
+
+
+def save_job(job):
+    queue.update_progress(job['id'], job)
+
+
+def idempotency_key(row):
+    """Stable key for a CSV row, independent of the file or job it came from"""
+    external_id = (row.get('externalId') or '').strip()
+    if external_id:
+        basis = f'ext:{external_id}'
+    else:
+        basis = '|'.join((
+            (row.get('fullName') or '').strip().lower(),
+            (row.get('dateOfBirth') or '').strip(),
+            re.sub(r'\D', '', row.get('phone') or ''),
+        ))
+    return hashlib.sha256(basis.encode('utf-8')).hexdigest()
+
+
+def build_payloads(row, created_by):
+    """
+    Validate a CSV row and build the ``create_patient`` / ``register`` payloads
+
+    Returns ``(patient_data, account_data, errors)``; ``account_data`` is
+    ``None`` when the row has no ``username``/``password``.
+    """
+    value = lambda key: (row.get(key) or '').strip()  # noqa: E731
+    errors = [f'{column} is required' for column in REQUIRED_COLUMNS if not value(column)]
+
+    birth = dates.parse_date(value('dateOfBirth'))
+    if value('dateOfBirth') and (birth is None or birth > date.today()):
+        errors.append('dateOfBirth is not a valid date')
+    gender = value('gender').lower()
+    if gender and gender not in GENDERS:
+        errors.append(f"gender must be one of {', '.join(GENDERS)}")
+    if value('phone') and not _PHONE_RE.match(value('phone')):
+        errors.append('phone is not a valid phone number')
+    if value('email') and not _EMAIL_RE.match(value('email')):
+        errors.append('email is not a valid address')
+    blood_type = value('bloodType').upper()
+    if blood_type and blood_type not in BLOOD_TYPES:
+        errors.append('bloodType is not a valid blood type')
+    wants_account = bool(value('username') or value('password'))
+    if wants_account and not (value('username') and value('password') and value('email')):
+        errors.append('username, password and email are required to create an account')
+    if errors:
+        return None, None, errors
+
+    patient_data = {
+        'fullName': value('fullName'),
+        'dateOfBirth': birth.isoformat(),
+        'gender': gender,
+        'phone': value('phone'),
+        'email': value('email') or None,
+        'address': {
+            'street': value('street'),
+            'ward': value('ward'),
+            'district': value('district'),
+            'city': value('city'),
+            'zipCode': value('zipCode') or None,
+        },
+        'bloodType': blood_type or None,
+        'allergies': value('allergies') or None,
+        'medicalHistory': value('medicalHistory') or None,
+        'emergencyContact': {
+            'name': value('emergencyName'),
+            'phone': value('emergencyPhone'),
+            'relationship': value('emergencyRelationship'),
+            'address': value('emergencyAddress') or None,
+        },
+        'createdByUserId': created_by,
+    }
+
+    account_data = None
+    if wants_account:
+        name_parts = patient_data['fullName'].split(' ', 1)
+        address = patient_data['address']
+        account_data = {
+            'username': value('username'),
+            'email': patient_data['email'],
+            'password': value('password'),
+            'role': 'patient',
+            'profile': {
+                'firstName': name_parts[0],
+                'lastName': name_parts[1] if len(name_parts) > 1 else '',
+                'phone': patient_data['phone'],
+                'dateOfBirth': patient_data['dateOfBirth'],
+                'address': f"{address['street']}, {address['ward']}, {address['district']}, {address['city']}",
+                'avatarUrl': '',
+            },
+        }
+    return patient_data, account_data, []
+
+
+class RetryableError(Exception):
+    """Upstream failure worth retrying (timeouts, 5xx, rate limiting)"""
+
+
+class SessionExpired(Exception):
+    """The gateway no longer accepts the uploader's access token"""
+
+
+def _is_auth_failure(response):
+    status = response.get('status_code') or response.get('status') or 0
+    message = str(response.get('message', '')).lower()
+    return status == 401 or ('token' in message and ('expired' in message or 'invalid' in message))
+
+
+def _is_retryable(response):
+    status = response.get('status_code') or response.get('status') or 0
+    message = str(response.get('message', '')).lower()
+    return (isinstance(status, int) and (status >= 500 or status == 429)) or 'timeout' in message or 'timed out' in message
+
+
+def backoff(attempt):
+    time.sleep(BACKOFF_BASE * 2 ** (attempt - 1) * (1 + random.random()))
+
+
+def call_with_retries(func, *args, attempts=MAX_ATTEMPTS, **kwargs):
+    """Call an APIClient method, retrying transient failures with jittered backoff"""
+    for attempt in range(1, attempts + 1):
+        try:
+            response = func(*args, **kwargs)
+            if response.get('success') or not _is_retryable(response):
+                return response
+            error = RetryableError(response.get('message', 'Upstream error'))
+        except Exception as e:
+            response, error = None, e
+        if attempt < attempts:
+            backoff(attempt)
+    if response is not None:
+        return response
+    raise error
+
+
+def _error_message(response):
+    message = response.get('message', 'Unknown error')
+    errors = response.get('errors') or []
+    return f"{message}: {', '.join(map(str, errors))}" if errors else message
+
+
+# Worker threads share the database; SQLite takes one writer at a time, so
+# row records are read and written one at a time (they are tiny next to the
+# gateway calls)
+_records_lock = threading.Lock()
+
+
+def _recorded(key):
+    with _records_lock:
+        return ImportedRow.objects.filter(scope=IMPORT_TASK, key=key).first()
+
+
+def _remember(key, task_id, **fields):
+    with _records_lock:
+        ImportedRow.objects.update_or_create(scope=IMPORT_TASK, key=key, defaults=dict(fields, task_id=task_id))
+
+
+def _digits(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def find_existing(token, patient_data):
+    """
+    Id of a patient the gateway already holds for ``patient_data``, or ``None``
+
+    Patients with a login account share its id; others are matched on phone
+    and date of birth.  Raises ``RetryableError`` when the lookup itself fails,
+    since creating the patient then could make a duplicate.
+    """
+    if patient_data.get('id'):
+        response = api_client.get_patient(token=token, patient_id=patient_data['id'])
+        found = [response.get('data')] if response.get('success') and response.get('data') else []
+    else:
+        response = api_client.get_patients(token=token, page=1, limit=20, search=patient_data['phone'])
+        found = [
+            row for row in ((response.get('data') or {}).get('patients') or [])
+            if _digits(row.get('phone')) == _digits(patient_data['phone'])
+            and str(row.get('dateOfBirth') or row.get('date_of_birth') or '')[:10] == patient_data['dateOfBirth']
+        ] if response.get('success') else []
+    if not response.get('success'):
+        if _is_auth_failure(response):
+            raise SessionExpired(_error_message(response))
+        if _is_retryable(response):
+            raise RetryableError(f'could not check for an earlier import: {_error_message(response)}')
+    return (found[0].get('id') or patient_data.get('id')) if found else None
+
+
+def import_row(token, patient_data, account_data, key, task_id=None):
+    """
+    Create one patient (and its login account); returns ``(outcome, message)``
+
+    ``outcome`` is ``'created'``, ``'skipped'`` (already imported) or ``'failed'``.
+    Raises ``SessionExpired`` when the gateway rejects ``token``.
+    """
+    record = _recorded(key)
+    if record is not None and record.result_id:
+        return 'skipped', f'already imported as {record.result_id}'
+
+    if account_data:
+        user_id = record.account_id if record is not None else ''
+        if not user_id:
+            response = call_with_retries(api_client.register, account_data)
+            if not response.get('success'):
+                return 'failed', f'account: {_error_message(response)}'
+            data = response.get('data') or {}
+            user_id = data.get('id') or (data.get('user') or {}).get('id')
+            if not user_id:
+                return 'failed', 'account: response is missing the user id'
+            # Remembered so a retry never registers the same person twice
+            _remember(key, task_id, account_id=user_id)
+        patient_data = dict(patient_data, id=user_id)
+
+    # An earlier run recorded this row without a result: its create may have landed
+    uncertain = record is not None
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if uncertain:
+            existing = find_existing(token, patient_data)
+            if existing:
+                _remember(key, task_id, result_id=existing)
+                return ('created', existing) if attempt > 1 else ('skipped', f'already imported as {existing}')
+        try:
+            response = api_client.create_patient(token=token, patient_data=patient_data)
+            settled = response.get('success') or not _is_retryable(response)
+        except Exception as e:
+            response, settled = {'success': False, 'message': str(e)}, False
+        if settled:
+            break
+        # The request may have been applied before the failure
+        uncertain = True
+        _remember(key, task_id)
+        if attempt < MAX_ATTEMPTS:
+            backoff(attempt)
+
+    if not response.get('success'):
+        if _is_auth_failure(response):
+            raise SessionExpired(_error_message(response))
+        return 'failed', _error_message(response)
+    patient_id = (response.get('data') or {}).get('id') or patient_data.get('id') or 'unknown'
+    _remember(key, task_id, result_id=patient_id)
+    return 'created', patient_id
+
+
+def token_key(token_ref):
+    return f"patient_import:token:{token_ref}"
+
+
+def stash_token(token):
+    """Keep the uploader's token in the encrypted cache until the import runs; returns its reference"""
+    token_ref = uuid.uuid4().hex
+    cache.set(token_key(token_ref), token, getattr(settings, 'PATIENT_IMPORT_TOKEN_TTL', 3600))
+    return token_ref
+
+
+def stashed_token(token_ref):
+    return cache.get(token_key(token_ref)) if token_ref else None
+
+
+def forget_token(token_ref):
+    if token_ref:
+        cache.delete(token_key(token_ref))
+
+
+def start_import(uploaded_file, token, user_id):
+    """Store the upload and queue the import task; returns the new job"""
+    source = import_dir() / f'{uuid.uuid4().hex}.csv'
+    with open(source, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    # The importer retries rows itself, so the task is not retried as a whole
+    task = queue.enqueue(IMPORT_TASK, {
+        'source': source.name,
+        'filename': uploaded_file.name,
+        'token_ref': stash_token(token),
+    }, owner=user_id)
+    return new_job(task.pk, user_id, uploaded_file.name)
+
+
+class PatientImporter:
+    """Runs one import job: validation pass, then the worker pool"""
+
+    def __init__(self, job, token, source, workers=None):
+        self.job = job
+        self.token = token
+        self.source = Path(source)
+        self.workers = workers or getattr(settings, 'PATIENT_IMPORT_WORKERS', 8)
+        self.lock = threading.Lock()
+        self.last_saved = 0.0
+        self.report = None
+        self.report_writer = None
+        self.expired = threading.Event()
+        # Row records point at the task that created them (jobs run outside a task have none)
+        is_task = str(job['id']).isdigit() and Task.objects.filter(pk=job['id']).exists()
+        self.task_id = int(job['id']) if is_task else None
+
+    def run(self):
+        try:
+            with open(error_report_path(self.job['id']), 'w', newline='', encoding='utf-8') as report:
+                self.report = report
+                self.report_writer = csv.writer(report)
+                self.report_writer.writerow(['line', 'fullName', 'dateOfBirth', 'phone', 'error'])
+                self.update(status='validating')
+                self.validate()
+                self.update(status='running')
+                self.process()
+            if self.expired.is_set():
+                raise SessionExpired(
+                    f"Your session expired after {self.job['created'] + self.job['skipped']} rows. "
+                    'Sign in and upload the same file again; imported rows will be skipped.')
+            self.update(status='completed', finished_at=timezone.now().isoformat(), force=True)
+        except Exception as e:
+            logger.error(f"Patient import {self.job['id']} failed: {str(e)}")
+            self.update(status='failed', message=str(e), finished_at=timezone.now().isoformat(), force=True)
+        finally:
+            self.source.unlink(missing_ok=True)
+
+    def rows(self):
+        """Yield ``(line, row)`` pairs, streaming the uploaded file"""
+        with open(self.source, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            for row in reader:
+                yield reader.line_num, row
+
+    def validate(self):
+        total = valid = 0
+        for line, row in self.rows():
+            total += 1
+            _, _, errors = build_payloads(row, self.job['owner'])
+            if errors:
+                self.record_error(line, row, '; '.join(errors))
+            else:
+                valid += 1
+        self.update(total=total, valid=valid, failed=total - valid, processed=total - valid, force=True)
+
+    def process(self):
+        # At most two rows per worker are in flight, so memory stays flat
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='patient-import') as executor:
+            for line, row in self.rows():
+                if self.expired.is_set():
+                    break
+                patient_data, account_data, errors = build_payloads(row, self.job['owner'])
+                if errors:
+                    continue
+                if len(in_flight) >= self.workers * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                in_flight.add(executor.submit(self.process_row, line, row, patient_data, account_data))
+            for future in in_flight:
+                future.result()
+
+    def process_row(self, line, row, patient_data, account_data):
+        try:
+            self.import_one(line, row, patient_data, account_data)
+        finally:
+            # Pool threads are not request threads, so nothing else would close
+            # their connections; the run_tasks process would leak them per job
+            connections.close_all()
+
+    def import_one(self, line, row, patient_data, account_data):
+        if self.expired.is_set():
+            return
+        try:
+            outcome, message = import_row(self.token, patient_data, account_data, idempotency_key(row),
+                                          task_id=self.task_id)
+        except SessionExpired:
+            # The row is retried by the next upload, so it is not counted
+            self.expired.set()
+            return
+        except Exception as e:
+            outcome, message = 'failed', str(e)
+        if outcome == 'failed':
+            self.record_error(line, row, message)
+        self.increment(outcome)
+
+    def record_error(self, line, row, message):
+        with self.lock:
+            self.report_writer.writerow([line, row.get('fullName', ''), row.get('dateOfBirth', ''), row.get('phone', ''), message])
+
+    def increment(self, outcome):
+        with self.lock:
+            self.job[outcome] += 1
+            self.job['processed'] += 1
+        self.update()
+
+    def update(self, force=False, **changes):
+        with self.lock:
+            self.job.update(changes)
+            now = time.monotonic()
+            # Progress is written at most once a second; state changes always
+            if force or changes or now - self.last_saved >= PROGRESS_INTERVAL:
+                self.last_saved = now
+                if self.report is not None and not self.report.closed:
+                    self.report.flush()
+                save_job(dict(self.job))
@@ -0,0 +1,59 @@
+"""
+Background tasks of the patients app (run by ``manage.py run_tasks``)
+"""
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from apps.tasks.queue import PRIORITY_HIGH, PRIORITY_LOW, PermanentError, task
+
+from . import bulk_import
+
+
+@task('patients.send_credentials', max_attempts=5, backoff=60, priority=PRIORITY_HIGH)
+def send_credentials(task, email, full_name, username, login_url, reset_url):
+    """
+    Email a newly created patient their login details
+
+    The password is never queued (task payloads are stored in the database);
+    the email points to the password reset page instead.
+    """
+    hospital = settings.HOSPITAL_SETTINGS.get('HOSPITAL_NAME', 'Hospital')
+    send_mail(
+        subject=f'Your {hospital} patient account',
+        message=(
+            f'Dear {full_name},\n\n'
+            f'A patient portal account has been created for you at {hospital}.\n\n'
+            f'Username: {username}\n'
+            f'Sign in: {login_url}\n\n'
+            f'Use the password given to you by our staff, or choose a new one at {reset_url}\n'
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[email],
+    )
+    return {'sent_to': email}
+
+
+@task(bulk_import.IMPORT_TASK, max_attempts=1, priority=PRIORITY_LOW, secret_fields=('token', 'token_ref'))
+def import_patients(task, source, filename, token_ref=None, token=None):
+    """
+    Run a bulk CSV import queued by ``PatientImportView``
+
+    The access token is read from the cache (``token_ref``); ``token`` is only
+    set on tasks queued before tokens were kept out of the payload.
+    """
+    job = bulk_import.new_job(task.pk, task.owner, filename)
+    token = token or bulk_import.stashed_token(token_ref)
+    if not token:
+        (bulk_import.import_dir() / source).unlink(missing_ok=True)
+        job.update(status='failed', finished_at=timezone.now().isoformat(),
+                   message='The import waited too long to start and your sign-in is no longer available. '
+                           'Upload the file again.')
+        bulk_import.save_job(job)
+        raise PermanentError(f'Access token for import {task.pk} is no longer in the cache')
+    try:
+        bulk_import.PatientImporter(job, token, bulk_import.import_dir() / source).run()
+    finally:
+        bulk_import.forget_token(token_ref)
+    return {key: job[key] for key in ('status', 'total', 'created', 'skipped', 'failed')}
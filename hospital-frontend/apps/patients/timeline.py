@@ -0,0 +1,198 @@
+"""
+Patient timeline: appointments, prescriptions and medical history by date
+
+Each upstream list is read as a lazy newest-first stream of events, one page
+at a time, and the streams are combined with ``heapq.merge`` (a heap-based
+k-way merge).  Producing the newest N events therefore only fetches the pages
+those events come from, and memory stays at about two pages per source no
+matter how long the history is.  The first page of every source is requested
+concurrently, and each source fetches its next page in the background while
+the current one is being consumed.
+
+"Load older" continuation tokens (``utils.cursors``) carry the key of the last
+event shown and, for every source, the upstream page its last shown event came
+from.  The next request resumes each stream at that page and only skips the
+events of that one page that were already shown, instead of re-reading every
+source from the newest event.
+"""
+
+import heapq
+import logging
+from itertools import islice
+
+from utils import dates
+from utils.cursors import decode_cursor, encode_cursor
+from utils.export import field
+
+logger = logging.getLogger(__name__)
+
+#: Events per timeline page
+PAGE_SIZE = 25
+
+#: Rows requested per upstream page
+SOURCE_PAGE_SIZE = 20
+
+
+def event_key(event):
+    return (event['at'], event['kind'], event['id'])
+
+
+def timestamp(value):
+    """Sortable wall-clock timestamp for an upstream date value, or None"""
+    parsed = dates.parse_datetime(value)
+    return parsed.strftime('%Y-%m-%dT%H:%M:%S') if parsed else None
+
+
+class Source:
+    """
+    One upstream list as a lazy newest-first stream of timeline events
+
+    ``fetch_page(page, limit)`` returns a gateway response whose rows are in
+    ``data[key]`` (or ``data`` itself when it is a list).  Paged upstreams must
+    return rows newest first; unpaged ones may be in any order.
+    ``normalize(row)`` turns a row into an event dict or None to drop it;
+    rows without a usable date are dropped too.
+    """
+
+    def __init__(self, name, fetch_page, key, normalize, page_size=SOURCE_PAGE_SIZE):
+        self.name = name
+        self.fetch_page = fetch_page
+        self.key = key
+        self.normalize = normalize
+        self.page_size = page_size
+        self.failed = False
+        self.page_of = {}
+        self._executor = None
+        self._first = None
+        self._start_page = 1
+
+    def start(self, executor, page=1):
+        """Request the first page to read (``page``) in the background"""
+        self._executor = executor
+        self._start_page = page
+        self._first = executor.submit(self.fetch_page, page, self.page_size)
+
+    def _rows(self, page, response):
+        if not response.get('success'):
+            logger.error(f"Timeline {self.name} page {page} failed: {response.get('message', 'Unknown error')}")
+            self.failed = True
+            return [], False
+
+        data = response.get('data') or []
+        if isinstance(data, list):
+            return data, False
+        rows = data.get(self.key) or []
+        pagination = data.get('pagination') or {}
+        total_pages = pagination.get('totalPages') or pagination.get('pages')
+        has_more = pagination.get('hasNext', page < total_pages if total_pages else False)
+        return rows, bool(rows) and bool(has_more)
+
+    def events(self, before=None):
+        """
+        Yield events newest first from the start page, skipping those at or
+        after ``before``; ``page_of`` maps each yielded event's key to its page
+        """
+        page = self._start_page
+        pending = self._first
+        while pending is not None:
+            try:
+                rows, has_more = self._rows(page, pending.result())
+            except Exception as e:
+                logger.error(f"Timeline {self.name} page {page} failed: {str(e)}")
+                self.failed = True
+                return
+
+            # Read ahead one page while this one is merged
+            pending = self._executor.submit(self.fetch_page, page + 1, self.page_size) if has_more else None
+
+            batch = [event for event in map(self.normalize, rows) if event and event['at']]
+            batch.sort(key=event_key, reverse=True)
+            for event in batch:
+                if before is None or event_key(event) < before:
+                    self.page_of[event_key(event)] = page
+                    yield event
+            page += 1
+
+
+def build_timeline(sources, executor, cursor=None, limit=PAGE_SIZE):
+    """
+    The newest ``limit`` events across ``sources``, older than ``cursor``
+
+    Returns ``(events, next_cursor, failed_source_names)``.  Raises
+    ``ValueError`` for a malformed cursor.
+    """
+    before, pages = _read_cursor(cursor)
+
+    for source in sources:
+        source.start(executor, pages.get(source.name, 1))
+    merged = heapq.merge(*(source.events(before) for source in sources), key=event_key, reverse=True)
+    events = list(islice(merged, limit + 1))
+
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        # A source that shows nothing on this page resumes where it did before
+        for event in events:
+            for source in sources:
+                if event_key(event) in source.page_of:
+                    pages[source.name] = source.page_of[event_key(event)]
+        next_cursor = encode_cursor({'before': list(event_key(events[-1])), 'pages': pages})
+    for event in events:
+        event['at_display'] = dates.format_datetime(event['at'], 'd/m/Y H:i')
+    return events, next_cursor, [source.name for source in sources if source.failed]
+
+
+def _read_cursor(cursor):
+    """``(before_key, {source name: page})`` from a continuation token"""
+    value = decode_cursor(cursor)
+    if value is None:
+        return None, {}
+    if not isinstance(value, dict) or not isinstance(value.get('before'), list):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    pages = value.get('pages') or {}
+    if not isinstance(pages, dict) or not all(isinstance(page, int) and page >= 1 for page in pages.values()):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(value['before']), dict(pages)
+
+
+def appointment_event(row):
+    if not row.get('id'):
+        return None
+    doctor = field('doctorName', 'doctor_name')(row)
+    kind = field('appointmentType', 'appointment_type', 'type')(row) or 'appointment'
+    scheduled = field('scheduledDate', 'scheduled_date')(row)
+    if not scheduled:
+        day = field('appointmentDate', 'appointment_date')(row)
+        scheduled = f"{day}T{field('appointmentTime', 'appointment_time')(row) or '00:00'}" if day else None
+    return {
+        'kind': 'appointment',
+        'id': str(row.get('id') or ''),
+        'at': timestamp(scheduled),
+        'title': f"{kind.title()} with {doctor}" if doctor else kind.title(),
+        'detail': row.get('reason') or '',
+        'status': row.get('status') or '',
+    }
+
+
+def prescription_event(row):
+    if not row.get('id'):
+        return None
+    return {
+        'kind': 'prescription',
+        'id': str(row.get('id') or ''),
+        'at': timestamp(field('issuedDate', 'issued_date', 'createdAt', 'created_at')(row)),
+        'title': f"Prescription {field('prescriptionNumber', 'prescription_number')(row) or ''}".strip(),
+        'detail': row.get('diagnosis') or '',
+        'status': row.get('status') or '',
+    }
+
+
+def history_event(row):
+    return {
+        'kind': 'history',
+        'id': str(row.get('id') or ''),
+        'at': timestamp(field('diagnosedDate', 'diagnosed_date', 'createdAt', 'created_at')(row)),
+        'title': row.get('conditionName') or 'Medical history entry',
+        'detail': row.get('notes') or '',
+        'status': row.get('status') or '',
+    }
@@ -7,10 +7,16 @@ urlpatterns = [
     # Patient management
     path('', views.PatientListView.as_view(), name='list'),
     path('create/', views.PatientCreateView.as_view(), name='create'),
+    path('import/', views.PatientImportView.as_view(), name='import'),
+    path('import/<int:job_id>/status/', views.PatientImportStatusView.as_view(), name='import_status'),
+    path('import/<int:job_id>/errors/', views.PatientImportErrorsView.as_view(), name='import_errors'),
     path('<str:patient_id>/', views.PatientDetailView.as_view(), name='detail'),
     path('<str:patient_id>/update/', views.PatientUpdateView.as_view(), name='update'),
     path('<str:patient_id>/delete/', views.PatientDeleteView.as_view(), name='delete'),
     path('<str:patient_id>/medical-history/', views.PatientMedicalHistoryView.as_view(), name='medical_history'),
+    path('<str:patient_id>/history/', views.PatientHistoryPanelView.as_view(), name='history_panel'),
+    path('<str:patient_id>/visit-summary/', views.PatientVisitSummaryView.as_view(), name='visit_summary'),
+    path('<str:patient_id>/timeline/', views.PatientTimelineView.as_view(), name='timeline'),
 
     # AJAX endpoints
     path('api/search/', views.PatientSearchView.as_view(), name='search'),
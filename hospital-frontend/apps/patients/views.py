@@ -1,19 +1,96 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.views import View
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.core.cache import cache
 from django.core.paginator import Paginator
 from utils.decorators import (
     login_required,
     role_required
 )
 from django.utils.decorators import method_decorator
-from utils.api_client import api_client
+from utils.api_client import APIClient, api_client
+from utils.records import PatientRecord
+from utils.presentation import format_address, present_patients
+from utils import dates
+from utils.export import export_response, field, iter_pages, requested_format
+from utils.cursors import paginate
+from utils.fragments import is_fragment_request, render_list
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.tasks import queue
+from . import bulk_import, timeline
 
 logger = logging.getLogger(__name__)
 
+HISTORY_PAGE_SIZE = 20
+HISTORY_CACHE_TTL = 60
+PATIENT_INDEX_TTL = 60
+
+
+HISTORY_GENERATION_KEY = 'patients:history:generation'
+PATIENT_INDEX_GENERATION_KEY = 'patients:index:generation'
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def history_cache_key(request, patient_id):
+    # Per user: the upstream decides what each token may see.  The generation
+    # and the patient's version let forget_history() drop every user's copy
+    version_key = f"patients:history:version:{patient_id}"
+    versions = cache.get_many([HISTORY_GENERATION_KEY, version_key])
+    return (f"patients:history:g{versions.get(HISTORY_GENERATION_KEY, 0)}:v{versions.get(version_key, 0)}:"
+            f"{request.session.get('user_id')}:{patient_id}")
+
+
+def forget_history(patient_id=None):
+    """Drop the cached medical history of a patient (or of all) for every user"""
+    bump_generation(HISTORY_GENERATION_KEY if patient_id is None else f"patients:history:version:{patient_id}")
+
+
+def patient_index_key(request, search, limit):
+    generation = cache.get(PATIENT_INDEX_GENERATION_KEY, 0)
+    return f"patients:index:g{generation}:{request.session.get('user_id')}:{limit}:{search.lower()}"
+
+
+def forget_patient_index():
+    """Drop every cached patient search result"""
+    bump_generation(PATIENT_INDEX_GENERATION_KEY)
+
+
+def medical_history(request, patient_id):
+    """
+    The patient's whole medical history as a gateway-style response
+
+    The upstream endpoint has no paging, so the list is kept for a minute to
+    make later panel pages and timeline requests cheap.
+    """
+    key = history_cache_key(request, patient_id)
+    history = cache.get(key)
+    if history is None:
+        response = api_client.get_patient_medical_history(token=request.session.get('access_token'), patient_id=patient_id)
+        if not response.get('success'):
+            return response
+        history = response.get('data') or []
+        if response.get('stale'):
+            return response
+        cache.set(key, history, getattr(settings, 'PATIENT_HISTORY_CACHE_TTL', HISTORY_CACHE_TTL))
+    return {'success': True, 'data': history}
+
+
+def history_sort_key(entry):
+    return (entry.get('diagnosedDate') or entry.get('createdAt') or '', str(entry.get('id') or ''))
+
+
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')  # Patients không xem patients list
 class PatientListView(View):
@@ -32,6 +109,9 @@ class PatientListView(View):
         sort_order = request.GET.get('sort_order', 'asc')
         limit = 10
 
+        if requested_format(request):
+            return self.export(request, token, search, sort_by, sort_order)
+
         try:
             # Get patients from API
             response = api_client.get_patients(
@@ -44,12 +124,10 @@ class PatientListView(View):
             )
 
             if response.get('success'):
-                patients_data = response.get('data', {})
-                patients = patients_data.get('patients', [])
-                pagination = patients_data.get('pagination', {})
+                patients, pagination = PatientRecord.decode_page(response, 'patients')
 
                 context = {
-                    'patients': patients,
+                    'patients': present_patients(patients),
                     'pagination': pagination,
                     'search': search,
                     'sort_by': sort_by,
@@ -57,15 +135,45 @@ class PatientListView(View):
                     'current_page': page,
                 }
 
-                return render(request, 'patients/list.html', context)
+                return render_list(request, 'patients/list.html', 'patients/partials/list_results.html', context)
             else:
                 messages.error(request, f"Failed to load patients: {response.get('message', 'Unknown error')}")
-                return render(request, 'patients/list.html', {'patients': [], 'pagination': {}})
+                return render_list(request, 'patients/list.html', 'patients/partials/list_results.html',
+                                   {'patients': [], 'pagination': {}})
 
         except Exception as e:
             logger.error(f"Error loading patients: {str(e)}")
             messages.error(request, 'Failed to load patients. Please try again.')
-            return render(request, 'patients/list.html', {'patients': [], 'pagination': {}})
+            return render_list(request, 'patients/list.html', 'patients/partials/list_results.html',
+                               {'patients': [], 'pagination': {}})
+
+    EXPORT_COLUMNS = (
+        ('Patient code', field('patientCode', 'patient_code')),
+        ('Full name', field('fullName', 'full_name')),
+        ('Date of birth', lambda row: dates.format_date(field('dateOfBirth', 'date_of_birth')(row), 'Y-m-d')),
+        ('Gender', 'gender'),
+        ('Phone', 'phone'),
+        ('Email', 'email'),
+        ('Blood type', field('bloodType', 'blood_type')),
+        ('Address', lambda row: format_address(row.get('address'))),
+        ('Allergies', 'allergies'),
+        ('Created', lambda row: dates.format_date(field('createdAt', 'created_at')(row), 'Y-m-d')),
+    )
+
+    def export(self, request, token, search, sort_by, sort_order):
+        """Stream every patient matching the list filters as CSV/XLSX"""
+        def fetch_page(page, limit):
+            return api_client.get_patients(
+                token=token,
+                page=page,
+                limit=limit,
+                search=search if search else None,
+                sort_by=sort_by,
+                sort_order=sort_order
+            )
+
+        rows = iter_pages(fetch_page, 'patients')
+        return export_response(request, rows, self.EXPORT_COLUMNS, 'patients')
 
 @method_decorator(login_required, name='dispatch')
 class PatientDetailView(View):
@@ -86,31 +194,14 @@ class PatientDetailView(View):
             logger.info(f"Patient API response success: {response.get('success')}")
 
             if response.get('success'):
-                patient = response.get('data')
+                patient = PatientRecord.from_dict(response.get('data') or {})
+                present_patients([patient], date_format='F d, Y')
                 logger.info(f"Patient data loaded: {patient.get('fullName')}, DOB: {patient.get('dateOfBirth')}")
 
-                # Get medical history
-                history_response = api_client.get_patient_medical_history(token=token, patient_id=patient_id)
-                medical_history = history_response.get('data', []) if history_response.get('success') else []
-                logger.info(f"Medical history loaded: {len(medical_history) if medical_history else 0} records")
-
-                # Get visit summary
-                summary_response = api_client.get_patient_visit_summary(token=token, patient_id=patient_id)
-                visit_summary = summary_response.get('data', {}) if summary_response.get('success') else {}
-                logger.info(f"Visit summary loaded: {visit_summary}")
-
-                # Ensure visit_summary has default values if API failed or data is missing
-                if not visit_summary or not isinstance(visit_summary, dict):
-                    visit_summary = {}
-
-                visit_summary.setdefault('totalAppointments', 0)
-                visit_summary.setdefault('activePrescriptions', 0)
-                logger.info(f"Final visit_summary: {visit_summary}")
-
+                # Medical history and the visit summary load as separate panels
+                # (PatientHistoryPanelView / PatientVisitSummaryView) once the page is shown
                 context = {
                     'patient': patient,
-                    'medical_history': medical_history,
-                    'visit_summary': visit_summary,
                 }
 
                 return render(request, 'patients/detail.html', context)
@@ -125,6 +216,118 @@ class PatientDetailView(View):
             messages.error(request, 'Failed to load patient details. Please try again.')
             return redirect('patients:list')
 
+@method_decorator(login_required, name='dispatch')
+class PatientHistoryPanelView(View):
+    """Medical history panel of the patient detail page, one cursor page at a time"""
+
+    def get(self, request, patient_id):
+        context = {'patient_id': patient_id, 'cursor': request.GET.get('cursor', '')}
+
+        try:
+            response = medical_history(request, patient_id)
+            if not response.get('success'):
+                context['error'] = response.get('message', 'Failed to load medical history')
+                return render(request, 'patients/partials/history_panel.html', context, status=502)
+            history = response['data']
+
+            entries, next_cursor = paginate(history, history_sort_key, context['cursor'] or None, HISTORY_PAGE_SIZE)
+        except ValueError:
+            context['error'] = 'Invalid page cursor'
+            return render(request, 'patients/partials/history_panel.html', context, status=400)
+        except Exception as e:
+            logger.error(f"Error loading medical history for patient {patient_id}: {str(e)}")
+            context['error'] = 'Failed to load medical history'
+            return render(request, 'patients/partials/history_panel.html', context, status=502)
+
+        for entry in entries:
+            entry['diagnosed_display'] = dates.format_date(entry.get('diagnosedDate'), 'M d, Y')
+        context.update(entries=entries, next_cursor=next_cursor)
+        response = render(request, 'patients/partials/history_panel.html', context)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+@method_decorator(login_required, name='dispatch')
+class PatientVisitSummaryView(View):
+    """Visit counters for the patient detail page"""
+
+    def get(self, request, patient_id):
+        token = request.session.get('access_token')
+
+        try:
+            response = api_client.get_patient_visit_summary(token=token, patient_id=patient_id)
+        except Exception as e:
+            logger.error(f"Error loading visit summary for patient {patient_id}: {str(e)}")
+            return JsonResponse({'success': False, 'message': 'Failed to load visit summary'}, status=502)
+
+        if not response.get('success'):
+            return JsonResponse({'success': False, 'message': response.get('message', 'Failed to load visit summary')}, status=502)
+
+        visit_summary = response.get('data')
+        if not isinstance(visit_summary, dict):
+            visit_summary = {}
+        visit_summary.setdefault('totalAppointments', 0)
+        visit_summary.setdefault('activePrescriptions', 0)
+        return JsonResponse({'success': True, 'data': visit_summary})
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')
+class PatientTimelineView(View):
+    """Appointments, prescriptions and medical history of one patient, newest first"""
+
+    def get(self, request, patient_id):
+        token = request.session.get('access_token')
+        client = APIClient(token=token)
+        fragment = is_fragment_request(request)
+
+        def appointments_page(page, limit):
+            return client.get_direct(f'http://localhost:3003/api/appointments/patient/{patient_id}',
+                                     params={'page': page, 'limit': limit})
+
+        def prescriptions_page(page, limit):
+            return api_client.get_prescriptions(token, patientId=patient_id, page=page, limit=limit,
+                                                sortBy='issued_date', sortOrder='desc')
+
+        sources = [
+            timeline.Source('appointments', appointments_page, 'appointments', timeline.appointment_event),
+            timeline.Source('prescriptions', prescriptions_page, 'prescriptions', timeline.prescription_event),
+            timeline.Source('medical history', lambda page, limit: medical_history(request, patient_id),
+                            'history', timeline.history_event),
+        ]
+
+        executor = ThreadPoolExecutor(max_workers=len(sources) + 1)
+        try:
+            # The header is only needed for the full page; fetch it alongside the sources
+            patient_future = None if fragment else executor.submit(
+                api_client.get_patient, token=token, patient_id=patient_id)
+            events, next_cursor, failed = timeline.build_timeline(sources, executor, request.GET.get('cursor'))
+            patient_response = patient_future.result() if patient_future else None
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid timeline cursor'}, status=400)
+        except Exception as e:
+            logger.error(f"Error building timeline for patient {patient_id}: {str(e)}")
+            if fragment:
+                return JsonResponse({'success': False, 'message': 'Failed to load the timeline'}, status=502)
+            messages.error(request, 'Failed to load the patient timeline. Please try again.')
+            return redirect('patients:detail', patient_id=patient_id)
+        finally:
+            # Abandoned read-ahead pages are not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        context = {'patient_id': patient_id, 'events': events, 'next_cursor': next_cursor, 'failed_sources': failed}
+        if fragment:
+            response = render(request, 'patients/partials/timeline_events.html', context)
+            response['Cache-Control'] = 'no-store'
+            return response
+
+        if not patient_response.get('success'):
+            messages.error(request, f"Patient not found: {patient_response.get('message', 'Unknown error')}")
+            return redirect('patients:list')
+        context['patient'] = PatientRecord.from_dict(patient_response.get('data') or {})
+        return render(request, 'patients/timeline.html', context)
+
+
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff', 'doctor']), name='dispatch')  # Chỉ admin/staff/doctor tạo patient
 class PatientCreateView(View):
@@ -227,8 +430,19 @@ class PatientCreateView(View):
                                 patient_code = patient.get('patientCode')
 
                                 if send_credentials:
-                                    logger.info(f"Should send credentials to {patient_data['email']} (not implemented yet)")
-
+                                    # Sent by the task worker so SMTP never blocks the form
+                                    try:
+                                        queue.enqueue('patients.send_credentials', {
+                                            'email': patient_data['email'],
+                                            'full_name': patient_data['fullName'],
+                                            'username': username,
+                                            'login_url': request.build_absolute_uri(reverse('authentication:login')),
+                                            'reset_url': request.build_absolute_uri(reverse('authentication:forgot_password')),
+                                        }, owner=user_id)
+                                    except Exception as e:
+                                        logger.error(f"Failed to queue credentials email for {patient_data['email']}: {str(e)}")
+
+                                forget_patient_index()
                                 messages.success(request, f"Patient {patient_name} created successfully with code {patient_code}. Login account also created with username '{username}'.")
                                 return redirect('patients:detail', patient_id=patient.get('id'))
                             else:
@@ -255,6 +469,7 @@ class PatientCreateView(View):
                 patient = response.get('data')
                 patient_name = patient.get('fullName')
                 patient_code = patient.get('patientCode')
+                forget_patient_index()
                 messages.success(request, f"Patient {patient_name} created successfully with code {patient_code}")
                 return redirect('patients:detail', patient_id=patient.get('id'))
             else:
@@ -270,6 +485,85 @@ class PatientCreateView(View):
             messages.error(request, 'Failed to create patient. Please try again.')
             return render(request, 'patients/create.html', {'form_data': request.POST})
 
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff']), name='dispatch')
+class PatientImportView(View):
+    """Bulk patient import from a CSV upload"""
+
+    def get(self, request):
+        return render(request, 'patients/import.html', {
+            'required_columns': bulk_import.REQUIRED_COLUMNS,
+            'optional_columns': bulk_import.OPTIONAL_COLUMNS,
+            'job': _owned_import_job(request, request.GET.get('job', '')),
+        })
+
+    def post(self, request):
+        token = request.session.get('access_token')
+        user_id = request.session.get('user_id')
+
+        if not token or not user_id:
+            messages.error(request, 'Please login to import patients')
+            return redirect('authentication:login')
+
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV file to import')
+            return redirect('patients:import')
+        if not upload.name.lower().endswith('.csv'):
+            messages.error(request, 'Only CSV files can be imported')
+            return redirect('patients:import')
+        if upload.size > settings.PATIENT_IMPORT_MAX_UPLOAD:
+            messages.error(request, 'The file is too large to import')
+            return redirect('patients:import')
+
+        try:
+            job = bulk_import.start_import(upload, token, user_id)
+        except Exception as e:
+            logger.error(f"Error starting patient import: {str(e)}")
+            messages.error(request, 'Failed to start the import. Please try again.')
+            return redirect('patients:import')
+
+        messages.success(request, f"Import of {upload.name} queued")
+        return redirect(f"{reverse('patients:import')}?job={job['id']}")
+
+
+def _owned_import_job(request, job_id):
+    job = bulk_import.get_job(job_id)
+    if not job or (str(job['owner']) != str(request.session.get('user_id')) and request.session.get('user_role') != 'admin'):
+        return None
+    return job
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff']), name='dispatch')
+class PatientImportStatusView(View):
+    """AJAX progress of a bulk import job"""
+
+    def get(self, request, job_id):
+        job = _owned_import_job(request, job_id)
+        if not job:
+            return JsonResponse({'success': False, 'message': 'Import not found'}, status=404)
+        data = {key: value for key, value in job.items() if key != 'owner'}
+        data['has_errors'] = job['failed'] > 0
+        return JsonResponse({'success': True, 'data': data})
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'staff']), name='dispatch')
+class PatientImportErrorsView(View):
+    """Download the failed rows of a bulk import as CSV"""
+
+    def get(self, request, job_id):
+        job = _owned_import_job(request, job_id)
+        path = bulk_import.error_report_path(job_id) if job else None
+        if not path or not path.exists():
+            raise Http404('Import not found')
+        response = FileResponse(open(path, 'rb'), as_attachment=True,
+                                filename=f"patient-import-{job_id}-errors.csv", content_type='text/csv')
+        response['Cache-Control'] = 'no-store'
+        return response
+
 @method_decorator(login_required, name='dispatch')
 class PatientUpdateView(View):
     """Patient update view"""
@@ -325,10 +619,10 @@ class PatientUpdateView(View):
             # Address (only if any field is provided)
             address_fields = ['street', 'ward', 'district', 'city', 'zipCode']
             address_data = {}
-            for field in address_fields:
-                value = request.POST.get(field, '').strip()
+            for name in address_fields:
+                value = request.POST.get(name, '').strip()
                 if value:
-                    address_data[field] = value
+                    address_data[name] = value
 
             if address_data:
                 patient_data['address'] = address_data
@@ -345,10 +639,10 @@ class PatientUpdateView(View):
             # Emergency contact (only if any field is provided)
             emergency_fields = ['emergencyName', 'emergencyPhone', 'emergencyRelationship', 'emergencyAddress']
             emergency_data = {}
-            for field in emergency_fields:
-                value = request.POST.get(field, '').strip()
+            for name in emergency_fields:
+                value = request.POST.get(name, '').strip()
                 if value:
-                    key = field.replace('emergency', '').lower()
+                    key = name.replace('emergency', '').lower()
                     if key == 'name':
                         key = 'name'
                     elif key == 'phone':
@@ -367,6 +661,7 @@ class PatientUpdateView(View):
 
             if response.get('success'):
                 patient = response.get('data')
+                forget_patient_index()
                 messages.success(request, f"Patient {patient.get('fullName')} updated successfully")
                 return redirect('patients:detail', patient_id=patient_id)
             else:
@@ -406,6 +701,7 @@ class PatientDeleteView(View):
             response = api_client.delete_patient(token=token, patient_id=patient_id)
 
             if response.get('success'):
+                forget_patient_index()
                 return JsonResponse({'success': True, 'message': 'Patient deleted successfully'})
             else:
                 return JsonResponse({'success': False, 'message': response.get('message', 'Failed to delete patient')})
@@ -455,6 +751,11 @@ class PatientSearchView(View):
         if not search:
             return JsonResponse({'success': True, 'data': []})
 
+        key = patient_index_key(request, search, limit)
+        search_results = cache.get(key)
+        if search_results is not None:
+            return JsonResponse({'success': True, 'data': search_results})
+
         try:
             response = api_client.get_patients(
                 token=token,
@@ -477,6 +778,8 @@ class PatientSearchView(View):
                         'dateOfBirth': patient.get('dateOfBirth'),
                     })
 
+                if not response.get('stale'):
+                    cache.set(key, search_results, getattr(settings, 'PATIENT_INDEX_TTL', PATIENT_INDEX_TTL))
                 return JsonResponse({'success': True, 'data': search_results})
             else:
                 return JsonResponse({'success': False, 'message': response.get('message', 'Search failed')})
@@ -507,6 +810,7 @@ class PatientMedicalHistoryView(View):
             )
 
             if response.get('success'):
+                forget_history(patient_id)
                 return JsonResponse({'success': True, 'message': 'Medical history added successfully'})
             else:
                 return JsonResponse({'success': False, 'message': response.get('message', 'Failed to add medical history')})
@@ -514,4 +818,3 @@ class PatientMedicalHistoryView(View):
         except Exception as e:
             logger.error(f"Error adding medical history for patient {patient_id}: {str(e)}")
             return JsonResponse({'success': False, 'message': 'Failed to add medical history. Please try again.'})
-// Updated: Mon, Sep  8, 2025 12:57:21 AM
@@ -3,6 +3,8 @@ from django.views import View
 from django.views.generic import TemplateView
 from django.utils.decorators import method_decorator
 from django.contrib import messages
+from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from utils.decorators import (
@@ -13,58 +15,45 @@ from utils.decorators import (
     read_only_for_role
 )
 from utils.api_client import APIClient
+from utils.records import PatientRecord, PrescriptionRecord
+from utils.presentation import batch_ages, present_patients
+from utils import dates
+from utils.export import export_response, field, iter_pages, requested_format
+from utils.bulk_actions import BulkAction, bulk_action_response, bulk_option
+from utils.fragments import is_fragment_request, render_list
+from apps.analytics.views import analytics_cache
 import logging
 import json
-from datetime import datetime, timedelta, date
-import re
+import threading
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def calculate_age(birth_date):
-    """Calculate age from birth date string"""
-    if not birth_date:
-        return None
+MEDICATION_CATALOG_KEY = 'prescriptions:medication_catalog'
+MEDICATION_CATALOG_TTL = 300
 
-    try:
-        # Handle different date formats
-        if isinstance(birth_date, str):
-            # Try ISO format first (YYYY-MM-DD)
-            if re.match(r'\d{4}-\d{2}-\d{2}', birth_date):
-                birth_date = datetime.strptime(birth_date[:10], '%Y-%m-%d').date()
-            # Try DD/MM/YYYY format
-            elif re.match(r'\d{2}/\d{2}/\d{4}', birth_date):
-                birth_date = datetime.strptime(birth_date, '%d/%m/%Y').date()
-            # Try MM/DD/YYYY format
-            elif re.match(r'\d{2}/\d{2}/\d{4}', birth_date):
-                birth_date = datetime.strptime(birth_date, '%m/%d/%Y').date()
-            else:
-                return None
-        elif isinstance(birth_date, datetime):
-            birth_date = birth_date.date()
-        elif not isinstance(birth_date, date):
-            return None
 
-        today = date.today()
-        age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-        return age
-    except (ValueError, TypeError):
-        return None
+def medication_catalog(api_client, token):
+    """
+    Medication names keyed by code
 
-def get_patient_age(patient):
-    """Get patient age from patient object"""
-    if not patient:
-        return None
+    Cached for ``MEDICATION_CATALOG_TTL``; ``manage.py consume_events`` drops
+    it when a medication changes.  An upstream failure returns ``{}`` and is
+    not cached.
+    """
+    catalog = cache.get(MEDICATION_CATALOG_KEY)
+    if catalog is not None:
+        return catalog
 
-    # Try direct age field first
-    if isinstance(patient, dict):
-        if 'age' in patient and patient['age']:
-            return patient['age']
-        if 'dateOfBirth' in patient and patient['dateOfBirth']:
-            return calculate_age(patient['dateOfBirth'])
-        if 'date_of_birth' in patient and patient['date_of_birth']:
-            return calculate_age(patient['date_of_birth'])
-
-    return None
+    response = api_client._make_request('GET', '/api/medications', token=token)
+    if not response.get('success'):
+        logger.error(f"Failed to get medications: {response.get('message', 'Unknown error')}")
+        return {}
+    catalog = {med.get('medication_code'): med.get('medication_name')
+               for med in response.get('data', {}).get('medications', []) if med.get('medication_code')}
+    if not response.get('stale'):
+        cache.set(MEDICATION_CATALOG_KEY, catalog, getattr(settings, 'MEDICATION_CATALOG_TTL', MEDICATION_CATALOG_TTL))
+    return catalog
 
 @method_decorator(login_required, name='dispatch')
 @method_decorator(role_required(['admin', 'staff', 'doctor', 'patient']), name='dispatch')
@@ -106,49 +95,43 @@ class PrescriptionListView(View):
 
             # Get prescriptions from API
             token = request.session.get('access_token')
+            if requested_format(request):
+                return self.export(request, api_client, token, params)
+
             prescriptions_response = api_client.get_prescriptions(token, **params)
 
             if prescriptions_response.get('success'):
-                prescriptions_data = prescriptions_response.get('data', {})
-                prescriptions = prescriptions_data.get('prescriptions', [])
-                pagination = prescriptions_data.get('pagination', {})
+                prescriptions, pagination = PrescriptionRecord.decode_page(prescriptions_response, 'prescriptions')
 
                 logger.info(f"Found {len(prescriptions)} prescriptions")
 
-                # Debug: Log first prescription structure
-                if prescriptions:
-                    logger.info(f"First prescription structure: {prescriptions[0]}")
-                    logger.info(f"First prescription keys: {list(prescriptions[0].keys())}")
-
                 # Get prescription items for each prescription (since list API doesn't include items)
                 logger.info("Fetching prescription items for each prescription...")
                 for prescription in prescriptions:
                     try:
-                        prescription_detail_response = api_client._make_request('GET', f'/api/prescriptions/{prescription["id"]}', token=token)
+                        prescription_detail_response = api_client._make_request('GET', f'/api/prescriptions/{prescription.id}', token=token)
                         if prescription_detail_response.get('success'):
                             prescription_detail = prescription_detail_response.get('data', {})
-                            prescription['items'] = prescription_detail.get('items', [])
-                            logger.info(f"Loaded {len(prescription['items'])} items for prescription {prescription.get('prescription_number')}")
+                            prescription.items = prescription_detail.get('items', [])
+                            logger.info(f"Loaded {len(prescription.items)} items for prescription {prescription.prescription_number}")
                         else:
-                            prescription['items'] = []
-                            logger.warning(f"Failed to load items for prescription {prescription.get('prescription_number')}")
+                            prescription.items = []
+                            logger.warning(f"Failed to load items for prescription {prescription.prescription_number}")
                     except Exception as e:
-                        logger.error(f"Error loading items for prescription {prescription.get('prescription_number')}: {e}")
-                        prescription['items'] = []
+                        logger.error(f"Error loading items for prescription {prescription.prescription_number}: {e}")
+                        prescription.items = []
 
                 # Enrich medication names for prescriptions that have codes instead of names
                 try:
                     logger.info("Starting medication enrichment for prescription list...")
-                    medications_response = api_client._make_request('GET', '/api/medications', token=token)
-                    if medications_response.get('success'):
-                        medications = medications_response.get('data', {}).get('medications', [])
-                        medication_map = {med.get('medication_code'): med.get('medication_name') for med in medications}
-                        logger.info(f"Built medication map with {len(medication_map)} entries")
+                    medication_map = medication_catalog(api_client, token)
+                    if medication_map:
+                        logger.info(f"Using medication map with {len(medication_map)} entries")
 
                         for prescription in prescriptions:
-                            if prescription.get('items'):
-                                logger.info(f"Processing prescription {prescription.get('prescription_number')} with {len(prescription['items'])} items")
-                                for item in prescription['items']:
+                            if prescription.items:
+                                logger.info(f"Processing prescription {prescription.prescription_number} with {len(prescription.items)} items")
+                                for item in prescription.items:
                                     original_name = item.get('medication_name')
                                     if original_name and original_name.startswith('MED'):
                                         # This looks like a medication code, replace with actual name
@@ -159,9 +142,7 @@ class PrescriptionListView(View):
                                         else:
                                             logger.warning(f"No mapping found for medication code: {original_name}")
                             else:
-                                logger.warning(f"Prescription {prescription.get('prescription_number')} has no items")
-                    else:
-                        logger.error(f"Failed to get medications: {medications_response}")
+                                logger.warning(f"Prescription {prescription.prescription_number} has no items")
                 except Exception as e:
                     logger.error(f"Error enriching medication data in list: {e}")
             else:
@@ -170,18 +151,17 @@ class PrescriptionListView(View):
                 messages.error(request, 'Failed to load prescriptions')
                 logger.error(f"Failed to get prescriptions: {prescriptions_response.get('message')}")
 
-            # Get filter options
-            try:
-                # Skip doctors filter for now (requires admin permission)
-                doctors = []
-
-                # Get patients for filter
-                patients_response = api_client.get_patients(token)
-                patients = patients_response.get('data', {}).get('patients', []) if patients_response.get('success') else []
-            except Exception as e:
-                logger.error(f"Error loading filter options: {e}")
-                doctors = []
-                patients = []
+            # Get filter options (not needed when only the results are swapped in)
+            # Skip doctors filter for now (requires admin permission)
+            doctors = []
+            patients = []
+            if not is_fragment_request(request):
+                try:
+                    # Get patients for filter
+                    patients_response = api_client.get_patients(token)
+                    patients = patients_response.get('data', {}).get('patients', []) if patients_response.get('success') else []
+                except Exception as e:
+                    logger.error(f"Error loading filter options: {e}")
 
             context = {
                 'prescriptions': prescriptions,
@@ -207,7 +187,8 @@ class PrescriptionListView(View):
                 ]
             }
 
-            return render(request, 'prescriptions/list.html', context)
+            return render_list(request, 'prescriptions/list.html',
+                               'prescriptions/partials/list_results.html', context)
 
         except Exception as e:
             logger.error(f"Error in prescription list view: {e}")
@@ -221,6 +202,26 @@ class PrescriptionListView(View):
                 'status_choices': []
             })
 
+    EXPORT_COLUMNS = (
+        ('Prescription #', field('prescriptionNumber', 'prescription_number')),
+        ('Issued', lambda row: dates.format_date(field('issuedDate', 'issued_date')(row), 'Y-m-d')),
+        ('Valid until', lambda row: dates.format_date(field('validUntil', 'valid_until')(row), 'Y-m-d')),
+        ('Patient', field('patientName', 'patient_name')),
+        ('Doctor', field('doctorName', 'doctor_name')),
+        ('Diagnosis', 'diagnosis'),
+        ('Status', 'status'),
+        ('Total', field('totalAmount', 'total_amount')),
+        ('Currency', 'currency'),
+    )
+
+    def export(self, request, api_client, token, params):
+        """Stream every prescription matching the list filters as CSV/XLSX"""
+        def fetch_page(page, limit):
+            return api_client.get_prescriptions(token, **dict(params, page=page, limit=limit))
+
+        rows = iter_pages(fetch_page, 'prescriptions')
+        return export_response(request, rows, self.EXPORT_COLUMNS, 'prescriptions')
+
 
 @method_decorator(login_required, name='dispatch')
 class PrescriptionDetailView(View):
@@ -248,14 +249,11 @@ class PrescriptionDetailView(View):
                         if item.get('medication_name') and item['medication_name'].startswith('MED'):
                             # This looks like a medication code, try to get the actual name
                             try:
-                                medications_response = api_client._make_request('GET', '/api/medications', token=token)
-                                if medications_response.get('success'):
-                                    medications = medications_response.get('data', {}).get('medications', [])
-                                    for med in medications:
-                                        if med.get('medication_code') == item['medication_name']:
-                                            item['medication_name'] = med.get('medication_name', item['medication_name'])
-                                            item['medication_code'] = med.get('medication_code', '')
-                                            break
+                                code = item['medication_name']
+                                name = medication_catalog(api_client, token).get(code)
+                                if name:
+                                    item['medication_name'] = name
+                                    item['medication_code'] = code
                             except Exception as e:
                                 logger.error(f"Error enriching medication data: {e}")
                                 # Keep original data if enrichment fails
@@ -297,13 +295,10 @@ class PrescriptionCreateView(View):
                 messages.error(request, 'Selected patient not found.')
                 return redirect('prescriptions:patient_selection')
 
+            # Age is computed lazily by the record (calculated_age)
             selected_patient = patient_response.get('data')
-
-            # Calculate age for selected patient
             if selected_patient:
-                calculated_age = get_patient_age(selected_patient)
-                if calculated_age:
-                    selected_patient['calculated_age'] = calculated_age
+                selected_patient = PatientRecord.from_dict(selected_patient)
 
             # Get current doctor information from API using doctor ID
             doctor_id = request.session.get('user_id')
@@ -515,6 +510,31 @@ class PrescriptionCreateView(View):
             return redirect('prescriptions:create')
 
 
+def dispensing_info(request, api_client, token):
+    """``dispensedBy*`` fields for the current user (full name from the profile when available)"""
+    dispensed_by_name = request.session.get('username', 'Unknown')
+
+    # Try to get full name from profile API
+    try:
+        profile_response = api_client.get_profile(token)
+        if profile_response.get('success'):
+            profile_data = profile_response.get('data', {})
+            profile_nested = profile_data.get('profile', {})
+            first_name = profile_nested.get('firstName', '')
+            last_name = profile_nested.get('lastName', '')
+            full_name = f"{first_name} {last_name}".strip()
+            if full_name:
+                dispensed_by_name = full_name
+    except Exception as e:
+        logger.error(f"Error getting dispensing user name: {e}")
+
+    return {
+        'dispensedByUserId': request.session.get('user_id'),
+        'dispensedByName': dispensed_by_name,
+        'dispensedDate': datetime.now().isoformat()
+    }
+
+
 @method_decorator(login_required, name='dispatch')
 class PrescriptionUpdateStatusView(View):
     """Update prescription status (dispense, complete, cancel)"""
@@ -539,28 +559,7 @@ class PrescriptionUpdateStatusView(View):
 
             # Add dispensing info if status is dispensed
             if new_status == 'dispensed':
-                # Get dispensing user info from session
-                dispensed_by_name = request.session.get('username', 'Unknown')
-
-                # Try to get full name from profile API
-                try:
-                    profile_response = api_client.get_profile(token)
-                    if profile_response.get('success'):
-                        profile_data = profile_response.get('data', {})
-                        profile_nested = profile_data.get('profile', {})
-                        first_name = profile_nested.get('firstName', '')
-                        last_name = profile_nested.get('lastName', '')
-                        full_name = f"{first_name} {last_name}".strip()
-                        if full_name:
-                            dispensed_by_name = full_name
-                except Exception as e:
-                    logger.error(f"Error getting dispensing user name: {e}")
-
-                update_data.update({
-                    'dispensedByUserId': request.session.get('user_id'),
-                    'dispensedByName': dispensed_by_name,
-                    'dispensedDate': datetime.now().isoformat()
-                })
+                update_data.update(dispensing_info(request, api_client, token))
 
             # Update prescription
             response = api_client._make_request('PUT', f'/api/prescriptions/{prescription_id}', token=token, data=update_data)
@@ -584,6 +583,59 @@ class PrescriptionUpdateStatusView(View):
             return redirect('prescriptions:detail', prescription_id=prescription_id)
 
 
+@method_decorator(login_required, name='dispatch')
+@method_decorator(role_required(['admin', 'doctor']), name='dispatch')
+class PrescriptionBulkActionView(View):
+    """Dispense or cancel many prescriptions at once"""
+
+    def post(self, request):
+        token = request.session.get('access_token')
+        if not token:
+            return JsonResponse({'success': False, 'message': 'Authentication required'})
+
+        api_client = APIClient()
+        user_role = request.session.get('user_role')
+        user_id = request.session.get('user_id')
+        reason = bulk_option(request, 'reason')
+
+        def status(prescription):
+            return (prescription.get('status') or '').lower()
+
+        def own_prescription(prescription):
+            if user_role == 'doctor' and str(field('doctorId', 'doctor_id')(prescription)) != str(user_id):
+                return 'Not your prescription'
+            return None
+
+        def load(prescription_id):
+            return api_client._make_request('GET', f'/api/prescriptions/{prescription_id}', token=token)
+
+        def update(data):
+            return lambda prescription_id, prescription: api_client._make_request(
+                'PUT', f'/api/prescriptions/{prescription_id}', token=token, data=data)
+
+        # The dispenser's name is looked up once for the whole batch
+        dispensed = {}
+        dispensed_lock = threading.Lock()
+
+        def dispense(prescription_id, prescription):
+            with dispensed_lock:
+                if not dispensed:
+                    dispensed.update(dispensing_info(request, api_client, token), status='dispensed', changeReason=reason)
+            return update(dispensed)(prescription_id, prescription)
+
+        actions = {
+            'dispense': BulkAction(
+                'dispense', load, dispense, status,
+                allowed_from=('active',), check=own_prescription,
+            ),
+            'cancel': BulkAction(
+                'cancel', load, update({'status': 'cancelled', 'changeReason': reason}), status,
+                allowed_from=('draft', 'active'), check=own_prescription,
+            ),
+        }
+        return bulk_action_response(request, actions, invalidate=lambda changed: analytics_cache.invalidate_all())
+
+
 @method_decorator(login_required, name='dispatch')
 class MedicationSearchView(View):
     """Search medications for prescription form"""
@@ -692,37 +744,33 @@ class PatientSelectionView(TemplateView):
             patients_response = api_client.get_patients(token)
 
             if patients_response.get('success'):
-                patients_data = patients_response.get('data', {})
-                all_patients = patients_data.get('patients', [])
+                all_patients, _ = PatientRecord.decode_page(patients_response, 'patients')
 
                 # Manual search filtering
                 if search_query:
-                    filtered_patients = []
-                    for patient in all_patients:
-                        if (search_query.lower() in patient.get('fullName', '').lower() or
-                            search_query.lower() in patient.get('phone', '').lower() or
-                            search_query.lower() in patient.get('id', '').lower()):
-                            filtered_patients.append(patient)
-                    patients = filtered_patients
+                    needle = search_query.lower()
+                    patients = [
+                        patient for patient in all_patients
+                        if needle in (patient.full_name or '').lower()
+                        or needle in (patient.phone or '').lower()
+                        or needle in (patient.id or '').lower()
+                    ]
                 else:
                     patients = all_patients
 
-                # Calculate age for each patient
-                for patient in patients:
-                    calculated_age = get_patient_age(patient)
-                    if calculated_age:
-                        patient['calculated_age'] = calculated_age
+                # Manual sorting; ages for the whole list come from one vectorized pass
+                if sort_by == 'age':
+                    ages = batch_ages([patient.date_of_birth for patient in patients])
+                    for patient, age in zip(patients, ages):
+                        patient._age = age
 
-                # Manual sorting
                 def sort_key(patient):
-                    if sort_by == 'fullName':
-                        return patient.get('fullName', '').lower()
-                    elif sort_by == 'age':
-                        return patient.get('calculated_age', 0) or 0
+                    if sort_by == 'age':
+                        return patient.age or 0
                     elif sort_by == 'createdAt':
-                        return patient.get('createdAt', '')
+                        return patient.created_at or ''
                     else:
-                        return patient.get('fullName', '').lower()
+                        return (patient.full_name or '').lower()
 
                 patients.sort(key=sort_key, reverse=(sort_order == 'desc'))
 
@@ -731,7 +779,7 @@ class PatientSelectionView(TemplateView):
                 total_pages = (total_count + limit - 1) // limit
                 start_idx = (page - 1) * limit
                 end_idx = start_idx + limit
-                paginated_patients = patients[start_idx:end_idx]
+                paginated_patients = present_patients(patients[start_idx:end_idx])
 
                 # Create pagination info
                 pagination = {
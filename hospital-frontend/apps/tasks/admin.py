@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import ImportedRow, Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts', 'owner', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'owner')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'locked_until')
+
+
+@admin.register(ImportedRow)
+class ImportedRowAdmin(admin.ModelAdmin):
+    list_display = ('id', 'scope', 'key', 'account_id', 'result_id', 'task', 'updated_at')
+    list_filter = ('scope',)
+    search_fields = ('key', 'account_id', 'result_id')
@@ -0,0 +1,91 @@
+"""
+Cache invalidations for backend domain events (``manage.py consume_events``)
+
+Each handler receives the normalised event name and the entity dict.  When
+the ids a cache is keyed by are in the event, only those entries go;
+otherwise the whole family is dropped through its generation.
+"""
+
+import logging
+
+from django.core.cache import cache
+
+from apps.analytics.views import analytics_cache
+from apps.appointments.ical import feed_cache_key, forget_feeds
+from apps.appointments.slots import day_plan_key
+from apps.appointments.views import DOCTOR_DIRECTORY_KEY
+from apps.appointments.worklist import touch as touch_worklists
+from apps.dashboard.live import counters_changed
+from apps.patients.views import forget_history, forget_patient_index
+from apps.prescriptions.views import MEDICATION_CATALOG_KEY
+from utils import dates
+from utils.domain_events import EventRouter
+from utils.export import field
+
+logger = logging.getLogger(__name__)
+
+router = EventRouter()
+
+doctor_of = field('doctorId', 'doctor_id', 'doctorUserId', 'doctor_user_id')
+patient_of = field('patientId', 'patient_id', 'recipient_user_id')
+
+
+@router.on('appointment.#')
+def appointment_changed(name, data):
+    if name == 'appointment.reminder':
+        # Reminders are sent for unchanged appointments
+        return
+    doctor_id = doctor_of(data)
+    patient_id = patient_of(data)
+    keys = []
+    if patient_id:
+        keys.append(feed_cache_key(patient_id, 'patient'))
+    if doctor_id:
+        keys.append(feed_cache_key(doctor_id, 'doctor'))
+        scheduled = dates.parse_datetime(field('scheduledDate', 'scheduled_date')(data))
+        day = scheduled.date() if scheduled else dates.parse_date(field('appointmentDate', 'appointment_date')(data))
+        if day:
+            keys.append(day_plan_key(doctor_id, day))
+    else:
+        # Doctor feeds are keyed by doctor; without one, rebuild them all
+        forget_feeds()
+    cache.delete_many(keys)
+    touch_worklists()
+    analytics_cache.invalidate_all()
+    counters_changed(doctor_id)
+
+
+@router.on('prescription.#')
+def prescription_changed(name, data):
+    analytics_cache.invalidate_all()
+    counters_changed(doctor_of(data))
+
+
+@router.on('patient.#')
+def patient_changed(name, data):
+    forget_patient_index()
+    patient_id = field('id', 'patientId', 'patient_id')(data)
+    forget_history(patient_id or None)
+    analytics_cache.invalidate_all()
+
+
+@router.on('medication.#')
+def medication_changed(name, data):
+    cache.delete(MEDICATION_CATALOG_KEY)
+
+
+@router.on('doctor.#', 'user.#')
+def doctor_changed(name, data):
+    # user.* events carry no role, and the directory is one small entry
+    cache.delete(DOCTOR_DIRECTORY_KEY)
+
+
+def reset_all():
+    """Drop every event-invalidated cache (events may have been missed)"""
+    cache.delete_many([DOCTOR_DIRECTORY_KEY, MEDICATION_CATALOG_KEY])
+    forget_patient_index()
+    forget_history()
+    forget_feeds()
+    touch_worklists()
+    analytics_cache.invalidate_all()
+    logger.info("Domain events: reset every event-invalidated cache")
@@ -0,0 +1,89 @@
+"""
+Domain-event consumer
+
+    python manage.py consume_events            # consume forever, reconnecting
+    python manage.py consume_events --once     # drain the queue and exit
+
+Reads a durable queue (``DOMAIN_EVENTS_QUEUE``) bound to the backend's
+RabbitMQ exchange and drops the frontend caches each event makes stale (see
+``apps.tasks.cache_events``).  Every connect first resets those caches, since
+events published while no consumer ran may have been missed.  SIGTERM and
+SIGINT stop the consumer after the event in progress.
+
+The consumer is its own process, so it refuses to start on a per-process
+cache (locmem): its invalidations would never reach the web workers.
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tasks.cache_events import reset_all, router
+from utils.domain_events import AMQPBroker
+
+
+class Command(BaseCommand):
+    help = 'Invalidate frontend caches from backend domain events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--bind', action='append', default=None,
+                            help='Routing-key pattern to bind (repeatable, default "#")')
+        parser.add_argument('--max-backoff', type=float, default=60.0, help='Longest wait between reconnects')
+
+    def make_broker(self):
+        return AMQPBroker(
+            getattr(settings, 'RABBITMQ_URL', 'amqp://localhost:5672'),
+            getattr(settings, 'RABBITMQ_EXCHANGE', 'hospital_notifications'),
+            getattr(settings, 'DOMAIN_EVENTS_QUEUE', 'frontend_cache_invalidation'),
+        )
+
+    def check_shared_cache(self):
+        # EncryptedCache wraps the real store
+        backend = caches['default']
+        store = getattr(backend, 'store', backend)
+        if isinstance(store, (LocMemCache, DummyCache)):
+            raise CommandError(
+                f'{type(store).__name__} is private to this process, so invalidations would not reach '
+                'the web workers; use a shared cache (CACHE_BACKEND=redis)')
+
+    def handle(self, *args, **options):
+        self.check_shared_cache()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        broker = self.make_broker()
+        broker.bind(options['bind'] or ['#'])
+        self.handled = 0
+        backoff = 1.0
+        self.stdout.write('Domain-event consumer started')
+
+        while not self.stopping:
+            try:
+                broker.consume(self.handle_event, stop=lambda: self.stopping, on_connect=reset_all,
+                               until_idle=options['once'])
+                backoff = 1.0
+            except Exception as e:
+                if options['once']:
+                    raise
+                self.stderr.write(f'Broker connection failed: {str(e)}; retrying in {backoff:.0f}s')
+                time.sleep(backoff)
+                backoff = min(backoff * 2, options['max_backoff'])
+                continue
+            if options['once']:
+                break
+
+        self.stdout.write(f'Domain-event consumer stopped after {self.handled} event(s)')
+
+    def handle_event(self, routing_key, body):
+        router.dispatch(routing_key, body)
+        self.handled += 1
+
+    def stop(self, signum, frame):
+        self.stopping = True
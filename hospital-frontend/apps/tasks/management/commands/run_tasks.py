@@ -0,0 +1,63 @@
+"""
+Task worker
+
+    python manage.py run_tasks             # poll forever
+    python manage.py run_tasks --once      # drain due tasks and exit (cron)
+
+Run as many workers as needed; each claims tasks independently.  SIGTERM and
+SIGINT stop the worker after the task in progress has finished.
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.tasks import queue
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no task is due')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--max-tasks', type=int, default=None, help='Exit after running this many tasks')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = queue.worker_name()
+        max_tasks = options['max_tasks']
+        ran = 0
+        last_sweep = 0.0
+        self.stdout.write(f'Task worker {worker} started')
+
+        while not self.stopping and (max_tasks is None or ran < max_tasks):
+            close_old_connections()
+            now = time.monotonic()
+            if now - last_sweep >= 60:
+                requeued = queue.requeue_expired()
+                if requeued:
+                    self.stdout.write(f'Recovered {requeued} task(s) from stopped workers')
+                last_sweep = now
+
+            task = queue.claim_next(worker)
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            outcome = queue.execute(task)
+            ran += 1
+            self.stdout.write(f'{task.name} #{task.pk}: {outcome}')
+
+        close_old_connections()
+        self.stdout.write(f'Task worker {worker} stopped after {ran} task(s)')
+
+    def stop(self, signum, frame):
+        self.stopping = True
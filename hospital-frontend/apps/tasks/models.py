@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """A unit of deferred work, executed by ``manage.py run_tasks``"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Higher runs first; ties run in run_at order
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    # API Gateway id of the user who enqueued the task (empty for system tasks)
+    owner = models.CharField(max_length=64, blank=True, db_index=True)
+
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    progress = models.JSONField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='task_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+
+class ImportedRow(models.Model):
+    """
+    What a bulk-import row already created, by idempotency key
+
+    Re-running a file (after a failure, or an upload of the same file) skips
+    rows with a ``result_id`` and reuses a registered ``account_id``.
+    """
+
+    # The importer, e.g. the task name ``patients.import``
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=64)
+    account_id = models.CharField(max_length=64, blank=True)
+    result_id = models.CharField(max_length=64, blank=True)
+    task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL, related_name='imported_rows')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='imported_row_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.scope} {self.key[:12]} -> {self.result_id or self.account_id or "pending"}'
@@ -0,0 +1,226 @@
+"""
+Database-backed task queue
+
+Slow or deferred work (credential emails, bulk imports, reports) is stored as
+``Task`` rows and executed by ``manage.py run_tasks`` outside the request
+cycle.  The table lives in the frontend's own database (SQLite in
+development, PostgreSQL in production), so no broker is needed.
+
+Handlers are registered with the ``@task`` decorator in an app's
+``tasks.py`` and called as ``handler(task, **payload)``.  Their return value
+is stored as the task result.  An exception schedules a retry with
+exponential backoff until ``max_attempts`` is reached; raise
+``PermanentError`` to fail at once.
+
+Workers claim a task with a conditional UPDATE, so several workers can poll
+the same table.  A claim is a lease: a worker that dies mid-task leaves a
+``running`` row whose lease expires, and the next worker requeues it.
+"""
+
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+#: Candidates fetched per claim attempt (others may be taken by a racing worker)
+CLAIM_BATCH = 10
+
+
+class PermanentError(Exception):
+    """Raised by a handler for failures that retrying cannot fix"""
+
+
+class TaskSpec:
+    """A registered handler and its queue options"""
+
+    def __init__(self, name, func, max_attempts, backoff, priority, secret_fields):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.priority = priority
+        self.secret_fields = tuple(secret_fields)
+
+
+_registry = {}
+
+
+def task(name, max_attempts=3, backoff=30, priority=PRIORITY_NORMAL, secret_fields=()):
+    """
+    Register a task handler
+
+    ``backoff`` is the delay in seconds before the first retry; it doubles
+    after every failed attempt.  ``secret_fields`` are removed from the stored
+    payload once the task has finished or failed for good, including when its
+    worker died (e.g. access tokens).
+    """
+    def decorator(func):
+        _registry[name] = TaskSpec(name, func, max_attempts, backoff, priority, secret_fields)
+        return func
+    return decorator
+
+
+def get_spec(name):
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, priority=None, delay=0, owner='', max_attempts=None):
+    """Queue a registered task; returns the ``Task`` row"""
+    spec = _registry.get(name)
+    if spec is None:
+        raise ValueError(f'Unknown task: {name}')
+    return Task.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=spec.priority if priority is None else priority,
+        max_attempts=max_attempts or spec.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        owner=owner or '',
+    )
+
+
+def lease_seconds():
+    return getattr(settings, 'TASK_LEASE_SECONDS', 600)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next(worker):
+    """Lock the most urgent due task for ``worker``; ``None`` if there is none"""
+    now = timezone.now()
+    candidates = list(
+        Task.objects.filter(status=Task.QUEUED, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)[:CLAIM_BATCH]
+    )
+    for task_id in candidates:
+        claimed = Task.objects.filter(pk=task_id, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_until=now + timedelta(seconds=lease_seconds()),
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=task_id)
+    return None
+
+
+def requeue_expired():
+    """Return tasks whose worker died (lease expired) to the queue; returns the count"""
+    now = timezone.now()
+    expired = Task.objects.filter(status=Task.RUNNING, locked_until__lt=now)
+    failed = 0
+    # One row at a time: secrets are dropped from the payload, as when a task finishes
+    for stopped in expired.filter(attempts__gte=F('max_attempts')).only('pk', 'name', 'payload'):
+        failed += Task.objects.filter(pk=stopped.pk, status=Task.RUNNING).update(
+            status=Task.FAILED, finished_at=now, locked_by='', locked_until=None,
+            last_error='Worker stopped before the task finished',
+            payload=_scrub(stopped.payload, _registry.get(stopped.name)),
+        )
+    requeued = expired.update(status=Task.QUEUED, run_at=now, locked_by='', locked_until=None)
+    return failed + requeued
+
+
+def update_progress(task_id, progress):
+    """Store handler progress and extend the lease of a long-running task"""
+    Task.objects.filter(pk=task_id, status=Task.RUNNING).update(
+        progress=progress,
+        locked_until=timezone.now() + timedelta(seconds=lease_seconds()),
+    )
+
+
+def retry_delay(spec, attempts):
+    # Exponential backoff with up to 25% jitter so retries do not align
+    delay = spec.backoff * 2 ** max(attempts - 1, 0)
+    return delay * (1 + random.random() / 4)
+
+
+def _scrub(payload, spec):
+    if spec is None or not spec.secret_fields:
+        return payload
+    return {key: value for key, value in payload.items() if key not in spec.secret_fields}
+
+
+def execute(task):
+    """Run a claimed task and record its outcome"""
+    spec = _registry.get(task.name)
+    now = timezone.now
+    if spec is None:
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.FAILED, finished_at=now(), locked_by='', locked_until=None,
+            last_error=f'No handler registered for {task.name}',
+        )
+        return Task.FAILED
+
+    try:
+        result = spec.func(task, **task.payload)
+    except Exception as e:
+        permanent = isinstance(e, PermanentError)
+        logger.error(f"Task {task} attempt {task.attempts} failed: {str(e)}")
+        error = ''.join(traceback.format_exception(type(e), e, e.__traceback__))[-4000:]
+        if permanent or task.attempts >= task.max_attempts:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.FAILED, finished_at=now(), locked_by='', locked_until=None,
+                last_error=error, payload=_scrub(task.payload, spec),
+            )
+            return Task.FAILED
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.QUEUED, locked_by='', locked_until=None, last_error=error,
+            run_at=now() + timedelta(seconds=retry_delay(spec, task.attempts)),
+        )
+        return Task.QUEUED
+
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.SUCCEEDED, finished_at=now(), locked_by='', locked_until=None,
+        result=result, payload=_scrub(task.payload, spec),
+    )
+    return Task.SUCCEEDED
+
+
+def run_pending(worker=None, limit=None):
+    """Execute due tasks until the queue is empty (or ``limit`` ran); returns the count"""
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        claimed = claim_next(worker)
+        if claimed is None:
+            break
+        execute(claimed)
+        count += 1
+    return count
+
+
+def serialize(task):
+    """Public view of a task for the status API (payload is not exposed)"""
+    return {
+        'id': task.pk,
+        'name': task.name,
+        'status': task.status,
+        'priority': task.priority,
+        'attempts': task.attempts,
+        'maxAttempts': task.max_attempts,
+        'progress': task.progress,
+        'result': task.result,
+        'error': task.last_error.strip().splitlines()[-1] if task.last_error else None,
+        'createdAt': task.created_at.isoformat() if task.created_at else None,
+        'runAt': task.run_at.isoformat() if task.run_at else None,
+        'startedAt': task.started_at.isoformat() if task.started_at else None,
+        'finishedAt': task.finished_at.isoformat() if task.finished_at else None,
+    }
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'tasks'
+
+urlpatterns = [
+    path('<int:task_id>/', views.TaskStatusView.as_view(), name='status'),
+]
@@ -0,0 +1,19 @@
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from utils.decorators import login_required
+
+from .models import Task
+from .queue import serialize
+
+
+@method_decorator(login_required, name='dispatch')
+class TaskStatusView(View):
+    """AJAX status of a background task (owner or admin only)"""
+
+    def get(self, request, task_id):
+        task = Task.objects.filter(pk=task_id).first()
+        if task is None or (task.owner != str(request.session.get('user_id', ''))
+                            and request.session.get('user_role') != 'admin'):
+            return JsonResponse({'success': False, 'message': 'Task not found'}, status=404)
+        return JsonResponse({'success': True, 'data': serialize(task)})
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.UserListView.as_view(), name='list'),
     path('search/', views.UserSearchView.as_view(), name='search'),
     path('analytics/', views.UserAnalyticsView.as_view(), name='analytics'),
+    path('bulk/', views.UserBulkActionView.as_view(), name='bulk_action'),
     
     # User CRUD operations
     path('create/', views.UserCreateView.as_view(), name='create'),
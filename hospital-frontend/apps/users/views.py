@@ -2,12 +2,18 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.views.generic import CreateView, UpdateView
 from django.http import JsonResponse, Http404
+from django.core.cache import cache
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.core.paginator import Paginator
 from django.urls import reverse_lazy, reverse
 from utils.decorators import admin_required, ajax_login_required
 from utils.api_client import api_client
+from utils.user_stats import CACHE_KEY as USER_STATS_CACHE_KEY, UserStatsAggregator, get_user_stats
+from utils.bulk_actions import BulkAction, bulk_action_response, bulk_option
+from apps.analytics.views import analytics_cache
+from utils import dates
+from utils.export import export_response, field, iter_pages, requested_format
 import logging
 import json
 
@@ -37,6 +43,9 @@ class UserListView(View):
         elif status_filter == 'inactive':
             is_active_filter = False
         
+        if requested_format(request):
+            return self.export(request, token, search, role_filter, is_active_filter)
+
         # API call to get users
         response = api_client.get_users(
             token=token,
@@ -98,6 +107,33 @@ class UserListView(View):
         
         return render(request, 'users/list.html', context)
 
+    EXPORT_COLUMNS = (
+        ('Username', 'username'),
+        ('Email', 'email'),
+        ('First name', field('firstName', 'first_name')),
+        ('Last name', field('lastName', 'last_name')),
+        ('Role', 'role'),
+        ('Active', lambda row: 'Yes' if field('isActive', 'is_active')(row) else 'No'),
+        ('Phone', field('phone', 'phoneNumber')),
+        ('Created', lambda row: dates.format_datetime(field('createdAt', 'created_at')(row), 'Y-m-d H:i')),
+        ('Last login', lambda row: dates.format_datetime(field('lastLogin', 'last_login')(row), 'Y-m-d H:i')),
+    )
+
+    def export(self, request, token, search, role_filter, is_active_filter):
+        """Stream every user matching the list filters as CSV/XLSX"""
+        def fetch_page(page, limit):
+            return api_client.get_users(
+                token=token,
+                page=page,
+                limit=limit,
+                search=search if search else None,
+                role=role_filter if role_filter else None,
+                is_active=is_active_filter
+            )
+
+        rows = iter_pages(fetch_page, 'users')
+        return export_response(request, rows, self.EXPORT_COLUMNS, 'users')
+
 
 @method_decorator(admin_required, name='dispatch')
 class UserDetailView(View):
@@ -368,6 +404,47 @@ class UserStatusToggleView(View):
             })
 
 
+@method_decorator(admin_required, name='dispatch')
+class UserBulkActionView(View):
+    """Activate or deactivate many users at once"""
+
+    def post(self, request):
+        token = request.session.get('access_token')
+        if not token:
+            return JsonResponse({'success': False, 'message': 'Authentication required'})
+
+        reason = bulk_option(request, 'reason')
+        current_user_id = request.session.get('user_id')
+
+        def is_active(user):
+            return 'active' if field('isActive', 'is_active')(user) else 'inactive'
+
+        def not_self(user):
+            if str(user.get('id')) == str(current_user_id):
+                return 'You cannot change your own account status'
+            return None
+
+        load = lambda user_id: api_client.get_user_by_id(token=token, user_id=user_id)  # noqa: E731
+        actions = {
+            'activate': BulkAction(
+                'activate', load,
+                lambda user_id, user: api_client.activate_user(token=token, user_id=user_id, reason=reason),
+                is_active, allowed_from=('inactive',), check=not_self,
+            ),
+            'deactivate': BulkAction(
+                'deactivate', load,
+                lambda user_id, user: api_client.deactivate_user(token=token, user_id=user_id, reason=reason),
+                is_active, allowed_from=('active',), check=not_self,
+            ),
+        }
+        return bulk_action_response(request, actions, invalidate=lambda changed: invalidate_user_caches())
+
+
+def invalidate_user_caches():
+    cache.delete(USER_STATS_CACHE_KEY)
+    analytics_cache.invalidate_all()
+
+
 @method_decorator(ajax_login_required, name='dispatch')
 class UserSearchView(View):
     """AJAX endpoint for user search"""
@@ -427,65 +504,12 @@ class UserAnalyticsView(View):
             messages.error(request, 'Please login to access analytics.')
             return redirect('authentication:login')
         
-        # Get basic user statistics
-        response = api_client.get_users(token=token, page=1, limit=1000)  # Get all users for stats
-        
-        if response.get('success'):
-            users = response.get('data', {}).get('users', [])
-            total_users = response.get('data', {}).get('total', 0)
-            
-            # Calculate statistics
-            active_users = len([u for u in users if u.get('isActive')])
-            inactive_users = total_users - active_users
-            active_percentage = (active_users / total_users * 100) if total_users > 0 else 0
-            
-            # Role distribution
-            role_stats = {
-                'admin': len([u for u in users if u.get('role') == 'admin']),
-                'doctor': len([u for u in users if u.get('role') == 'doctor']),
-                'nurse': len([u for u in users if u.get('role') == 'nurse']),
-                'staff': len([u for u in users if u.get('role') == 'staff']),
-                'patient': len([u for u in users if u.get('role') == 'patient']),
-            }
-            
-            # Mock data for monthly registrations (in real app, this would come from API)
-            monthly_registrations = [5, 8, 12, 15, 20, 18]  # Last 6 months
-            months_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']  # Would be dynamic
-            
-            # Recent activity (simplified)
-            new_users_this_month = 18  # Would come from API
-            users_today = 2  # Would come from API
-            users_this_week = 7  # Would come from API
-            last_user_created = 'Today'  # Would come from API
-            
-        else:
+        # Aggregated over every user page; cached so this never walks the table per view
+        stats = get_user_stats(token, refresh=request.GET.get('refresh') == '1')
+
+        if stats is None:
             # Fallback data if API call fails
-            total_users = 0
-            active_users = 0
-            inactive_users = 0
-            active_percentage = 0
-            role_stats = {'admin': 0, 'doctor': 0, 'nurse': 0, 'staff': 0, 'patient': 0}
-            monthly_registrations = [0, 0, 0, 0, 0, 0]
-            months_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
-            new_users_this_month = 0
-            users_today = 0
-            users_this_week = 0
-            last_user_created = 'N/A'
-            
+            stats = UserStatsAggregator().result()
             messages.warning(request, 'Unable to load complete analytics data.')
-        
-        context = {
-            'total_users': total_users,
-            'active_users': active_users,
-            'inactive_users': inactive_users,
-            'active_percentage': round(active_percentage, 1),
-            'role_stats': role_stats,
-            'monthly_registrations': monthly_registrations,
-            'months_labels': months_labels,
-            'new_users_this_month': new_users_this_month,
-            'users_today': users_today,
-            'users_this_week': users_this_week,
-            'last_user_created': last_user_created,
-        }
-        
-        return render(request, 'users/analytics.html', context)
+
+        return render(request, 'users/analytics.html', stats)
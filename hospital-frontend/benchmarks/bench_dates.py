@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks: legacy per-filter date handling vs utils.dates
+
+Each case formats a realistic list page worth of values (many rows sharing
+a few hundred distinct timestamps), the way templates call the filters.
+
+Usage: python benchmarks/bench_dates.py
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import dates  # noqa: E402
+
+ROWS = 2000
+NUMBER = 20
+
+
+# --- legacy implementations, copied from the filters they replaced ---------
+
+def legacy_parse_iso_date(value):
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def legacy_format_datetime(value, format_string="d/m/Y H:i"):
+    parsed_date = legacy_parse_iso_date(value)
+    format_py = format_string.replace('d', '%d').replace('m', '%m').replace('Y', '%Y').replace('H', '%H').replace('i', '%M')
+    return parsed_date.strftime(format_py)
+
+
+def legacy_profile_date(value):
+    clean_value = re.sub(r'\.\d+Z?$', '', value)
+    if clean_value.endswith('Z'):
+        clean_value = clean_value[:-1]
+    return datetime.fromisoformat(clean_value).strftime("%b %d, %Y %H:%M")
+
+
+def legacy_age(birth_date):
+    if re.match(r'\d{4}-\d{2}-\d{2}', birth_date):
+        birth_date = datetime.strptime(birth_date[:10], '%Y-%m-%d').date()
+    today = date.today()
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+# ---------------------------------------------------------------------------
+
+def build_values():
+    random.seed(7)
+    base = datetime(2025, 9, 1, 8, 0)
+    stamps = [(base + timedelta(minutes=30 * i)).strftime('%Y-%m-%dT%H:%M:%S.000Z') for i in range(300)]
+    births = [(date(1950, 1, 1) + timedelta(days=97 * i)).strftime('%Y-%m-%dT17:00:00.000Z') for i in range(400)]
+    return [random.choice(stamps) for _ in range(ROWS)], [random.choice(births) for _ in range(ROWS)]
+
+
+def bench(label, legacy, unified, values):
+    legacy_time = min(timeit.repeat(lambda: [legacy(v) for v in values], number=NUMBER, repeat=5)) / NUMBER
+    unified_time = min(timeit.repeat(lambda: [unified(v) for v in values], number=NUMBER, repeat=5)) / NUMBER
+    print(f"{label:<24}{legacy_time * 1000:>10.2f} ms{unified_time * 1000:>10.2f} ms{legacy_time / unified_time:>8.1f}x")
+
+
+def main():
+    stamps, births = build_values()
+    print(f"{ROWS} values per run; {'case':<17}{'legacy':>13}{'unified':>13}{'speedup':>9}")
+    bench('format_datetime', legacy_format_datetime,
+          lambda v: dates.format_datetime(v, "d/m/Y H:i", aware=True), stamps)
+    bench('profile parse_iso_date', legacy_profile_date,
+          lambda v: dates.format_datetime(v, "M d, Y H:i", aware=True), stamps)
+    bench('age', legacy_age, dates.calculate_age, births)
+    bench('parse only', legacy_parse_iso_date, lambda v: dates.parse_datetime(v, aware=True), stamps)
+    for name, info in dates.cache_info().items():
+        print(f"cache {name:<9} hits={info.hits} misses={info.misses} size={info.currsize}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encrypted vs plain cache entries for patient payloads
+
+For patient histories of increasing size, compares a set+get through the
+locmem backend with the same round trip through utils.encrypted_cache, and
+reports what AES-GCM sealing adds per entry and per KiB of pickled value.
+
+Usage: python benchmarks/bench_phi_cache.py
+"""
+
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(ENCRYPTION_KEY='a1b2c3d4e5f6789012345678901234567890abcdef1234567890abcdef123456')
+django.setup()
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from utils.encrypted_cache import EncryptedCache  # noqa: E402
+
+ENTRIES = (1, 10, 100, 1000)
+NUMBER = 200
+REPEAT = 5
+
+KEY = 'patients:history:g1:v1:u1:3f1c2a'
+
+
+def build_history(entries):
+    """Medical history response shape with ``entries`` visits"""
+    return {
+        'success': True,
+        'data': {
+            'patient': {'id': '3f1c2a', 'full_name': 'Nguyen Van A', 'date_of_birth': '1980-04-12',
+                        'allergies': ['Penicillin'], 'blood_type': 'O+'},
+            'records': [{
+                'id': f'rec-{i}',
+                'visit_date': '2025-03-04T09:30:00.000Z',
+                'doctor_name': f'Doctor {i % 12}',
+                'diagnosis': 'Acute bronchitis (J20.9)',
+                'treatment': 'Salbutamol inhaler, rest, fluids',
+                'notes': 'Follow up in two weeks if symptoms persist.',
+                'vitals': {'bp': '120/80', 'pulse': 72, 'temperature': 37.2},
+            } for i in range(entries)],
+        },
+    }
+
+
+def best(func):
+    return min(timeit.repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def main():
+    plain = LocMemCache('bench-plain', {})
+    encrypted = EncryptedCache('', {'OPTIONS': {'CACHE': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-encrypted'}}})
+
+    print(f"{'visits':>7}{'KiB':>9}{'plain':>12}{'encrypted':>12}{'overhead':>12}{'per KiB':>12}")
+    for entries in ENTRIES:
+        history = build_history(entries)
+        size = len(pickle.dumps(history, pickle.HIGHEST_PROTOCOL)) / 1024
+
+        def plain_round_trip():
+            plain.set(KEY, history)
+            plain.get(KEY)
+
+        def encrypted_round_trip():
+            encrypted.set(KEY, history)
+            encrypted.get(KEY)
+
+        plain_time = best(plain_round_trip)
+        encrypted_time = best(encrypted_round_trip)
+        overhead = encrypted_time - plain_time
+        print(f"{entries:>7}{size:>9.1f}{plain_time * 1e6:>9.1f} µs{encrypted_time * 1e6:>9.1f} µs"
+              f"{overhead * 1e6:>9.1f} µs{overhead / size * 1e6:>9.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-cell template filters vs the utils.presentation batch pass
+
+Renders a patient card loop twice per page size: once deriving age, dates,
+phone, address and badge classes through the patient_filters library, and
+once reading the attributes filled by ``present_patients`` (the pass itself
+is included in the timing).  The 1000-row case matches the prescription
+patient picker, which loads every patient.
+
+Usage: python benchmarks/bench_presentation.py
+"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(USE_TZ=True, TIME_ZONE='Asia/Ho_Chi_Minh')
+django.setup()
+
+from django.template import Context, Engine  # noqa: E402
+
+from utils import dates  # noqa: E402
+from utils.presentation import present_patients  # noqa: E402
+from utils.records import PatientRecord  # noqa: E402
+
+SIZES = (10, 100, 1000)
+NUMBER = 10
+
+FILTER_TEMPLATE = """{% load patient_filters %}{% for patient in patients %}
+<div>{{ patient.fullName }} {{ patient.dateOfBirth|calculate_age }} {{ patient.dateOfBirth|iso_to_date:"M d, Y" }}
+{{ patient.phone|format_phone }} {{ patient.address|format_address }} {{ patient.bloodType|blood_type_color }}
+{{ patient.gender|gender_icon }} {{ patient.createdAt|iso_to_date:"M d, Y" }}</div>{% endfor %}"""
+
+ATTRIBUTE_TEMPLATE = """{% for patient in patients %}
+<div>{{ patient.fullName }} {{ patient.age }} {{ patient.dob_display }}
+{{ patient.phone_display }} {{ patient.address_display }} {{ patient.blood_type_class }}
+{{ patient.gender_icon }} {{ patient.created_display }}</div>{% endfor %}"""
+
+
+def build_rows(count):
+    random.seed(11)
+    rows = []
+    for i in range(count):
+        birth = date(1940, 1, 1) + timedelta(days=random.randrange(30000))
+        rows.append({
+            'id': f'p-{i}',
+            'fullName': f'Patient {i}',
+            'dateOfBirth': birth.strftime('%Y-%m-%dT17:00:00.000Z'),
+            'gender': random.choice(('male', 'female', 'other')),
+            'phone': f'09{random.randrange(10**8):08d}',
+            'address': {'street': f'{i} Le Loi', 'ward': 'Ward 1', 'district': 'District 1', 'city': 'HCMC'},
+            'bloodType': random.choice(('A+', 'B+', 'O-', 'AB+')),
+            'createdAt': f'2025-0{1 + i % 9}-1{i % 10}T08:00:00.000Z',
+        })
+    return rows
+
+
+def main():
+    engine = Engine(libraries={'patient_filters': 'apps.patients.templatetags.patient_filters'})
+    with_filters = engine.from_string(FILTER_TEMPLATE)
+    with_attributes = engine.from_string(ATTRIBUTE_TEMPLATE)
+
+    print(f"{'rows':>6} {'filters (ms)':>14} {'presented (ms)':>16} {'speedup':>8}")
+    for size in SIZES:
+        rows = build_rows(size)
+
+        def render_filters():
+            # Every request decodes fresh records, so each render starts cold
+            with_filters.render(Context({'patients': PatientRecord.from_list(rows)}))
+
+        def render_presented():
+            patients = present_patients(PatientRecord.from_list(rows))
+            with_attributes.render(Context({'patients': patients}))
+
+        render_filters()
+        render_presented()
+        filters = min(timeit.repeat(render_filters, number=NUMBER, repeat=3)) / NUMBER * 1000
+        presented = min(timeit.repeat(render_presented, number=NUMBER, repeat=3)) / NUMBER * 1000
+        print(f"{size:>6} {filters:>14.2f} {presented:>16.2f} {filters / presented:>7.2f}x")
+
+    print(dates.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dict rows vs slot records for a 2000-appointment calendar month
+
+Compares the old calendar path (stdlib json + parsing scheduled_date in place)
+with AppointmentRecord.decode_page (orjson + lazily parsed slots).
+
+Usage: python benchmarks/bench_records.py
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.records import AppointmentRecord  # noqa: E402
+
+APPOINTMENTS = 2000
+ROUNDS = 50
+
+
+def build_payload(count=APPOINTMENTS):
+    """Gateway-shaped JSON body for one month of appointments"""
+    start = datetime(2025, 9, 1, 8, 0)
+    rows = []
+    for i in range(count):
+        scheduled = start + timedelta(days=random.randint(0, 29), minutes=30 * random.randint(0, 18))
+        rows.append({
+            'id': str(uuid.uuid4()),
+            'appointment_number': f'APT{i:06d}',
+            'patient_id': str(uuid.uuid4()),
+            'patient_name': f'Patient {i}',
+            'patient_phone': '0901234567',
+            'doctor_id': str(uuid.uuid4()),
+            'doctor_name': f'Doctor {i % 40}',
+            'appointment_type': 'consultation',
+            'scheduled_date': scheduled.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'duration_minutes': 30,
+            'status': random.choice(['scheduled', 'confirmed', 'completed', 'cancelled']),
+            'priority': 'normal',
+            'reason': 'Routine checkup',
+            'symptoms': '',
+            'notes': '',
+            'fee': '150000.00',
+            'created_at': '2025-08-20T09:12:44.120Z',
+            'updated_at': '2025-08-21T10:00:00.000Z',
+        })
+    body = {'success': True, 'data': {'appointments': rows, 'pagination': {'page': 1, 'total': count}}}
+    return json.dumps(body).encode()
+
+
+def dict_path(body):
+    """Previous calendar view behaviour"""
+    appointments = json.loads(body)['data']['appointments']
+    by_date = {}
+    for appointment in appointments:
+        value = appointment.get('scheduled_date') or appointment.get('scheduledDate') or ''
+        if value.endswith('Z'):
+            value = value[:-1]
+        appointment['scheduled_date'] = datetime.fromisoformat(value)
+        by_date.setdefault(appointment['scheduled_date'].strftime('%Y-%m-%d'), []).append(appointment)
+    return appointments, by_date
+
+
+def record_path(body):
+    """AppointmentCalendarView with records; the template then reads scheduled_date"""
+    appointments, _ = AppointmentRecord.decode_page(body, 'appointments')
+    by_date = {}
+    for appointment in appointments:
+        by_date.setdefault(appointment.date_key, []).append(appointment)
+    for appointment in appointments:
+        appointment.scheduled_date
+    return appointments, by_date
+
+
+def measure(func, body):
+    timings = []
+    for _ in range(ROUNDS):
+        gc.collect()
+        started = time.perf_counter()
+        func(body)
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(body)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return min(timings), retained
+
+
+def main():
+    random.seed(42)
+    body = build_payload()
+    print(f"Payload: {APPOINTMENTS} appointments, {len(body) / 1024:.0f} KiB")
+
+    dict_time, dict_mem = measure(dict_path, body)
+    record_time, record_mem = measure(record_path, body)
+
+    print(f"{'path':<10}{'best time':>14}{'retained':>14}")
+    print(f"{'dict':<10}{dict_time * 1000:>11.2f} ms{dict_mem / 1024:>10.0f} KiB")
+    print(f"{'record':<10}{record_time * 1000:>11.2f} ms{record_mem / 1024:>10.0f} KiB")
+    print(f"Saved: {(1 - record_time / dict_time) * 100:.0f}% time, {(1 - record_mem / dict_mem) * 100:.0f}% memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark: raw trend rows vs the apps.analytics.series pipeline
+
+Prints the JSON payload size and build time for growing trend histories.
+With the pipeline both stay flat once the history exceeds the point budget.
+
+Usage: python benchmarks/bench_series.py
+"""
+
+import json
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.analytics.series import build_series  # noqa: E402
+
+HISTORIES = (30, 365, 3650, 36500)
+NUMBER = 10
+
+
+def build_rows(days):
+    start = date(2025, 1, 1) - timedelta(days=days)
+    return [
+        {
+            'trend_date': f'{start + timedelta(days=i)}T00:00:00.000Z',
+            'appointments_count': (i * 7) % 23,
+            'daily_revenue': f'{(i * 13) % 997}.50',
+        }
+        for i in range(days)
+    ]
+
+
+def main():
+    print(f"{'days':>7} {'raw bytes':>11} {'series bytes':>13} {'points':>7} {'build (ms)':>11}")
+    for days in HISTORIES:
+        rows = build_rows(days)
+
+        def build():
+            return build_series(rows, 'trend_date', ('appointments_count', 'daily_revenue'), bucket='day')
+
+        series = build()
+        seconds = min(timeit.repeat(build, number=NUMBER, repeat=3)) / NUMBER
+        print(
+            f"{days:>7} {len(json.dumps(rows)):>11} {len(json.dumps(series)):>13} "
+            f"{len(series['timestamps']):>7} {seconds * 1000:>11.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
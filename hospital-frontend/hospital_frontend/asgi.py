@@ -1,21 +1,27 @@
 """
 ASGI config for Hospital Management Frontend project.
-Supports WebSocket for real-time notifications.
+Supports WebSocket for real-time notifications and live counters.
 """
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import apps.notifications.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_frontend.settings')
 
+# Set up Django before importing consumers, which read settings at import time
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+import apps.dashboard.routing  # noqa: E402
+import apps.notifications.routing  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             apps.notifications.routing.websocket_urlpatterns
+            + apps.dashboard.routing.websocket_urlpatterns
         )
     ),
 })
@@ -47,6 +47,7 @@ LOCAL_APPS = [
     'apps.notifications',
     'apps.users',
     'apps.analytics',
+    'apps.tasks',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -62,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'utils.middleware.APIAuthMiddleware',  # Custom middleware for API authentication
+    'utils.degraded.DegradedModeMiddleware',  # Stale-if-error reads while the gateway is down
 ]
 
 ROOT_URLCONF = 'hospital_frontend.urls'
@@ -78,6 +80,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'utils.context_processors.user_role',  # Custom context processor
+                'utils.degraded.degraded_mode',
+                'utils.live_updates.live_updates',
             ],
         },
     },
@@ -135,18 +139,54 @@ API_GATEWAY_BASE_URL = 'http://localhost:3000'
 API_GATEWAY_URL = 'http://localhost:3000'  # For notification views compatibility
 API_GATEWAY_TIMEOUT = 30
 
-# WebSocket Configuration for Real-time Features (In-memory for development)
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Seconds browsers may reuse public doctor profiles proxied from the gateway
+DOCTOR_PROFILE_MAX_AGE = int(os.getenv('DOCTOR_PROFILE_MAX_AGE', '300'))
+
+# WebSocket Configuration for Real-time Features: notifications fan out to
+# every worker process through Redis.  CHANNEL_LAYER_BACKEND=memory keeps them
+# inside one process (tests and single-process development).
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+if os.getenv('CHANNEL_LAYER_BACKEND', 'redis') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'capacity': 1500,
+                'expiry': 10,
+            },
+        },
+    }
 
 # WebSocket URL for notifications
 WEBSOCKET_URL = 'ws://localhost:3000/ws/notifications'
 
+# Upstream notification sockets (utils.notification_relay): seconds a user's
+# socket stays open after their last tab leaves, and the reconnect backoff cap
+NOTIFICATION_RELAY_GRACE = int(os.getenv('NOTIFICATION_RELAY_GRACE', '30'))
+NOTIFICATION_RELAY_MAX_BACKOFF = int(os.getenv('NOTIFICATION_RELAY_MAX_BACKOFF', '60'))
+
+# Live topics pushed to open pages (apps.dashboard.live): seconds between
+# upstream loads of each value, and how long an SSE fallback stream stays open
+LIVE_UNREAD_INTERVAL = int(os.getenv('LIVE_UNREAD_INTERVAL', '15'))
+LIVE_RETRY_STATS_INTERVAL = int(os.getenv('LIVE_RETRY_STATS_INTERVAL', '30'))
+LIVE_DASHBOARD_INTERVAL = int(os.getenv('LIVE_DASHBOARD_INTERVAL', '60'))
+# Server-sent events fallback for browsers whose WebSocket cannot connect.
+# Only works under an ASGI server (daphne/uvicorn); leave off with gunicorn WSGI
+LIVE_SSE_ENABLED = os.getenv('LIVE_SSE_ENABLED', 'False') == 'True'
+LIVE_SSE_DURATION = int(os.getenv('LIVE_SSE_DURATION', '300'))
+
 # Encryption Configuration
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'a1b2c3d4e5f6789012345678901234567890abcdef1234567890abcdef123456')
+# Previous ENCRYPTION_KEYs (comma separated), still accepted when reading
+# encrypted cache entries after a rotation
+ENCRYPTION_OLD_KEYS = [key for key in os.getenv('ENCRYPTION_OLD_KEYS', '').split(',') if key]
 
 # Crispy Forms Configuration
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -205,14 +245,88 @@ LOGGING = {
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
-# Cache Configuration (In-memory for development)
-CACHES = {
-    'default': {
+# Cache Configuration: in-memory for development, CACHE_BACKEND=redis to share
+# it between workers.  Entries holding patient data are encrypted with
+# ENCRYPTION_KEY before they reach the store (utils.encrypted_cache).
+if os.getenv('CACHE_BACKEND', 'locmem') == 'redis':
+    CACHE_STORE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    CACHE_STORE = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'hospital-frontend-cache',
     }
+CACHES = {
+    'default': {
+        'BACKEND': 'utils.encrypted_cache.EncryptedCache',
+        'OPTIONS': {'CACHE': CACHE_STORE},
+    }
 }
 
+# Seconds the aggregated user statistics (users:analytics) stay cached
+USER_STATS_CACHE_TTL = int(os.getenv('USER_STATS_CACHE_TTL', '300'))
+
+# Analytics dashboards are served stale-while-revalidate: entries older than
+# FRESH seconds are refreshed in the background, older than MAX_AGE reloaded
+ANALYTICS_CACHE_FRESH = int(os.getenv('ANALYTICS_CACHE_FRESH', '60'))
+ANALYTICS_CACHE_MAX_AGE = int(os.getenv('ANALYTICS_CACHE_MAX_AGE', '3600'))
+
+# Bulk patient import: uploads and error reports contain PHI, so they are
+# kept outside MEDIA_ROOT; WORKERS bounds concurrent gateway calls per job
+PATIENT_IMPORT_DIR = Path(os.getenv('PATIENT_IMPORT_DIR', BASE_DIR / 'var' / 'imports'))
+PATIENT_IMPORT_WORKERS = int(os.getenv('PATIENT_IMPORT_WORKERS', '8'))
+PATIENT_IMPORT_MAX_UPLOAD = int(os.getenv('PATIENT_IMPORT_MAX_UPLOAD', str(50 * 1024 * 1024)))
+# Seconds a queued import keeps the uploader's access token (encrypted, in the
+# shared cache); imports that have not started by then fail
+PATIENT_IMPORT_TOKEN_TTL = int(os.getenv('PATIENT_IMPORT_TOKEN_TTL', '3600'))
+
+# Bulk list actions: concurrent gateway calls per request and ids per request
+BULK_ACTION_WORKERS = int(os.getenv('BULK_ACTION_WORKERS', '8'))
+BULK_ACTION_MAX_ITEMS = int(os.getenv('BULK_ACTION_MAX_ITEMS', '200'))
+
+# Calendar (.ics) feeds: days before and after today they cover, and seconds
+# a built feed is cached per user
+ICAL_FEED_PAST_DAYS = int(os.getenv('ICAL_FEED_PAST_DAYS', '30'))
+ICAL_FEED_FUTURE_DAYS = int(os.getenv('ICAL_FEED_FUTURE_DAYS', '180'))
+ICAL_FEED_CACHE_TTL = int(os.getenv('ICAL_FEED_CACHE_TTL', '300'))
+
+# Background tasks (apps.tasks, run by `manage.py run_tasks`): a running task
+# whose worker has not reported for LEASE seconds is handed to another worker
+TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', '600'))
+
+# Degraded mode (utils.degraded): last good gateway reads are served for up
+# to MAX_AGE seconds when upstream fails, re-copied at most every REFRESH
+# seconds; the circuit opens after THRESHOLD consecutive failures and
+# refuses writes for OPEN_SECONDS before probing again
+STALE_IF_ERROR_MAX_AGE = int(os.getenv('STALE_IF_ERROR_MAX_AGE', '21600'))
+STALE_IF_ERROR_REFRESH = int(os.getenv('STALE_IF_ERROR_REFRESH', '60'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+
+# Backend domain events (`manage.py consume_events`): the exchange the services
+# publish to and the durable queue this frontend reads from it
+RABBITMQ_URL = os.getenv('RABBITMQ_URL', 'amqp://localhost:5672')
+RABBITMQ_EXCHANGE = os.getenv('RABBITMQ_EXCHANGE', 'hospital_notifications')
+DOMAIN_EVENTS_QUEUE = os.getenv('DOMAIN_EVENTS_QUEUE', 'frontend_cache_invalidation')
+
+# Caches dropped by domain events.  The consumer only reaches the web workers
+# through a shared cache (CACHE_BACKEND=redis); raise these where it runs
+DOCTOR_DIRECTORY_TTL = int(os.getenv('DOCTOR_DIRECTORY_TTL', '300'))
+MEDICATION_CATALOG_TTL = int(os.getenv('MEDICATION_CATALOG_TTL', '300'))
+PATIENT_INDEX_TTL = int(os.getenv('PATIENT_INDEX_TTL', '60'))
+PATIENT_HISTORY_CACHE_TTL = int(os.getenv('PATIENT_HISTORY_CACHE_TTL', '60'))
+
+# Email (credential emails are sent by the task worker)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'info@hospital.com')
+
 # Security Settings
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
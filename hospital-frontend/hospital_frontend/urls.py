@@ -26,6 +26,7 @@ urlpatterns = [
     path('prescriptions/', include('apps.prescriptions.urls')),
     path('users/', include('apps.users.urls')),
     path('analytics/', include('apps.analytics.urls')),
+    path('tasks/', include('apps.tasks.urls')),
 ]
 
 # Serve static and media files in development
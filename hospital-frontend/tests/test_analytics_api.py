@@ -0,0 +1,63 @@
+"""
+Test cases for batched AnalyticsAPIView requests
+"""
+import json
+import time
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.analytics import views
+from utils.swr_cache import CachedResult
+
+
+def _result(endpoint, token, doctor_id=None):
+    return CachedResult({'success': True, 'data': {'endpoint': endpoint}}, time.time(), f'"{endpoint}"')
+
+
+class BatchedAnalyticsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = views.AnalyticsAPIView()
+
+    def batch(self, query, role='doctor', user_id='doc-1', **headers):
+        request = self.factory.get('/analytics/api/', query, **headers)
+        return self.view.get_batch(request, 'token', query.get('doctor_id'), role, user_id)
+
+    @mock.patch.object(views, 'get_cached_analytics', side_effect=_result)
+    def test_combines_endpoints(self, fetch):
+        response = self.batch({'endpoints': 'doctor_dashboard,appointment_trends,doctor_dashboard', 'doctor_id': 'doc-1'})
+        payload = json.loads(response.content)
+
+        self.assertTrue(payload['success'])
+        self.assertEqual(set(payload['results']), {'doctor_dashboard', 'appointment_trends'})
+        self.assertEqual(fetch.call_count, 2)
+
+        cached = self.batch(
+            {'endpoints': 'doctor_dashboard,appointment_trends', 'doctor_id': 'doc-1'},
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    @mock.patch.object(views, 'get_cached_analytics', side_effect=_result)
+    def test_permissions_checked_before_fetching(self, fetch):
+        response = self.batch({'endpoints': 'doctor_dashboard,admin_dashboard', 'doctor_id': 'doc-1'})
+        self.assertFalse(json.loads(response.content)['success'])
+
+        response = self.batch({'endpoints': 'doctor_patients', 'doctor_id': 'doc-2'})
+        self.assertEqual(json.loads(response.content)['message'], 'doctor_patients: Access denied')
+        fetch.assert_not_called()
+
+    @mock.patch.object(views, 'get_cached_analytics')
+    def test_series_replaces_trend_rows(self, fetch):
+        trends = [{'appointment_date': '2025-09-0%d' % day, 'daily_count': day} for day in range(1, 4)]
+        fetch.return_value = CachedResult(
+            {'success': True, 'data': {'dashboard': {'recent_trends': trends}}}, time.time(), '"abc"'
+        )
+        response = self.batch({'endpoints': 'doctor_dashboard', 'doctor_id': 'doc-1', 'series': '1', 'points': 'x'})
+        document = json.loads(response.content)['results']['doctor_dashboard']
+
+        self.assertNotIn('recent_trends', document['data']['dashboard'])
+        self.assertEqual(document['series']['values']['daily_count'], [1, 2, 3])
+        self.assertTrue(response['ETag'].endswith('-auto-120"'))
@@ -0,0 +1,81 @@
+"""
+Test cases for booking appointments without preloaded patient/doctor lists
+"""
+from datetime import date, datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments import views as appointment_views
+
+DOCTORS = {'success': True, 'data': {'doctors': [
+    {'userId': 'doc-1', 'firstName': 'An', 'lastName': 'Le', 'specialization': 'Cardiology'},
+]}}
+
+
+class BookingLookupTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(appointment_views, 'APIClient')
+        self.api = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.api._make_request.return_value = DOCTORS
+        self.api.get_patient.return_value = {'success': True, 'data': {'id': 'p1', 'fullName': 'Tran Thi B', 'phone': '0907'}}
+        self.api.get_profile.return_value = {'success': True, 'data': {'id': 'staff-1'}}
+        self.api.post_direct.return_value = {'success': True, 'data': {}}
+        for name in ('messages', 'redirect'):
+            patcher = mock.patch.object(appointment_views, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(appointment_views, 'SlotFinder')
+        self.slot_finder = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.slot_finder.check.return_value = []
+
+    def request(self, method, data):
+        request = getattr(self.factory, method)('/appointments/book/', data)
+        request.session = {'access_token': 'token'}
+        return request
+
+    def test_form_does_not_preload_patients_or_doctors(self):
+        with mock.patch.object(appointment_views, 'render') as render:
+            appointment_views.BookAppointmentView().get(self.request('get', {'patient': 'p1'}))
+        context = render.call_args.args[2]
+        self.assertEqual(context['selected_patient_id'], 'p1')
+        self.assertNotIn('patients', context)
+        self.api.get_patients.assert_not_called()
+        self.api._make_request.assert_not_called()
+
+    def test_post_looks_up_only_the_chosen_records(self):
+        appointment_views.BookAppointmentView().post(self.request('post', {
+            'patient_id': 'p1', 'doctor_id': 'doc-1', 'scheduled_date': '2026-03-02T09:30'}))
+
+        payload = self.api.post_direct.call_args.args[1]
+        self.assertEqual((payload['patientName'], payload['patientPhone']), ('Tran Thi B', '0907'))
+        self.assertEqual(payload['doctorName'], 'An Le')
+        self.api.get_patient.assert_called_once_with(token='token', patient_id='p1')
+        self.api.get_patients.assert_not_called()
+        self.api.get_direct.assert_not_called()
+
+    def test_unknown_doctor_falls_back_to_user_service(self):
+        self.api.get_direct.return_value = {'success': True, 'data': {'fullName': 'Dr. Pham'}}
+        appointment_views.BookAppointmentView().post(self.request('post', {
+            'patient_id': 'p1', 'doctor_id': 'doc-9', 'scheduled_date': '2026-03-02T09:30'}))
+        self.assertEqual(self.api.post_direct.call_args.args[1]['doctorName'], 'Dr. Pham')
+
+    def test_conflicting_time_never_reaches_the_service(self):
+        self.slot_finder.check.return_value = [{'code': 'double_booking', 'message': 'Taken'}]
+        appointment_views.BookAppointmentView().post(self.request('post', {
+            'patient_id': 'p1', 'doctor_id': 'doc-1', 'scheduled_date': '2026-03-02T09:30', 'duration_minutes': '45'}))
+        self.slot_finder.check.assert_called_once_with(datetime(2026, 3, 2, 9, 30), 45)
+        self.api.get_patient.assert_not_called()
+        self.api.get_profile.assert_not_called()
+        self.api.post_direct.assert_not_called()
+
+    def test_booking_drops_the_cached_day(self):
+        appointment_views.BookAppointmentView().post(self.request('post', {
+            'patient_id': 'p1', 'doctor_id': 'doc-1', 'scheduled_date': '2026-03-02T09:30'}))
+        self.slot_finder.forget.assert_called_once_with(date(2026, 3, 2))
@@ -0,0 +1,111 @@
+"""
+Test cases for bulk list actions
+"""
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments import views as appointment_views
+from utils.bulk_actions import BulkAction, bulk_action_response, parse_bulk_request
+
+APPOINTMENTS = {
+    'a1': {'id': 'a1', 'status': 'scheduled', 'doctorId': 'doc-1'},
+    'a2': {'id': 'a2', 'status': 'completed', 'doctorId': 'doc-1'},
+    'a3': {'id': 'a3', 'status': 'scheduled', 'doctorId': 'doc-2'},
+}
+
+
+def _load(appointment_id):
+    if appointment_id in APPOINTMENTS:
+        return {'success': True, 'data': APPOINTMENTS[appointment_id]}
+    return {'success': False, 'message': 'Appointment not found'}
+
+
+class ParseBulkRequestTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_form_and_json_bodies(self):
+        request = self.factory.post('/', {'action': 'cancel', 'ids': ['a1,a2', 'a1', ' a3 ']})
+        self.assertEqual(parse_bulk_request(request), ('cancel', ['a1', 'a2', 'a3']))
+        request = self.factory.post('/', json.dumps({'action': 'confirm', 'ids': ['a1']}), content_type='application/json')
+        self.assertEqual(parse_bulk_request(request), ('confirm', ['a1']))
+
+    def test_rejects_empty_and_oversized_batches(self):
+        with self.assertRaises(ValueError):
+            parse_bulk_request(self.factory.post('/', {'action': 'cancel'}))
+        with self.settings(BULK_ACTION_MAX_ITEMS=2):
+            with self.assertRaises(ValueError):
+                parse_bulk_request(self.factory.post('/', {'action': 'cancel', 'ids': 'a1,a2,a3'}))
+
+
+class BulkActionResponseTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.perform = mock.Mock(return_value={'success': True})
+        self.actions = {'confirm': BulkAction(
+            'confirm', _load, self.perform, lambda record: record['status'], allowed_from=('scheduled',),
+        )}
+
+    def test_per_item_results_in_request_order(self):
+        invalidate = mock.Mock()
+        request = self.factory.post('/', {'action': 'confirm', 'ids': 'a2,missing,a1'})
+        payload = json.loads(bulk_action_response(request, self.actions, invalidate).content)
+
+        self.assertEqual([row['id'] for row in payload['results']], ['a2', 'missing', 'a1'])
+        self.assertEqual([row['outcome'] for row in payload['results']], ['skipped', 'failed', 'done'])
+        self.assertEqual(payload['results'][0]['previous'], 'completed')
+        self.assertEqual(payload['summary'], {'done': 1, 'skipped': 1, 'failed': 1})
+        self.perform.assert_called_once_with('a1', APPOINTMENTS['a1'])
+        invalidate.assert_called_once_with([payload['results'][2]])
+
+    def test_no_invalidation_when_nothing_changed(self):
+        invalidate = mock.Mock()
+        request = self.factory.post('/', {'action': 'confirm', 'ids': 'a2'})
+        bulk_action_response(request, self.actions, invalidate)
+        invalidate.assert_not_called()
+
+    def test_unknown_action(self):
+        response = bulk_action_response(self.factory.post('/', {'action': 'delete', 'ids': 'a1'}), self.actions)
+        self.assertEqual(response.status_code, 400)
+
+
+class AppointmentBulkActionTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @mock.patch.object(appointment_views, 'counters_changed')
+    @mock.patch.object(appointment_views, 'analytics_cache')
+    @mock.patch.object(appointment_views, 'APIClient')
+    def test_doctor_can_only_cancel_own_appointments(self, client_class, analytics_cache, counters_changed):
+        client = client_class.return_value
+        client.get_direct.side_effect = lambda url: _load(url.rsplit('/', 1)[-1])
+        client._make_request.return_value = {'success': True}
+
+        request = self.factory.post('/appointments/bulk/', {'action': 'cancel', 'ids': 'a1,a3'})
+        request.session = {'access_token': 'token', 'user_role': 'doctor', 'user_id': 'doc-1'}
+        response = appointment_views.AppointmentBulkActionView().post(request)
+        payload = json.loads(response.content)
+
+        self.assertEqual([row['outcome'] for row in payload['results']], ['done', 'skipped'])
+        client._make_request.assert_called_once_with('PUT', '/api/appointments/a1', token='token', data={'status': 'cancelled'})
+        analytics_cache.invalidate_all.assert_called_once_with()
+        counters_changed.assert_called_once_with('doc-1')
+
+    @mock.patch.object(appointment_views, 'counters_changed')
+    @mock.patch.object(appointment_views, 'analytics_cache')
+    @mock.patch.object(appointment_views, 'APIClient')
+    def test_staff_changes_mark_each_doctor(self, client_class, analytics_cache, counters_changed):
+        client = client_class.return_value
+        client.get_direct.side_effect = lambda url: _load(url.rsplit('/', 1)[-1])
+        client._make_request.return_value = {'success': True}
+
+        request = self.factory.post('/appointments/bulk/', {'action': 'confirm', 'ids': 'a1,a2,a3'})
+        request.session = {'access_token': 'token', 'user_role': 'staff', 'user_id': 'staff-1'}
+        appointment_views.AppointmentBulkActionView().post(request)
+
+        self.assertEqual(sorted(call.args[0] for call in counters_changed.call_args_list), ['doc-1', 'doc-2'])
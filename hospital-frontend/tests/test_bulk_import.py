@@ -0,0 +1,223 @@
+"""
+Test cases for the bulk patient import
+"""
+import csv
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from apps.patients import bulk_import
+from apps.patients import tasks as patient_tasks
+from apps.tasks import queue
+from apps.tasks.models import ImportedRow, Task
+
+HEADER = 'fullName,dateOfBirth,gender,phone,email,username,password\n'
+ROWS = (
+    'Nguyen Van A,1990-01-15,male,0901234567,a@example.com,nva,secret123\n'
+    'Tran Thi B,1985-13-01,female,0907654321,,,\n'
+    'Le Van C,2001-06-30,male,0912345678,,,\n'
+)
+
+
+class PayloadTests(SimpleTestCase):
+
+    def test_valid_row_builds_both_payloads(self):
+        row = {'fullName': 'Nguyen Van A', 'dateOfBirth': '15/01/1990', 'gender': 'Male',
+               'phone': '0901234567', 'email': 'a@example.com', 'username': 'nva', 'password': 'x'}
+        patient, account, errors = bulk_import.build_payloads(row, 'staff-1')
+        self.assertEqual(errors, [])
+        self.assertEqual(patient['dateOfBirth'], '1990-01-15')
+        self.assertEqual(patient['gender'], 'male')
+        self.assertEqual(account['profile']['lastName'], 'Van A')
+
+    def test_invalid_row_lists_every_problem(self):
+        row = {'fullName': '', 'dateOfBirth': 'soon', 'gender': 'x', 'phone': '12', 'username': 'u'}
+        _, _, errors = bulk_import.build_payloads(row, 'staff-1')
+        self.assertEqual(len(errors), 5)
+
+    def test_idempotency_key_ignores_formatting(self):
+        first = {'fullName': 'Le Van C ', 'dateOfBirth': '2001-06-30', 'phone': '091 234 5678'}
+        second = {'fullName': 'le van c', 'dateOfBirth': '2001-06-30', 'phone': '0912345678'}
+        self.assertEqual(bulk_import.idempotency_key(first), bulk_import.idempotency_key(second))
+        self.assertNotEqual(bulk_import.idempotency_key(dict(first, externalId='42')),
+                            bulk_import.idempotency_key(first))
+
+    @mock.patch.object(bulk_import.time, 'sleep')
+    def test_retries_transient_failures_only(self, sleep):
+        flaky = mock.Mock(side_effect=[{'success': False, 'status_code': 503}, {'success': True}])
+        self.assertTrue(bulk_import.call_with_retries(flaky)['success'])
+        rejected = mock.Mock(return_value={'success': False, 'status_code': 400, 'message': 'Duplicate'})
+        self.assertFalse(bulk_import.call_with_retries(rejected)['success'])
+        self.assertEqual(rejected.call_count, 1)
+        self.assertEqual(sleep.call_count, 1)
+
+
+class ImporterTests(TransactionTestCase):
+    # Rows are imported on worker threads, which need committed data
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = override_settings(PATIENT_IMPORT_DIR=Path(self.directory.name))
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        # Progress normally goes to the task row; collected here instead
+        self.jobs = {}
+        patcher = mock.patch.object(bulk_import, 'save_job', side_effect=lambda job: self.jobs.__setitem__(job['id'], job))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(bulk_import, 'api_client')
+        self.api = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api.register.return_value = {'success': True, 'data': {'id': 'user-1'}}
+        self.api.create_patient.side_effect = lambda token, patient_data: {
+            'success': True, 'data': {'id': patient_data.get('id', 'patient-x')}}
+        self.api.get_patient.return_value = {'success': False, 'status_code': 404, 'message': 'Not found'}
+        self.api.get_patients.return_value = {'success': True, 'data': {'patients': []}}
+        patcher = mock.patch.object(bulk_import.time, 'sleep')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_import(self, job_id):
+        source = Path(self.directory.name) / f'{job_id}.csv'
+        source.write_text(HEADER + ROWS, encoding='utf-8')
+        job = bulk_import.new_job(job_id, 'staff-1', 'patients.csv')
+        bulk_import.PatientImporter(job, 'token', source, workers=2).run()
+        return self.jobs[job_id]
+
+    def test_import_reports_progress_and_errors(self):
+        job = self.run_import('job1')
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['total'], job['created'], job['failed'], job['processed']), (3, 2, 1, 3))
+        self.api.register.assert_called_once()
+        # Rows run on two workers, so calls arrive in any order
+        created = {call.kwargs['patient_data']['fullName']: call.kwargs['patient_data']
+                   for call in self.api.create_patient.call_args_list}
+        self.assertEqual(created['Nguyen Van A']['id'], 'user-1')
+        self.assertNotIn('id', created['Le Van C'])
+
+        with open(bulk_import.error_report_path('job1'), newline='') as report:
+            rows = list(csv.reader(report))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][:2], ['3', 'Tran Thi B'])
+
+    def test_rerun_skips_imported_rows(self):
+        self.run_import('job1')
+        self.api.reset_mock()
+        job = self.run_import('job2')
+        self.assertEqual((job['created'], job['skipped']), (0, 2))
+        self.api.register.assert_not_called()
+        self.api.create_patient.assert_not_called()
+
+    def test_registered_account_is_reused_when_patient_creation_failed(self):
+        self.api.create_patient.side_effect = None
+        self.api.create_patient.return_value = {'success': False, 'status_code': 400, 'message': 'Invalid'}
+        self.run_import('job1')
+        self.api.create_patient.side_effect = lambda token, patient_data: {'success': True, 'data': {}}
+        job = self.run_import('job2')
+        self.assertEqual(job['created'], 2)
+        self.assertEqual(self.api.register.call_count, 1)
+
+    def test_outcomes_are_kept_in_the_database(self):
+        self.run_import('job1')
+        self.assertEqual(sorted(ImportedRow.objects.values_list('account_id', 'result_id')),
+                         [('', 'patient-x'), ('user-1', 'user-1')])
+
+    def test_expired_session_stops_the_import(self):
+        self.api.create_patient.side_effect = None
+        self.api.create_patient.return_value = {'success': False, 'status_code': 401, 'message': 'Token expired'}
+        job = self.run_import('job1')
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('session expired', job['message'])
+        # Rows cut short by the expiry are neither failed nor remembered as done
+        self.assertEqual(job['failed'], 1)
+        self.assertFalse(ImportedRow.objects.exclude(result_id=''))
+
+    def test_timed_out_create_is_looked_up_before_retrying(self):
+        def create(token, patient_data):
+            # The first create for Le Van C lands upstream but its answer is lost
+            if patient_data['fullName'] == 'Le Van C' and not self.api.get_patients.called:
+                self.api.get_patients.return_value = {'success': True, 'data': {'patients': [
+                    {'id': 'patient-c', 'phone': '091 234 5678', 'dateOfBirth': '2001-06-30T00:00:00.000Z'}]}}
+                return {'success': False, 'status_code': 504, 'message': 'Gateway timeout'}
+            return {'success': True, 'data': {'id': patient_data.get('id', 'patient-x')}}
+        self.api.create_patient.side_effect = create
+
+        job = self.run_import('job1')
+        self.assertEqual((job['created'], job['failed']), (2, 1))
+        names = [call.kwargs['patient_data']['fullName'] for call in self.api.create_patient.call_args_list]
+        self.assertEqual(names.count('Le Van C'), 1)
+        self.assertTrue(ImportedRow.objects.filter(result_id='patient-c').exists())
+
+    def test_uncertain_rows_are_looked_up_on_the_next_run(self):
+        self.api.create_patient.side_effect = None
+        self.api.create_patient.return_value = {'success': False, 'status_code': 504, 'message': 'Gateway timeout'}
+        job = self.run_import('job1')
+        self.assertEqual(job['failed'], 3)
+
+        # Nguyen Van A's patient shares the account id, and was created after all
+        self.api.get_patient.return_value = {'success': True, 'data': {'id': 'user-1'}}
+        self.api.create_patient.reset_mock()
+        self.api.create_patient.side_effect = lambda token, patient_data: {'success': True, 'data': {'id': 'patient-x'}}
+        job = self.run_import('job2')
+        self.assertEqual((job['created'], job['skipped']), (1, 1))
+        self.assertEqual([call.kwargs['patient_data']['fullName'] for call in self.api.create_patient.call_args_list],
+                         ['Le Van C'])
+
+    def test_worker_threads_close_their_connections(self):
+        closed = []
+        with mock.patch.object(bulk_import, 'connections') as connections:
+            connections.close_all.side_effect = lambda: closed.append(threading.current_thread().name)
+            self.run_import('job1')
+        self.assertEqual(len(closed), 2)
+        self.assertTrue(all(name.startswith('patient-import') for name in closed))
+
+    def test_missing_columns_fail_the_job(self):
+        source = Path(self.directory.name) / 'bad.csv'
+        source.write_text('name,phone\nA,1\n', encoding='utf-8')
+        bulk_import.PatientImporter(bulk_import.new_job('bad', 'staff-1', 'bad.csv'), 'token', source).run()
+        self.assertEqual(self.jobs['bad']['status'], 'failed')
+        self.assertIn('fullName', self.jobs['bad']['message'])
+
+
+class ImportTaskTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = override_settings(PATIENT_IMPORT_DIR=Path(self.directory.name))
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        patcher = mock.patch.object(patient_tasks.bulk_import, 'PatientImporter')
+        self.importer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start(self):
+        upload = SimpleUploadedFile('patients.csv', (HEADER + ROWS).encode('utf-8'))
+        return Task.objects.get(pk=bulk_import.start_import(upload, 'access-token', 'staff-1')['id'])
+
+    def test_token_is_kept_out_of_the_task_row(self):
+        task = self.start()
+        self.assertNotIn('access-token', str(task.payload))
+        self.assertEqual(bulk_import.stashed_token(task.payload['token_ref']), 'access-token')
+
+        queue.run_pending('test-worker')
+        self.assertEqual(self.importer.call_args.args[1], 'access-token')
+        self.assertIsNone(bulk_import.stashed_token(task.payload['token_ref']))
+        self.assertNotIn('token_ref', Task.objects.get(pk=task.pk).payload)
+
+    def test_import_fails_when_the_token_is_gone(self):
+        task = self.start()
+        bulk_import.forget_token(task.payload['token_ref'])
+        queue.run_pending('test-worker')
+
+        self.importer.assert_not_called()
+        job = bulk_import.get_job(task.pk)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('Upload the file again', job['message'])
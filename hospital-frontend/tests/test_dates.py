@@ -0,0 +1,63 @@
+"""
+Test cases for the shared date helpers
+"""
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from utils import dates
+
+
+class ParseDateTimeTests(SimpleTestCase):
+    """ISO parsing used by views and template filters"""
+
+    def test_trailing_z_is_local_wall_clock(self):
+        parsed = dates.parse_datetime('2025-08-08T19:56:07.320Z')
+        self.assertEqual(parsed, datetime(2025, 8, 8, 19, 56, 7, 320000))
+        self.assertIsNone(parsed.tzinfo)
+
+    def test_aware_marks_naive_values_utc(self):
+        parsed = dates.parse_datetime('2025-08-08T19:56:07Z', aware=True)
+        self.assertEqual(parsed.tzinfo, timezone.utc)
+
+    def test_long_fractions_are_truncated(self):
+        parsed = dates.parse_datetime('2025-08-08T19:56:07.1234567Z')
+        self.assertEqual(parsed.microsecond, 123456)
+
+    def test_invalid_values_return_none(self):
+        for value in (None, '', 'not a date', 42):
+            self.assertIsNone(dates.parse_datetime(value))
+
+
+class AgeTests(SimpleTestCase):
+    """Age computation shared by patients and prescriptions"""
+
+    def test_iso_birth_date_ignores_time_part(self):
+        self.assertEqual(dates.calculate_age('1993-01-14T17:00:00.000Z', today=date(2025, 1, 14)), 32)
+        self.assertEqual(dates.calculate_age('1993-01-14T17:00:00.000Z', today=date(2025, 1, 13)), 31)
+
+    def test_day_month_year_format(self):
+        self.assertEqual(dates.calculate_age('14/01/1993', today=date(2025, 1, 14)), 32)
+
+    def test_unparseable_birth_date(self):
+        self.assertIsNone(dates.calculate_age('unknown'))
+
+
+class FormatTests(SimpleTestCase):
+    """Django format strings translated to strftime"""
+
+    def test_matches_template_formats(self):
+        value = '2025-03-05T14:07:00.000Z'
+        self.assertEqual(dates.format_datetime(value, 'd/m/Y H:i'), '05/03/2025 14:07')
+        self.assertEqual(dates.format_date(value, 'F d, Y'), 'March 05, 2025')
+        self.assertEqual(dates.format_date(value, 'M d, Y'), 'Mar 05, 2025')
+
+    def test_unpadded_and_escaped_characters(self):
+        value = datetime(2025, 3, 5, 14, 7)
+        self.assertEqual(dates.format_value(value, r'j/n \Y G:i'), '5/3 Y 14:07')
+
+    def test_strftime_patterns_pass_through(self):
+        self.assertEqual(dates.format_date('2025-03-05', '%Y/%m/%d'), '2025/03/05')
+
+    def test_default_on_failure(self):
+        self.assertEqual(dates.format_datetime('garbage', default='N/A'), 'N/A')
@@ -0,0 +1,145 @@
+"""
+Test cases for stale-if-error reads and the gateway circuit
+"""
+import contextvars
+import json
+from unittest import mock
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils import degraded
+
+
+class FakeClient:
+
+    def __init__(self, token=None):
+        self.token = token
+        self.responses = []
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def _make_request(self, method, endpoint, token=None, data=None, params=None):
+        return self._next()
+
+    def get_direct(self, url, params=None):
+        return self._next()
+
+
+degraded.install(FakeClient)
+
+GOOD = {'success': True, 'data': {'patients': [{'id': 'p1'}]}}
+DOWN = {'success': False, 'message': 'Service unavailable', 'status_code': 503}
+
+
+@override_settings(CIRCUIT_FAILURE_THRESHOLD=3, CIRCUIT_OPEN_SECONDS=30, STALE_IF_ERROR_REFRESH=0)
+class StaleIfErrorTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = FakeClient(token='tok')
+
+    def test_serves_the_last_good_response_flagged_stale(self):
+        self.client.responses = [GOOD, DOWN, ConnectionError('refused')]
+        self.assertEqual(self.client._make_request('GET', '/api/patients', token='tok'), GOOD)
+        for _ in range(2):
+            stale = self.client._make_request('GET', '/api/patients', token='tok')
+            self.assertTrue(stale['stale'])
+            self.assertEqual(stale['data'], GOOD['data'])
+
+    def test_copies_are_per_token_and_per_request(self):
+        self.client.responses = [GOOD, DOWN, DOWN]
+        self.client._make_request('GET', '/api/patients', token='tok', params={'page': 1})
+        self.assertEqual(self.client._make_request('GET', '/api/patients', token='other', params={'page': 1}), DOWN)
+        self.assertEqual(self.client._make_request('GET', '/api/patients', token='tok', params={'page': 2}), DOWN)
+
+    def test_client_errors_are_not_outages(self):
+        missing = {'success': False, 'message': 'Patient not found', 'status_code': 404}
+        self.client.responses = [GOOD, missing]
+        self.client.get_direct('http://localhost:3003/api/appointments/a1')
+        self.assertEqual(self.client.get_direct('http://localhost:3003/api/appointments/a1'), missing)
+
+    def test_writes_are_never_served_from_copies(self):
+        self.client.responses = [GOOD, DOWN]
+        self.client._make_request('POST', '/api/patients', token='tok', data={})
+        self.assertEqual(self.client._make_request('POST', '/api/patients', token='tok', data={}), DOWN)
+
+    def test_error_without_a_copy_is_raised(self):
+        self.client.responses = [ConnectionError('refused')]
+        with self.assertRaises(ConnectionError):
+            self.client._make_request('GET', '/api/patients', token='tok')
+
+    def test_open_circuit_answers_without_calling_upstream(self):
+        self.client.responses = [GOOD, DOWN, DOWN, DOWN, GOOD]
+        self.client._make_request('GET', '/api/patients', token='tok')
+        for _ in range(3):
+            self.client._make_request('GET', '/api/patients', token='tok')
+        self.assertTrue(degraded.circuit_open())
+        # The first call after opening is the probe; it succeeds and closes the circuit
+        self.assertEqual(self.client._make_request('GET', '/api/patients', token='tok'), GOOD)
+        self.assertFalse(degraded.circuit_open())
+
+    def test_fails_fast_while_a_probe_is_out(self):
+        self.client.responses = [DOWN, DOWN, DOWN]
+        for _ in range(3):
+            self.client._make_request('GET', '/api/patients', token='tok')
+        cache.set(degraded.CIRCUIT_PROBE_KEY, 1)
+        response = self.client._make_request('GET', '/api/patients', token='tok')
+        self.assertEqual(response['status_code'], 503)
+        self.assertEqual(self.client.calls, 3)
+
+
+class DegradedModeMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        with mock.patch.object(degraded, 'install'), mock.patch.dict('sys.modules', {'utils.api_client': mock.Mock()}):
+            self.middleware = degraded.DegradedModeMiddleware(self.view)
+
+    def view(self, request):
+        return HttpResponse(json.dumps(degraded.degraded_mode(request)['degraded_mode']))
+
+    def post(self, **headers):
+        request = self.factory.post('/patients/create/', HTTP_REFERER='http://testserver/patients/', **headers)
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return self.middleware(request)
+
+    def test_writes_pass_while_the_circuit_is_closed(self):
+        self.assertEqual(self.post().content, b'false')
+
+    def test_writes_are_refused_while_the_circuit_is_open(self):
+        cache.set(degraded.CIRCUIT_OPEN_KEY, 1000.0)
+        response = self.post()
+        self.assertEqual((response.status_code, response['Location']), (302, 'http://testserver/patients/'))
+        response = self.post(HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(json.loads(response.content)['degraded'])
+
+    def test_banner_follows_stale_reads_of_the_request(self):
+        cache.set('copy', {'response': GOOD, 'stored_at': 10 ** 10})
+
+        def view(request):
+            degraded.stale_copy('copy')
+            return HttpResponse(json.dumps(degraded.degraded_mode(request)['degraded_mode']))
+
+        self.middleware.get_response = view
+        # Run in a copy of the context so nothing set here reaches other tests
+        response = contextvars.copy_context().run(self.middleware, self.factory.get('/patients/'))
+        self.assertEqual(response.content, b'true')
+        self.assertFalse(degraded.degraded_mode(None)['degraded_mode'])
+
+    def test_stale_reads_outside_a_request_are_not_recorded(self):
+        cache.set('copy', {'response': GOOD, 'stored_at': 10 ** 10})
+        self.assertTrue(degraded.stale_copy('copy')['stale'])
+        self.assertFalse(degraded.degraded_mode(None)['degraded_mode'])
+        self.assertEqual(self.middleware(self.factory.get('/patients/')).content, b'false')
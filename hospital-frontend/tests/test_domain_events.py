@@ -0,0 +1,127 @@
+"""
+Test cases for the domain-event cache invalidation consumer
+"""
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments.ical import feed_cache_key
+from apps.appointments.slots import day_plan_key
+from apps.appointments.views import DOCTOR_DIRECTORY_KEY
+from apps.appointments.worklist import CHANGED_KEY
+from apps.patients.views import history_cache_key, patient_index_key
+from apps.prescriptions.views import MEDICATION_CATALOG_KEY
+from apps.tasks.cache_events import router
+from apps.tasks.management.commands.consume_events import Command
+from utils.domain_events import EventRouter, LocalBroker, event_data, event_name, topic_matches
+
+CHECK_SHARED_CACHE = Command.check_shared_cache
+
+
+class TopicTests(SimpleTestCase):
+
+    def test_topic_patterns(self):
+        self.assertTrue(topic_matches('appointment.#', 'appointment.confirmed'))
+        self.assertTrue(topic_matches('appointment.#', 'appointment'))
+        self.assertTrue(topic_matches('*.updated', 'prescription.updated'))
+        self.assertFalse(topic_matches('*.updated', 'user.profile.updated'))
+        self.assertTrue(topic_matches('user.#', 'user.profile.updated'))
+        self.assertFalse(topic_matches('appointment.*', 'prescription.ready'))
+
+    def test_backend_message_shapes(self):
+        self.assertEqual(event_name('PRESCRIPTION_READY'), 'prescription.ready')
+        self.assertEqual(event_name('appointment.confirmed'), 'appointment.confirmed')
+        self.assertEqual(event_data({'type': 'appointment_confirmed', 'data': {'id': 1}}), {'id': 1})
+        self.assertEqual(event_data({'id': 2, 'timestamp': 'x'}), {'id': 2, 'timestamp': 'x'})
+
+    def test_failing_handler_does_not_stop_the_others(self):
+        events = EventRouter()
+        seen = []
+        events.on('a.#')(mock.Mock(side_effect=RuntimeError('boom'), __name__='broken'))
+        events.on('a.*')(lambda name, data: seen.append((name, data)))
+        self.assertEqual(events.dispatch('a.b', b'{"data": {"id": 1}}'), 1)
+        self.assertEqual(seen, [('a.b', {'id': 1})])
+        self.assertEqual(events.dispatch('a.b', b'not json'), 0)
+
+
+class InvalidationTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.session = {'user_id': 'u1'}
+
+    def test_appointment_event_drops_its_entries(self):
+        keys = [feed_cache_key('p1', 'patient'), feed_cache_key('d1', 'doctor'), day_plan_key('d1', date(2025, 3, 4)),
+                feed_cache_key('d2', 'doctor')]
+        cache.set_many({key: 'x' for key in keys})
+        router.dispatch('appointment.cancelled', {'data': {
+            'patientId': 'p1', 'doctorId': 'd1', 'scheduledDate': '2025-03-04T09:30:00'}})
+        self.assertEqual(cache.get_many(keys), {feed_cache_key('d2', 'doctor'): 'x'})
+        self.assertIsNotNone(cache.get(CHANGED_KEY))
+
+    def test_appointment_without_doctor_rebuilds_every_feed(self):
+        key = feed_cache_key('d2', 'doctor')
+        router.dispatch('appointment.confirmed', {'type': 'appointment_confirmed', 'data': {'recipient_user_id': 'p1'}})
+        self.assertNotEqual(feed_cache_key('d2', 'doctor'), key)
+
+    def test_reminders_change_nothing(self):
+        router.dispatch('appointment.reminder', {'data': {'recipient_user_id': 'p1'}})
+        self.assertIsNone(cache.get(CHANGED_KEY))
+
+    def test_catalogs(self):
+        cache.set_many({DOCTOR_DIRECTORY_KEY: {}, MEDICATION_CATALOG_KEY: {}})
+        router.dispatch('user.profile.updated', {'id': 'u9'})
+        router.dispatch('medication.updated', {'medication_code': 'MED1'})
+        self.assertEqual(cache.get_many([DOCTOR_DIRECTORY_KEY, MEDICATION_CATALOG_KEY]), {})
+
+    def test_patient_event_drops_index_and_history(self):
+        index = patient_index_key(self.request, 'nguyen', 5)
+        history = history_cache_key(self.request, 'p1')
+        other = history_cache_key(self.request, 'p2')
+        router.dispatch('patient.updated', {'id': 'p1'})
+        self.assertNotEqual(patient_index_key(self.request, 'nguyen', 5), index)
+        self.assertNotEqual(history_cache_key(self.request, 'p1'), history)
+        self.assertEqual(history_cache_key(self.request, 'p2'), other)
+
+
+class ConsumeEventsCommandTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.broker = LocalBroker()
+        patcher = mock.patch.object(Command, 'make_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The test cache is locmem, shared with the command in this process
+        patcher = mock.patch.object(Command, 'check_shared_cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refuses_a_process_local_cache(self):
+        with self.assertRaises(CommandError):
+            CHECK_SHARED_CACHE(Command())
+
+    def test_drains_the_queue_after_resetting_caches(self):
+        # Bindings are made by the command, so publish after binding
+        self.broker.bind(['#'])
+        self.broker.publish('PRESCRIPTION_READY', {'type': 'prescription_ready', 'data': {'patient_name': 'A'}})
+        self.broker.publish('medication.updated', {'medication_code': 'MED1'})
+        cache.set(MEDICATION_CATALOG_KEY, {'MED1': 'Old name'})
+        with mock.patch('apps.tasks.management.commands.consume_events.reset_all') as reset_all:
+            out = StringIO()
+            call_command('consume_events', '--once', stdout=out)
+        reset_all.assert_called_once()
+        self.assertIn('after 2 event(s)', out.getvalue())
+        self.assertIsNone(cache.get(MEDICATION_CATALOG_KEY))
+        self.assertFalse(self.broker.messages)
+
+    def test_only_bound_keys_are_queued(self):
+        self.broker.bind(['appointment.*'])
+        self.broker.publish('PRESCRIPTION_READY', {})
+        self.broker.publish('appointment.confirmed', {})
+        self.assertEqual([key for key, _ in self.broker.messages], ['appointment.confirmed'])
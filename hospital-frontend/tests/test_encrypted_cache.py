@@ -0,0 +1,94 @@
+"""
+Test cases for encrypted-at-rest cache entries
+"""
+from django.test import SimpleTestCase, override_settings
+
+from utils.encrypted_cache import MAGIC, EncryptedCache, Sealer, SealError
+
+KEY = '00' * 32
+NEW_KEY = '11' * 32
+
+HISTORY = {'patient': {'id': 'p1', 'full_name': 'Nguyen Van A'}, 'diagnoses': ['J45.909']}
+
+
+def make_cache(name):
+    return EncryptedCache('', {'OPTIONS': {'CACHE': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}}})
+
+
+class SealerTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        sealer = Sealer(KEY)
+        token = sealer.seal('patients:history:p1', HISTORY)
+        self.assertTrue(token.startswith(MAGIC))
+        self.assertNotIn(b'Nguyen', token)
+        self.assertEqual(sealer.open('patients:history:p1', token), HISTORY)
+
+    def test_entries_are_bound_to_their_key(self):
+        sealer = Sealer(KEY)
+        token = sealer.seal('patients:history:p1', HISTORY)
+        with self.assertRaises(SealError):
+            sealer.open('patients:history:p2', token)
+
+    def test_tampering_is_detected(self):
+        sealer = Sealer(KEY)
+        token = bytearray(sealer.seal('patients:history:p1', HISTORY))
+        token[-1] ^= 1
+        with self.assertRaises(SealError):
+            sealer.open('patients:history:p1', bytes(token))
+
+    def test_rotation(self):
+        old = Sealer(KEY).seal('patients:history:p1', HISTORY)
+        rotated = Sealer(NEW_KEY, [KEY])
+        self.assertEqual(rotated.open('patients:history:p1', old), HISTORY)
+        self.assertEqual(Sealer(NEW_KEY).open('patients:history:p1', rotated.seal('patients:history:p1', HISTORY)),
+                         HISTORY)
+        with self.assertRaises(SealError):
+            Sealer(NEW_KEY).open('patients:history:p1', old)
+
+    def test_passphrase_keys(self):
+        sealer = Sealer('not a hex key')
+        self.assertEqual(sealer.open('k', sealer.seal('k', [1, 2])), [1, 2])
+
+
+@override_settings(ENCRYPTION_KEY=KEY, ENCRYPTION_OLD_KEYS=[])
+class EncryptedCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = make_cache('encrypted-cache-tests')
+        self.cache.clear()
+
+    def test_patient_entries_are_stored_encrypted(self):
+        self.cache.set('patients:history:p1', HISTORY)
+        stored = self.cache.store.get('patients:history:p1')
+        self.assertTrue(stored.startswith(MAGIC))
+        self.assertEqual(self.cache.get('patients:history:p1'), HISTORY)
+
+    def test_other_entries_and_counters_are_stored_as_is(self):
+        self.cache.set('live:unread_count:u1', {'count': 3})
+        self.assertEqual(self.cache.store.get('live:unread_count:u1'), {'count': 3})
+        self.cache.set('patients:history:generation', 1, None)
+        self.assertEqual(self.cache.incr('patients:history:generation'), 2)
+        self.assertEqual(self.cache.get('patients:history:generation'), 2)
+
+    def test_many(self):
+        self.cache.set_many({'appointments:ical:g0:doctor:d1': 'BEGIN:VCALENDAR', 'degraded:circuit:open': 1.5})
+        self.assertEqual(self.cache.get_many(['appointments:ical:g0:doctor:d1', 'degraded:circuit:open', 'missing']),
+                         {'appointments:ical:g0:doctor:d1': 'BEGIN:VCALENDAR', 'degraded:circuit:open': 1.5})
+
+    def test_add_and_defaults(self):
+        self.assertTrue(self.cache.add('prescriptions:medication_catalog', {'MED1': 'Ventolin'}))
+        self.assertFalse(self.cache.add('prescriptions:medication_catalog', {}))
+        self.assertEqual(self.cache.get('prescriptions:medication_catalog'), {'MED1': 'Ventolin'})
+        self.assertEqual(self.cache.get('patients:history:p9', 'default'), 'default')
+        self.assertEqual(self.cache.get_or_set('patients:history:p9', lambda: HISTORY), HISTORY)
+
+    def test_entries_written_before_a_rotation_stay_readable(self):
+        self.cache.set('patients:history:p1', HISTORY)
+        with self.settings(ENCRYPTION_KEY=NEW_KEY, ENCRYPTION_OLD_KEYS=[KEY]):
+            rotated = make_cache('encrypted-cache-tests')
+            self.assertEqual(rotated.get('patients:history:p1'), HISTORY)
+        with self.settings(ENCRYPTION_KEY=NEW_KEY):
+            self.assertIsNone(make_cache('encrypted-cache-tests').get('patients:history:p1'))
+            self.assertEqual(make_cache('encrypted-cache-tests').get_many(['patients:history:p1']), {})
@@ -0,0 +1,88 @@
+"""
+Test cases for streaming list exports
+"""
+import gzip
+import io
+import zipfile
+
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from utils.export import PageError, export_response, field, iter_pages
+
+COLUMNS = (('Name', field('fullName', 'full_name')), ('Age', 'age'))
+
+
+def _fetch(total_pages):
+    calls = []
+
+    def fetch(page, limit):
+        calls.append(page)
+        rows = [{'fullName': f'P{page}-{i}', 'age': i} for i in range(limit)]
+        return {'success': True, 'data': {'patients': rows, 'pagination': {'totalPages': total_pages}}}
+    return fetch, calls
+
+
+class ExportTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_pages_are_fetched_lazily(self):
+        fetch, calls = _fetch(3)
+        rows = iter_pages(fetch, 'patients', page_size=2)
+        self.assertEqual(calls, [])
+        self.assertEqual(len(list(rows)), 6)
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_csv_stream(self):
+        fetch, _ = _fetch(2)
+        response = export_response(self.factory.get('/?export=csv'), iter_pages(fetch, 'patients', 2), COLUMNS, 'patients')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(text.splitlines(), ['Name,Age', 'P1-0,0', 'P1-1,1', 'P2-0,0', 'P2-1,1'])
+
+    def test_csv_formulas_are_neutralised(self):
+        rows = [{'fullName': '=HYPERLINK("x")', 'age': -1}]
+        response = export_response(self.factory.get('/?export=csv'), rows, COLUMNS, 'patients')
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('"\'=HYPERLINK(""x"")",-1', text)
+
+    def test_gzip_csv(self):
+        response = export_response(self.factory.get('/?export=csv&gzip=1'), [{'fullName': 'A'}], COLUMNS, 'patients')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        text = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8-sig')
+        self.assertEqual(text.splitlines(), ['Name,Age', 'A,'])
+
+    def test_xlsx_is_a_valid_workbook(self):
+        fetch, _ = _fetch(2)
+        response = export_response(self.factory.get('/?export=xlsx'), iter_pages(fetch, 'patients', 2), COLUMNS, 'patients')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 5)
+        self.assertIn('<c><v>1</v></c>', sheet)
+
+    def test_failed_page_raises(self):
+        fetch, _ = _fetch(3)
+
+        def failing(page, limit):
+            return {'success': False, 'message': 'Gateway timeout'} if page == 2 else fetch(page, limit)
+        rows = iter_pages(failing, 'patients', page_size=2)
+        with self.assertRaises(PageError) as raised:
+            list(rows)
+        self.assertEqual(raised.exception.page, 2)
+
+    def test_failed_page_marks_the_export_incomplete(self):
+        fetch, _ = _fetch(3)
+
+        def failing(page, limit):
+            return {'success': False, 'message': 'Gateway timeout'} if page == 2 else fetch(page, limit)
+        response = export_response(self.factory.get('/?export=csv'), iter_pages(failing, 'patients', 2), COLUMNS, 'patients')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[:3], ['Name,Age', 'P1-0,0', 'P1-1,1'])
+        self.assertEqual(lines[3], 'EXPORT INCOMPLETE: page 2 could not be loaded: Gateway timeout,')
+
+        response = export_response(self.factory.get('/?export=xlsx'), iter_pages(failing, 'patients', 2), COLUMNS, 'patients')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('EXPORT INCOMPLETE: page 2', archive.read('xl/worksheets/sheet1.xml').decode('utf-8'))
@@ -0,0 +1,86 @@
+"""
+Test cases for fragment rendering of list pages
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.appointments import views as appointment_views
+from utils.fragments import page_urls, render_list
+
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+        'page.html': '<nav>chrome</nav>{% include "rows.html" %}',
+        'rows.html': '{% for row in rows %}<p>{{ row }}</p>{% endfor %}{{ page_urls.next }}',
+    })]},
+}]
+
+
+class PageUrlTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_keeps_filters_and_drops_fragment_flag(self):
+        request = self.factory.get('/', {'status': 'active', 'page': '2', 'fragment': '1'})
+        urls = page_urls(request, {'currentPage': 2, 'hasPrev': True, 'hasNext': True})
+        self.assertEqual(urls['prev'], '?status=active&page=1')
+        self.assertEqual(urls['next'], '?status=active&page=3')
+
+    def test_missing_neighbours(self):
+        urls = page_urls(self.factory.get('/'), {'page': 1, 'hasNext': False})
+        self.assertEqual(urls, {'prev': None, 'next': None})
+
+
+@override_settings(TEMPLATES=TEMPLATES)
+class RenderListTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.pagination = {'currentPage': 1, 'hasNext': True}
+
+    def test_full_page(self):
+        response = render_list(self.factory.get('/'), 'page.html', 'rows.html',
+                               {'rows': ['a'], 'pagination': self.pagination})
+        self.assertContains(response, 'chrome')
+        self.assertNotIn('Cache-Control', response)
+
+    def test_fragment_returns_only_results(self):
+        response = render_list(self.factory.get('/', {'fragment': '1', 'q': 'x'}), 'page.html', 'rows.html',
+                               {'rows': ['a', 'b'], 'pagination': self.pagination})
+        self.assertEqual(response.content.decode(), '<p>a</p><p>b</p>?q=x&amp;page=2')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+
+class AppointmentFragmentTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(appointment_views, 'APIClient')
+        self.api = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.api.get_direct.return_value = {'success': True, 'data': {
+            'appointments': [{'id': 'a1', 'doctorId': 'doc-1', 'status': 'scheduled'}], 'pagination': {}}}
+        self.api._make_request.return_value = {'success': True, 'data': {
+            'doctors': [{'userId': 'doc-1', 'firstName': 'An', 'lastName': 'Le'}]}}
+
+    def get(self, **params):
+        request = self.factory.get('/appointments/', params)
+        request.session = {'access_token': 'token'}
+        with mock.patch.object(appointment_views, 'render_list') as render:
+            appointment_views.AppointmentListView().get(request)
+        return render.call_args.args[3]
+
+    def test_fragment_skips_filter_labels(self):
+        context = self.get(fragment='1', patient_id='p1', doctor_id='doc-1')
+        self.api.get_patient.assert_not_called()
+        self.assertEqual(context['filter_labels'], {})
+        self.assertEqual(context['appointments'][0].doctor_name, 'An Le')
+
+    def test_doctor_directory_is_cached(self):
+        self.get()
+        self.get(fragment='1', page='2')
+        self.assertEqual(self.api._make_request.call_count, 1)
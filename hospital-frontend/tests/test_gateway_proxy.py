@@ -0,0 +1,111 @@
+"""
+Test cases for the streaming gateway proxy
+"""
+import gzip
+import json
+from io import BytesIO
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+from utils import degraded, gateway_proxy
+
+PROFILE = b'{"success":true,"data":{"userId":"d1","specialization":"Cardiology"}}'
+
+
+def upstream(body=PROFILE, status=200, **headers):
+    headers = CaseInsensitiveDict({'Content-Type': 'application/json; charset=utf-8', **headers})
+    response = requests.Response()
+    response.status_code = status
+    response.headers = headers
+    response.raw = HTTPResponse(body=BytesIO(body), headers=dict(headers), status=status, preload_content=False)
+    return response
+
+
+@override_settings(API_GATEWAY_BASE_URL='http://gateway:3000', CIRCUIT_FAILURE_THRESHOLD=2)
+class ProxyTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.session = mock.Mock()
+        patcher = mock.patch.object(gateway_proxy, 'session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def relay(self, request, *args, **kwargs):
+        response = gateway_proxy.proxy(request, *args, **kwargs)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        # close() sends request_finished; like the test client, keep it from
+        # touching database connections, which SimpleTestCase forbids
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+        return response, body
+
+    def test_body_and_status_are_streamed_unchanged(self):
+        self.session.request.return_value = upstream(status=201, ETag='"v1"')
+        request = self.factory.put('/auth/api/doctors/my/profile/?full=1', b'{"bio": "x"}',
+                                   content_type='application/json', HTTP_IF_NONE_MATCH='"v0"')
+        response, body = self.relay(request, '/api/doctors/my/profile', token='tok')
+
+        self.assertEqual((response.status_code, body, response['ETag']), (201, PROFILE, '"v1"'))
+        method, url = self.session.request.call_args.args
+        kwargs = self.session.request.call_args.kwargs
+        self.assertEqual((method, url), ('PUT', 'http://gateway:3000/api/doctors/my/profile?full=1'))
+        self.assertEqual(kwargs['data'], b'{"bio": "x"}')
+        self.assertEqual(kwargs['headers']['Authorization'], 'Bearer tok')
+        self.assertEqual(kwargs['headers']['If-None-Match'], '"v0"')
+        self.assertEqual(kwargs['headers']['Accept-Encoding'], 'identity')
+        self.assertTrue(kwargs['stream'])
+
+    def test_compressed_bodies_stay_compressed(self):
+        compressed = gzip.compress(PROFILE)
+        self.session.request.return_value = upstream(compressed, **{'Content-Encoding': 'gzip'})
+        request = self.factory.get('/auth/api/doctors/profile/d1/', HTTP_ACCEPT_ENCODING='gzip')
+        response, body = self.relay(request, '/api/doctors/profile/d1')
+        self.assertEqual((body, response['Content-Encoding']), (compressed, 'gzip'))
+
+    def test_max_age(self):
+        self.session.request.return_value = upstream()
+        response, _ = self.relay(self.factory.get('/'), '/api/doctors/profile/d1', max_age=300)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+
+        self.session.request.return_value = upstream()
+        response, _ = self.relay(self.factory.get('/'), '/api/doctors/my/profile', token='tok', max_age=300)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=300')
+
+        self.session.request.return_value = upstream(**{'Cache-Control': 'no-store'})
+        response, _ = self.relay(self.factory.get('/'), '/api/doctors/profile/d1', max_age=300)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+    def test_gateway_error_pages_become_json(self):
+        self.session.request.return_value = upstream(b'<html>Bad Gateway</html>', 502, **{'Content-Type': 'text/html'})
+        response, body = self.relay(self.factory.get('/'), '/api/doctors/my/profile', token='tok')
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(json.loads(body)['success'])
+
+    def test_outages_open_the_circuit(self):
+        self.session.request.side_effect = requests.ConnectionError('refused')
+        for _ in range(2):
+            response, _ = self.relay(self.factory.get('/'), '/api/doctors/profile/d1')
+            self.assertEqual(response.status_code, 503)
+        self.assertTrue(degraded.circuit_open())
+
+        # The next call is the probe; after it, requests fail fast
+        self.relay(self.factory.get('/'), '/api/doctors/profile/d1')
+        response, _ = self.relay(self.factory.get('/'), '/api/doctors/profile/d1')
+        self.assertEqual((response.status_code, self.session.request.call_count), (503, 3))
+
+    def test_json_response(self):
+        response = gateway_proxy.json_response({'success': True, 1: 'one'}, status=202)
+        self.assertEqual((response.status_code, response['Content-Type']), (202, 'application/json'))
+        self.assertEqual(json.loads(response.content), {'success': True, '1': 'one'})
@@ -0,0 +1,135 @@
+"""
+Test cases for iCalendar appointment feeds
+"""
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core import signing
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments import views as appointment_views
+from apps.appointments.ical import build_feed, feed_token, fold, read_feed_token
+
+NOW = datetime(2025, 3, 3, 8, 0)
+
+PAGE = {'success': True, 'data': {'appointments': [
+    {'id': 'a1', 'appointmentNumber': 'APT-1', 'scheduledDate': '2025-03-04T09:30:00.000Z', 'durationMinutes': 45,
+     'patientName': 'Tran Thi B', 'doctorName': 'Dr. Le', 'appointmentType': 'follow_up', 'status': 'confirmed',
+     'reason': 'Check; BP, again', 'updatedAt': '2025-03-01T10:00:00.000Z'},
+    {'id': 'a2', 'scheduledDate': None, 'status': 'scheduled'},
+], 'pagination': {'totalPages': 1}}}
+
+
+class FeedTokenTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        self.assertEqual(read_feed_token(feed_token('doc-1', 'doctor')), ('doc-1', 'doctor'))
+
+    def test_rejects_forged_and_other_roles(self):
+        with self.assertRaises(signing.BadSignature):
+            read_feed_token(feed_token('doc-1', 'doctor') + 'x')
+        with self.assertRaises(signing.BadSignature):
+            read_feed_token(feed_token('u1', 'admin'))
+
+
+class BuildFeedTests(SimpleTestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.get_direct.return_value = PAGE
+
+    def test_doctor_feed(self):
+        feed = build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+        body = feed['body'].decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn('DTSTART:20250304T093000\r\nDTEND:20250304T101500\r\n', body)
+        self.assertIn('SUMMARY:Follow Up: Tran Thi B\r\n', body)
+        self.assertIn('DESCRIPTION:Appointment APT-1\\nCheck\\; BP\\, again\r\n', body)
+        self.assertIn('STATUS:CONFIRMED', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertEqual(feed['last_modified'], int(datetime(2025, 3, 1, 10, 0, tzinfo=timezone.utc).timestamp()))
+        params = self.api.get_direct.call_args.kwargs['params']
+        self.assertEqual((params['doctorId'], params['dateFrom'][:10]), ('doc-1', '2025-02-01'))
+
+    def test_patient_feed_filters_by_patient(self):
+        body = build_feed(self.api, 'p1', 'patient', now=NOW)['body'].decode()
+        self.assertIn('SUMMARY:Follow Up with Dr. Le', body)
+        self.assertEqual(self.api.get_direct.call_args.kwargs['params']['patientId'], 'p1')
+
+    def test_same_data_same_etag(self):
+        first = build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+        second = build_feed(self.api, 'doc-1', 'doctor', now=datetime(2025, 3, 3, 8, 5))
+        self.assertEqual(first['etag'], second['etag'])
+
+    def test_outage_is_an_error_not_an_empty_calendar(self):
+        self.api.get_direct.return_value = {'success': False, 'message': 'down'}
+        with self.assertRaises(RuntimeError):
+            build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+
+    def test_later_page_outage_is_an_error_too(self):
+        first = {'success': True, 'data': dict(PAGE['data'], pagination={'totalPages': 2})}
+        self.api.get_direct.side_effect = [first, {'success': False, 'message': 'down'}]
+        with self.assertRaises(RuntimeError):
+            build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+
+    def test_naive_times_are_converted_from_local_time(self):
+        self.api.get_direct.return_value = {'success': True, 'data': {'appointments': [
+            {'id': 'a3', 'scheduledDate': '2025-03-04T09:30:00', 'updatedAt': '2025-03-01T10:00:00+07:00'},
+        ]}}
+        # Server local time is UTC+7
+        self.addCleanup(time.tzset)
+        with mock.patch.dict('os.environ', {'TZ': 'Asia/Ho_Chi_Minh'}):
+            time.tzset()
+            feed = build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+            self.api.get_direct.return_value = {'success': True, 'data': {'appointments': []}}
+            quiet = build_feed(self.api, 'doc-1', 'doctor', now=NOW)
+        self.assertIn('DTSTAMP:20250301T030000Z', feed['body'].decode())
+        self.assertEqual(feed['last_modified'], int(datetime(2025, 3, 1, 3, 0, tzinfo=timezone.utc).timestamp()))
+        # Without updates the feed is as new as the (local) build time
+        self.assertEqual(quiet['last_modified'], int(datetime(2025, 3, 3, 1, 0, tzinfo=timezone.utc).timestamp()))
+
+    def test_long_lines_fold_on_character_boundaries(self):
+        folded = fold('SUMMARY:' + 'Nguyễn ' * 20)
+        pieces = folded.rstrip('\r\n').split('\r\n ')
+        self.assertTrue(all(len(piece.encode()) <= 75 for piece in pieces))
+        self.assertEqual(''.join(pieces), 'SUMMARY:' + 'Nguyễn ' * 20)
+
+
+class FeedViewTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(appointment_views, 'APIClient')
+        self.api = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.api.get_direct.return_value = PAGE
+        self.token = feed_token('doc-1', 'doctor')
+
+    def get(self, token=None, **headers):
+        request = self.factory.get('/appointments/feed/x.ics', **headers)
+        return appointment_views.AppointmentFeedView().get(request, token or self.token)
+
+    def test_serves_calendar_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_conditional_requests_are_answered_from_the_cache(self):
+        first = self.get()
+        response = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.get(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.api.get_direct.call_count, 1)
+
+    def test_unknown_token(self):
+        self.assertEqual(self.get(token='nope').status_code, 404)
+
+    def test_upstream_outage(self):
+        self.api.get_direct.return_value = {'success': False}
+        self.assertEqual(self.get().status_code, 503)
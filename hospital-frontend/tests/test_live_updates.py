@@ -0,0 +1,124 @@
+"""
+Test cases for coalesced live updates
+"""
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.dashboard import live
+from apps.dashboard.views import LiveUpdatesStreamView
+from utils.live_updates import LivePublisher, LiveTopic, event_stream, topic_group
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+async def no_sleep(seconds):
+    pass
+
+
+class FakeLayer:
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, event))
+
+
+class LivePublisherTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.value = {'unread_count': 3}
+        self.load = mock.Mock(side_effect=lambda key, token: self.value)
+        self.layer = FakeLayer()
+        self.publisher = LivePublisher(prefix='test-live', channel_layer=self.layer)
+        self.publisher.register(LiveTopic('unread_count', self.load, interval=15, coalesce=2))
+
+    def test_loads_once_per_interval_for_every_watcher(self):
+        for _ in range(5):
+            entry = self.publisher.refresh('unread_count', 'u1', now=1000)
+        self.publisher.refresh('unread_count', 'u1', now=1014)
+        self.assertEqual(self.load.call_count, 1)
+        self.assertEqual(entry['data'], {'unread_count': 3})
+        self.publisher.refresh('unread_count', 'u1', now=1015)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_publishes_only_changes(self):
+        first = self.publisher.refresh('unread_count', 'u1', now=1000)
+        self.publisher.refresh('unread_count', 'u1', now=1020)
+        self.value = {'unread_count': 4}
+        second = self.publisher.refresh('unread_count', 'u1', now=1040)
+        self.assertNotEqual(first['version'], second['version'])
+        self.assertEqual([event['data'] for _, event in self.layer.sent], [{'unread_count': 3}, {'unread_count': 4}])
+        self.assertEqual(self.layer.sent[0][0], topic_group('unread_count', 'u1'))
+
+    def test_failed_load_keeps_the_value_and_backs_off(self):
+        entry = self.publisher.refresh('unread_count', 'u1', now=1000)
+        self.value = None
+        self.assertEqual(self.publisher.refresh('unread_count', 'u1', now=1020), entry)
+        self.assertEqual(self.publisher.refresh('unread_count', 'u1', now=1021), entry)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_mark_dirty_coalesces_a_burst(self):
+        self.publisher.refresh('unread_count', 'u1', now=1000)
+        for offset in range(5):
+            self.publisher.mark_dirty('unread_count', 'u1', now=1001 + offset * 0.1)
+        self.publisher.refresh('unread_count', 'u1', now=1002)
+        self.publisher.refresh('unread_count', 'u1', now=1004)
+        self.publisher.refresh('unread_count', 'u1', now=1005)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_event_stream_sends_new_versions_only(self):
+        clock = iter(range(0, 100)).__next__
+        with mock.patch.object(self.publisher, 'refresh', side_effect=[
+                {'version': 'a', 'data': 1}, {'version': 'a', 'data': 1}, {'version': 'b', 'data': 2}]):
+            events = async_to_sync(collect)(event_stream(self.publisher, [('unread_count', 'u1')], duration=5,
+                                                         tick=0, clock=clock, sleep=no_sleep))
+        updates = [json.loads(event.split('data: ')[1]) for event in events if event.startswith('event: update')]
+        self.assertEqual([update['data'] for update in updates], [1, 2])
+        self.assertEqual(updates[0]['topic'], 'unread_count')
+
+
+class LiveStreamViewTests(SimpleTestCase):
+
+    def get(self):
+        request = RequestFactory().get('/live/stream/', {'topic': 'unread_count'})
+        request.session = {'user_id': 'u1', 'user_role': 'patient'}
+        return LiveUpdatesStreamView.as_view()(request)
+
+    def test_off_by_default(self):
+        self.assertEqual(self.get().status_code, 404)
+
+    @override_settings(LIVE_SSE_ENABLED=True)
+    def test_never_streams_from_a_wsgi_worker(self):
+        self.assertEqual(self.get().status_code, 404)
+
+
+class LiveSubscriptionTests(SimpleTestCase):
+
+    def test_unread_count_is_always_the_sessions_own(self):
+        session = {'user_id': 'u1', 'user_role': 'patient'}
+        self.assertEqual(live.subscriptions(session, ['unread_count:u2', 'unread_count']), [('unread_count', 'u1')])
+
+    def test_admin_only_topics(self):
+        self.assertEqual(live.subscriptions({'user_id': 'd1', 'user_role': 'doctor'}, ['retry_stats', 'dashboard:admin']), [])
+        self.assertEqual(live.subscriptions({'user_id': 'a1', 'user_role': 'admin'}, ['retry_stats', 'dashboard']),
+                         [('retry_stats', None), ('dashboard', 'admin')])
+
+    def test_doctors_see_their_own_dashboard(self):
+        session = {'user_id': 'd1', 'user_role': 'doctor'}
+        self.assertEqual(live.subscriptions(session, ['dashboard', 'dashboard:d2']), [('dashboard', 'd1')])
+
+    def test_dashboard_counters_keep_numbers_only(self):
+        response = {'success': True, 'data': {'dashboard': {
+            'total_patients': 10, 'completion_rate': 92.5, 'total_revenue': '1.234.500', 'recent_trends': []}}}
+        with mock.patch.object(live, 'APIClient') as client:
+            client.return_value.get_admin_dashboard.return_value = response
+            counters = live.load_dashboard_counters('admin', 'token')
+        self.assertEqual(counters, {'total_patients': 10, 'completion_rate': 92.5})
@@ -0,0 +1,132 @@
+"""
+Test cases for the shared upstream notification relay
+"""
+import asyncio
+import json
+
+from django.test import SimpleTestCase
+
+from utils.notification_relay import MESSAGE_TYPE, UpstreamRelay, user_group
+
+
+class FakeSocket:
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+class FakeLayer:
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, event))
+
+
+class FakeRedisLayer(FakeLayer):
+    """channels_redis-style layer: claims go to its Redis"""
+
+    def __init__(self, keys):
+        super().__init__()
+        self.keys = keys
+
+    def consistent_hash(self, value):
+        return 0
+
+    def connection(self, index):
+        return self
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+
+class RelayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sockets = []
+        self.urls = []
+        self.layer = FakeLayer()
+        self.relay = UpstreamRelay(url='ws://gateway/ws', connect=self.connect, channel_layer=self.layer,
+                                   grace=0.05, max_backoff=1)
+
+    def connect(self, url):
+        self.urls.append(url)
+        socket = FakeSocket()
+        self.sockets.append(socket)
+        return socket
+
+    async def settle(self, seconds=0.01):
+        await asyncio.sleep(seconds)
+
+    async def test_tabs_of_a_user_share_one_upstream_socket(self):
+        group = await self.relay.subscribe('u1', 'tok-1')
+        await self.settle()
+        await self.relay.subscribe('u1', 'tok-2')
+        await self.relay.subscribe('u2', 'tok-3')
+        await self.settle()
+        self.assertEqual(group, user_group('u1'))
+        self.assertEqual(self.urls, ['ws://gateway/ws?token=tok-1', 'ws://gateway/ws?token=tok-3'])
+        self.assertEqual(self.relay.stats(), {'upstream_sockets': 2, 'local_sockets': 3})
+        await self.relay.close()
+
+    async def test_messages_fan_out_to_the_user_group_once(self):
+        await self.relay.subscribe('u1', 'tok')
+        await self.settle()
+        message = json.dumps({'id': 'n1', 'title': 'Lab results ready'})
+        self.sockets[0].queue.put_nowait(message)
+        self.sockets[0].queue.put_nowait(message)
+        self.sockets[0].queue.put_nowait('not json')
+        await self.settle()
+        self.assertEqual(self.layer.sent, [
+            (user_group('u1'), {'type': MESSAGE_TYPE, 'message': {'id': 'n1', 'title': 'Lab results ready'}})])
+        await self.relay.close()
+
+    async def test_relays_in_two_workers_forward_a_message_once(self):
+        keys = {}
+        layers = [FakeRedisLayer(keys), FakeRedisLayer(keys)]
+        message = json.dumps({'id': 'n2', 'title': 'Prescription ready'})
+        for layer in layers:
+            await UpstreamRelay(channel_layer=layer)._forward('u1', message)
+        self.assertEqual(sum(len(layer.sent) for layer in layers), 1)
+        self.assertIn('notifications:seen:u1:n2', keys)
+
+    async def test_socket_closes_after_the_grace_period(self):
+        await self.relay.subscribe('u1', 'tok')
+        await self.relay.unsubscribe('u1')
+        # A page navigation inside the grace period keeps the socket
+        await self.relay.subscribe('u1', 'tok')
+        await self.relay.unsubscribe('u1')
+        await self.settle(0.1)
+        self.assertEqual(self.relay.stats(), {'upstream_sockets': 0, 'local_sockets': 0})
+        self.assertEqual(len(self.urls), 1)
+
+    async def test_reconnects_with_the_newest_token(self):
+        await self.relay.subscribe('u1', 'old')
+        await self.settle()
+        await self.relay.subscribe('u1', 'new')
+        self.sockets[0].queue.put_nowait(None)  # upstream closed
+        await self.settle(1.1)
+        self.assertEqual(self.urls, ['ws://gateway/ws?token=old', 'ws://gateway/ws?token=new'])
+        await self.relay.close()
+
+    def test_group_names_are_channel_layer_safe(self):
+        self.assertEqual(user_group('a b/c'), 'notifications_user_a_b_c')
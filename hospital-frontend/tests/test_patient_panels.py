@@ -0,0 +1,78 @@
+"""
+Test cases for the lazily loaded patient detail panels
+"""
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.patients import views as patient_views
+from utils.cursors import decode_cursor, encode_cursor, paginate
+
+HISTORY = [
+    {'id': str(i), 'conditionName': f'Condition {i}', 'status': 'active', 'diagnosedDate': f'2020-01-{i:02d}'}
+    for i in range(1, 26)
+]
+
+
+class CursorTests(SimpleTestCase):
+
+    def key(self, row):
+        return (row['diagnosedDate'], row['id'])
+
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['2020-01-01', 'x'])), ['2020-01-01', 'x'])
+        with self.assertRaises(ValueError):
+            decode_cursor('not a cursor!')
+
+    def test_pages_are_stable_when_rows_are_added(self):
+        first, cursor = paginate(HISTORY, self.key, limit=10)
+        self.assertEqual([row['id'] for row in first][:2], ['25', '24'])
+
+        newer = HISTORY + [{'id': '99', 'diagnosedDate': '2021-05-01'}]
+        second, cursor = paginate(newer, self.key, cursor, limit=10)
+        third, last = paginate(newer, self.key, cursor, limit=10)
+        self.assertEqual([row['id'] for row in second][0], '15')
+        self.assertEqual(len(third), 5)
+        self.assertIsNone(last)
+
+
+class HistoryPanelTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(patient_views, 'api_client')
+        self.api = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api.get_patient_medical_history.return_value = {'success': True, 'data': HISTORY}
+
+    def get(self, view, path, **params):
+        request = self.factory.get(path, params)
+        request.session = {'access_token': 'token', 'user_id': 'u1'}
+        return view.as_view()(request, patient_id='p1')
+
+    def test_history_is_paged_with_a_cursor(self):
+        first = self.get(patient_views.PatientHistoryPanelView, '/patients/p1/history/')
+        self.assertContains(first, 'Condition 25')
+        self.assertContains(first, 'data-history-more')
+        self.assertNotContains(first, 'Condition 5<')
+
+        cursor = first.content.decode().split('data-cursor="')[1].split('"')[0]
+        second = self.get(patient_views.PatientHistoryPanelView, '/patients/p1/history/', cursor=cursor)
+        self.assertContains(second, 'Condition 5<')
+        self.assertNotContains(second, 'data-history-more')
+        # Later pages come from the short-lived cache
+        self.api.get_patient_medical_history.assert_called_once()
+
+    def test_bad_cursor_and_upstream_errors(self):
+        self.assertEqual(self.get(patient_views.PatientHistoryPanelView, '/', cursor='zz').status_code, 400)
+        cache.clear()
+        self.api.get_patient_medical_history.return_value = {'success': False, 'message': 'down'}
+        self.assertContains(self.get(patient_views.PatientHistoryPanelView, '/'), 'down', status_code=502)
+
+    def test_visit_summary_defaults(self):
+        self.api.get_patient_visit_summary.return_value = {'success': True, 'data': {'totalAppointments': 4}}
+        response = self.get(patient_views.PatientVisitSummaryView, '/patients/p1/visit-summary/')
+        self.assertEqual(json.loads(response.content)['data'], {'totalAppointments': 4, 'activePrescriptions': 0})
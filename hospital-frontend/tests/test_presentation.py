@@ -0,0 +1,61 @@
+"""
+Test cases for the patient list presentation pass
+"""
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from utils import dates, presentation
+from utils.records import PatientRecord
+
+
+class BatchAgeTests(SimpleTestCase):
+    """Vectorized and scalar age paths must agree"""
+
+    def test_vectorized_matches_scalar(self):
+        today = date(2025, 9, 8)
+        values = [
+            '1990-09-08T17:00:00.000Z', '1990-09-09T00:00:00Z', '2000-02-29',
+            '1990-02-30', '15/03/1990', 'garbage', '', None, 'Ñ990-01-01',
+        ] * 30
+        self.assertEqual(
+            presentation._ages_vectorized(values, today),
+            [dates.calculate_age(value, today) for value in values],
+        )
+
+    def test_small_lists_use_scalar_path(self):
+        self.assertEqual(presentation.batch_ages(['1990-09-08'], date(2025, 9, 7)), [34])
+
+
+class PresentPatientsTests(SimpleTestCase):
+    """Display slots filled on patient records"""
+
+    def test_fills_display_slots(self):
+        patient = PatientRecord.from_dict({
+            'id': 'p-1',
+            'fullName': 'Nguyen Van A',
+            'dateOfBirth': '1990-03-15T17:00:00.000Z',
+            'phone': '0901234567',
+            'address': {'street': '1 Le Loi', 'city': 'HCMC'},
+            'bloodType': 'O+',
+            'gender': 'Female',
+            'createdAt': '2025-01-02T08:00:00.000Z',
+        })
+        self.assertIsNone(patient.dob_display)
+
+        presentation.present_patients([patient], today=date(2025, 9, 8))
+
+        self.assertEqual(patient.age, 35)
+        self.assertEqual(patient.dob_display, 'Mar 15, 1990')
+        self.assertEqual(patient.created_display, 'Jan 02, 2025')
+        self.assertEqual(patient.phone_display, '0901 234 567')
+        self.assertEqual(patient.address_display, '1 Le Loi, HCMC')
+        self.assertEqual(patient.blood_type_class, 'success')
+        self.assertEqual(patient.gender_icon, 'fas fa-venus')
+
+    def test_missing_values(self):
+        patient, = presentation.present_patients([PatientRecord.from_dict({'id': 'p-2'})])
+        self.assertIsNone(patient.age)
+        self.assertEqual(patient.dob_display, '')
+        self.assertEqual(patient.phone_display, '')
+        self.assertEqual(patient.blood_type_class, 'secondary')
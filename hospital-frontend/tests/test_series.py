@@ -0,0 +1,61 @@
+"""
+Test cases for the analytics chart series pipeline
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.analytics.series import build_series, lttb, with_series
+
+
+def _trends(days, start=date(2020, 1, 1)):
+    return [
+        {'trend_date': f'{start + timedelta(days=i)}T00:00:00.000Z', 'appointments_count': i % 7, 'daily_revenue': '10.5'}
+        for i in range(days)
+    ]
+
+
+class BuildSeriesTests(SimpleTestCase):
+
+    def test_short_history_is_daily_and_untouched(self):
+        series = build_series(_trends(7), 'trend_date', ['appointments_count'])
+        self.assertEqual(series['bucket'], 'day')
+        self.assertEqual(series['timestamps'][0], '2020-01-01')
+        self.assertEqual(series['values']['appointments_count'], [0, 1, 2, 3, 4, 5, 6])
+
+    def test_weekly_buckets_sum_values(self):
+        series = build_series(_trends(14, date(2024, 1, 1)), 'trend_date', ['daily_revenue'], bucket='week')
+        self.assertEqual(series['timestamps'], ['2024-01-01', '2024-01-08'])
+        self.assertEqual(series['values']['daily_revenue'], [73.5, 73.5])
+
+    def test_point_budget_bounds_output(self):
+        series = build_series(_trends(3000), 'trend_date', ['appointments_count', 'daily_revenue'], bucket='day', max_points=50)
+        self.assertEqual(len(series['timestamps']), 50)
+        self.assertEqual(len(series['values']['daily_revenue']), 50)
+        self.assertEqual(series['sourcePoints'], 3000)
+
+    def test_invalid_rows_are_skipped(self):
+        series = build_series([{'trend_date': None}, {'trend_date': 'soon'}], 'trend_date', ['appointments_count'])
+        self.assertEqual(series['timestamps'], [])
+
+
+class LTTBTests(SimpleTestCase):
+
+    def test_keeps_endpoints_and_peaks(self):
+        x = np.arange(10.0)
+        y = np.array([0, 1, 0, 0, 0, 0, 0, 9, 0, 1.0])
+        keep = lttb(x, y, 4).tolist()
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], 9)
+        self.assertIn(7, keep)
+
+
+class WithSeriesTests(SimpleTestCase):
+
+    def test_replaces_raw_trends(self):
+        payload = {'success': True, 'data': {'dashboard': {'total_patients': 3, 'daily_trends': _trends(3)}}}
+        compact = with_series('admin_dashboard', payload)
+        self.assertNotIn('daily_trends', compact['data']['dashboard'])
+        self.assertEqual(len(compact['series']['timestamps']), 3)
+        self.assertIn('daily_trends', payload['data']['dashboard'])
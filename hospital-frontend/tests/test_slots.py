@@ -0,0 +1,210 @@
+"""
+Test cases for the appointment slot finder
+"""
+import json
+from datetime import date, datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments import views as appointment_views
+from apps.appointments.slots import IntervalIndex, SlotFinder, free_slots
+from utils.export import PageError
+
+# 2025-03-03 is a Monday (service weekday 1)
+MONDAY = date(2025, 3, 3)
+
+AVAILABILITY = {'success': True, 'data': [
+    {'day_of_week': 1, 'start_time': '08:00:00', 'end_time': '10:00:00', 'is_available': True},
+    {'day_of_week': 1, 'start_time': '14:00:00', 'end_time': '15:00:00', 'is_available': True},
+    {'day_of_week': 2, 'start_time': '08:00:00', 'end_time': '12:00:00', 'is_available': False},
+]}
+
+APPOINTMENTS = {'success': True, 'data': {'appointments': [
+    {'id': 'a1', 'scheduledDate': '2025-03-03T08:30:00.000Z', 'durationMinutes': 45, 'status': 'confirmed'},
+    {'id': 'a2', 'scheduledDate': '2025-03-03T14:00:00.000Z', 'durationMinutes': 30, 'status': 'cancelled'},
+], 'pagination': {'totalPages': 1}}}
+
+
+def upstream(slot_rows=(), conflict_rows=()):
+    def get_direct(url, params=None):
+        if 'doctor-availability' in url:
+            return AVAILABILITY
+        if 'appointment-slots' in url:
+            return {'success': True, 'data': list(slot_rows)}
+        if url.endswith('/conflicts'):
+            return {'success': True, 'data': list(conflict_rows)}
+        return APPOINTMENTS
+    return get_direct
+
+
+class IntervalIndexTests(SimpleTestCase):
+
+    def test_merges_overlapping_and_touching(self):
+        index = IntervalIndex([(60, 90), (0, 30), (30, 45), (80, 120), (200, 200)])
+        self.assertEqual(index.to_list(), [[0, 45], [60, 120]])
+
+    def test_overlaps_is_half_open(self):
+        index = IntervalIndex([(60, 90)])
+        self.assertTrue(index.overlaps(80, 100))
+        self.assertTrue(index.overlaps(30, 61))
+        self.assertFalse(index.overlaps(30, 60))
+        self.assertFalse(index.overlaps(90, 120))
+
+
+class SlotFinderTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = mock.Mock()
+        self.api.get_direct.side_effect = upstream()
+
+    def find(self, **kwargs):
+        kwargs.setdefault('now', datetime(2025, 3, 1, 9, 0))
+        return SlotFinder(self.api, 'doc-1').find(MONDAY, 2, **kwargs)
+
+    def test_grid_skips_booked_time(self):
+        monday, tuesday = self.find()
+        starts = [slot['start'] for slot in monday['slots']]
+        # 08:30-09:15 is booked; the cancelled 14:00 appointment frees its slot
+        self.assertEqual(starts, ['08:00', '09:30', '14:00', '14:30'])
+        self.assertEqual(monday['slots'][0], {'start': '08:00', 'end': '08:30', 'value': '2025-03-03T08:00'})
+        self.assertEqual(tuesday, {'date': '2025-03-04', 'slots': []})
+
+    def test_longer_duration_must_fit_the_window(self):
+        monday, _ = self.find(duration=60)
+        self.assertEqual([slot['start'] for slot in monday['slots']], ['14:00'])
+
+    def test_past_slots_are_dropped(self):
+        monday, _ = self.find(now=datetime(2025, 3, 3, 9, 45))
+        self.assertEqual([slot['start'] for slot in monday['slots']], ['14:00', '14:30'])
+
+    def test_upstream_slots_replace_the_grid(self):
+        self.api.get_direct.side_effect = upstream([
+            {'slot_time': '08:30:00', 'duration_minutes': 20, 'max_bookings': 1, 'current_bookings': 0},
+            {'slot_time': '08:45:00', 'duration_minutes': 20, 'max_bookings': 3, 'current_bookings': 1},
+            {'slot_time': '11:00:00', 'duration_minutes': 20, 'max_bookings': 1, 'current_bookings': 1},
+            {'slot_time': '16:00:00', 'duration_minutes': 20, 'max_bookings': 1, 'current_bookings': 0},
+        ])
+        monday, _ = self.find()
+        self.assertEqual([slot['start'] for slot in monday['slots']], ['08:45', '16:00'])
+
+    def test_day_plans_are_cached(self):
+        self.find()
+        calls = self.api.get_direct.call_count
+        self.find(duration=60)
+        self.assertEqual(self.api.get_direct.call_count, calls)
+
+    def test_availability_failure_is_not_cached(self):
+        get_direct = upstream()
+        self.api.get_direct.side_effect = lambda url, params=None: (
+            {'success': False} if 'doctor-availability' in url else get_direct(url, params))
+        self.find()
+        self.api.get_direct.side_effect = upstream()
+        monday, _ = self.find()
+        self.assertTrue(monday['slots'])
+
+    def test_appointment_failure_is_not_cached(self):
+        get_direct = upstream()
+        self.api.get_direct.side_effect = lambda url, params=None: (
+            {'success': False} if url.endswith('/api/appointments') else get_direct(url, params))
+        with self.assertRaises(PageError):
+            self.find()
+        self.api.get_direct.side_effect = upstream()
+        monday, _ = self.find()
+        self.assertNotIn('08:30', [slot['start'] for slot in monday['slots']])
+
+    def test_holiday_closes_the_day(self):
+        self.api.get_direct.side_effect = upstream(conflict_rows=[
+            {'conflict_date': '2025-03-03T00:00:00.000Z', 'conflict_type': 'holiday', 'resolved': False},
+            {'conflict_date': '2025-03-04T00:00:00.000Z', 'conflict_type': 'holiday', 'resolved': True},
+        ])
+        monday, _ = self.find()
+        self.assertEqual(monday['slots'], [])
+
+    def test_free_slots_before_today(self):
+        plan = {'windows': [[480, 600]], 'busy': [], 'slots': []}
+        self.assertEqual(free_slots(plan, MONDAY, not_before=datetime(2025, 3, 4, 8, 0)), [])
+
+
+class ConflictCheckTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = mock.Mock()
+        self.api.get_direct.side_effect = upstream()
+        self.finder = SlotFinder(self.api, 'doc-1')
+        self.now = datetime(2025, 3, 1, 9, 0)
+
+    def codes(self, hour, minute, duration=30):
+        return [c['code'] for c in self.finder.check(datetime(2025, 3, 3, hour, minute), duration, now=self.now)]
+
+    def test_free_time(self):
+        self.assertEqual(self.codes(9, 30), [])
+
+    def test_overlapping_appointment(self):
+        self.assertEqual(self.codes(9, 0), ['double_booking'])
+
+    def test_outside_working_hours(self):
+        self.assertEqual(self.codes(9, 45), ['outside_hours'])
+        self.assertEqual(self.codes(12, 0), ['outside_hours'])
+
+    def test_past_time_needs_no_lookups(self):
+        self.now = datetime(2025, 3, 4)
+        self.assertEqual(self.codes(9, 30), ['past'])
+        self.api.get_direct.assert_not_called()
+
+    def test_repeat_checks_use_the_cached_day(self):
+        self.codes(9, 30)
+        calls = self.api.get_direct.call_count
+        self.codes(14, 0)
+        self.assertEqual(self.api.get_direct.call_count, calls)
+
+    def test_unknown_hours_are_not_enforced(self):
+        self.api.get_direct.side_effect = lambda url, params=None: (
+            {'success': False} if 'doctor-availability' in url else upstream()(url, params))
+        self.assertEqual(self.codes(12, 0), [])
+
+
+class SlotsAPITests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(appointment_views, 'APIClient')
+        self.api = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.api.get_direct.side_effect = upstream()
+
+    def get(self, **params):
+        request = self.factory.get('/appointments/api/slots/', params)
+        request.session = {'access_token': 'token'}
+        return appointment_views.AppointmentSlotsAPIView().get(request)
+
+    def test_returns_days(self):
+        response = self.get(doctor_id='doc-1', date='2099-03-02', days='3')
+        data = json.loads(response.content)['data']
+        self.assertEqual([day['date'] for day in data], ['2099-03-02', '2099-03-03', '2099-03-04'])
+
+    def test_rejects_bad_input(self):
+        self.assertEqual(self.get().status_code, 400)
+        self.assertEqual(self.get(doctor_id='doc-1', duration='20').status_code, 400)
+        self.assertEqual(self.get(doctor_id='doc-1', date='soon').status_code, 400)
+
+    def test_conflict_check(self):
+        request = self.factory.get('/appointments/api/check/', {
+            'doctor_id': 'doc-1', 'scheduled_date': '2099-03-02T23:30', 'duration': '30'})
+        request.session = {'access_token': 'token'}
+        data = json.loads(appointment_views.AppointmentConflictCheckAPIView().get(request).content)['data']
+        self.assertFalse(data['available'])
+        self.assertEqual(data['conflicts'][0]['code'], 'outside_hours')
+
+    def test_conflict_check_fails_when_appointments_are_unavailable(self):
+        get_direct = upstream()
+        self.api.get_direct.side_effect = lambda url, params=None: (
+            {'success': False} if url.endswith('/api/appointments') else get_direct(url, params))
+        request = self.factory.get('/appointments/api/check/', {
+            'doctor_id': 'doc-1', 'scheduled_date': '2099-03-03T08:30', 'duration': '30'})
+        request.session = {'access_token': 'token'}
+        self.assertEqual(appointment_views.AppointmentConflictCheckAPIView().get(request).status_code, 502)
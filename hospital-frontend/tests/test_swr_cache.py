@@ -0,0 +1,68 @@
+"""
+Test cases for the stale-while-revalidate cache
+"""
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from utils.swr_cache import StaleWhileRevalidateCache, etag_matches
+
+
+def _join_refreshes():
+    for thread in threading.enumerate():
+        if thread.name.startswith('swr-'):
+            thread.join(timeout=5)
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.swr = StaleWhileRevalidateCache('test', fresh_for=60, max_age=3600)
+        self.loader = mock.Mock(return_value={'success': True, 'data': {'total': 1}})
+
+    def test_fresh_entry_is_served_from_cache(self):
+        first = self.swr.get('test:a', self.loader)
+        second = self.swr.get('test:a', self.loader)
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(first.etag, second.etag)
+        self.assertFalse(second.stale)
+
+    def test_stale_entry_is_served_then_refreshed(self):
+        self.swr.get('test:a', self.loader)
+        self.loader.return_value = {'success': True, 'data': {'total': 2}}
+
+        with mock.patch('utils.swr_cache.time.time', return_value=time.time() + 120):
+            result = self.swr.get('test:a', self.loader)
+            _join_refreshes()
+        self.assertTrue(result.stale)
+        self.assertEqual(result.data['data']['total'], 1)
+
+        refreshed = self.swr.get('test:a', self.loader)
+        self.assertEqual(refreshed.data['data']['total'], 2)
+        self.assertNotEqual(refreshed.etag, result.etag)
+
+    def test_failures_are_not_cached(self):
+        self.loader.return_value = {'success': False, 'message': 'down'}
+        result = self.swr.get('test:a', self.loader)
+        self.assertIsNone(result.etag)
+        self.assertIsNone(cache.get('test:a'))
+
+    def test_invalidate_all_drops_made_keys(self):
+        key = self.swr.make_key('dashboard', 'doc-1')
+        self.swr.get(key, self.loader)
+        self.swr.invalidate_all()
+        self.swr.get(self.swr.make_key('dashboard', 'doc-1'), self.loader)
+        self.assertEqual(self.loader.call_count, 2)
+
+
+class ETagMatchTests(SimpleTestCase):
+
+    def test_if_none_match(self):
+        factory = RequestFactory()
+        self.assertTrue(etag_matches(factory.get('/', HTTP_IF_NONE_MATCH='"x", W/"abc"'), '"abc"'))
+        self.assertFalse(etag_matches(factory.get('/', HTTP_IF_NONE_MATCH='"x"'), '"abc"'))
+        self.assertFalse(etag_matches(factory.get('/'), '"abc"'))
@@ -0,0 +1,121 @@
+"""
+Test cases for the background task queue
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.tasks import queue
+from apps.tasks.models import Task
+
+calls = []
+
+
+@queue.task('tests.record', secret_fields=('token',))
+def record(task, value, token=None):
+    calls.append(value)
+    return {'value': value}
+
+
+@queue.task('tests.flaky', max_attempts=2, backoff=10)
+def flaky(task):
+    raise RuntimeError('upstream timeout')
+
+
+@queue.task('tests.broken')
+def broken(task):
+    raise queue.PermanentError('bad payload')
+
+
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_by_priority_then_age(self):
+        queue.enqueue('tests.record', {'value': 'low'}, priority=queue.PRIORITY_LOW)
+        queue.enqueue('tests.record', {'value': 'first'})
+        queue.enqueue('tests.record', {'value': 'urgent'}, priority=queue.PRIORITY_HIGH)
+        queue.enqueue('tests.record', {'value': 'second'})
+        queue.enqueue('tests.record', {'value': 'later'}, delay=60)
+
+        self.assertEqual(queue.run_pending('test-worker'), 4)
+        self.assertEqual(calls, ['urgent', 'first', 'second', 'low'])
+
+    def test_success_stores_result_and_drops_secrets(self):
+        created = queue.enqueue('tests.record', {'value': 1, 'token': 'secret'}, owner='user-1')
+        queue.run_pending('test-worker')
+        done = Task.objects.get(pk=created.pk)
+
+        self.assertEqual(done.status, Task.SUCCEEDED)
+        self.assertEqual(done.result, {'value': 1})
+        self.assertEqual(done.payload, {'value': 1})
+        self.assertEqual(queue.serialize(done)['status'], 'succeeded')
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        created = queue.enqueue('tests.flaky')
+        before = timezone.now()
+        queue.run_pending('test-worker')
+        retrying = Task.objects.get(pk=created.pk)
+        self.assertEqual((retrying.status, retrying.attempts), (Task.QUEUED, 1))
+        self.assertGreaterEqual(retrying.run_at, before + timedelta(seconds=10))
+        self.assertIn('upstream timeout', retrying.last_error)
+
+        Task.objects.filter(pk=created.pk).update(run_at=timezone.now())
+        queue.run_pending('test-worker')
+        self.assertEqual(Task.objects.get(pk=created.pk).status, Task.FAILED)
+
+    def test_permanent_errors_are_not_retried(self):
+        created = queue.enqueue('tests.broken')
+        queue.run_pending('test-worker')
+        self.assertEqual(Task.objects.get(pk=created.pk).status, Task.FAILED)
+
+    def test_claimed_task_is_not_claimed_twice(self):
+        queue.enqueue('tests.record', {'value': 1})
+        self.assertIsNotNone(queue.claim_next('worker-a'))
+        self.assertIsNone(queue.claim_next('worker-b'))
+
+    def test_expired_leases_are_requeued(self):
+        created = queue.enqueue('tests.record', {'value': 1})
+        queue.claim_next('worker-a')
+        Task.objects.filter(pk=created.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(queue.requeue_expired(), 1)
+        self.assertEqual(queue.run_pending('worker-b'), 1)
+        self.assertEqual(calls, [1])
+
+    def test_tasks_failed_by_a_stopped_worker_drop_secrets(self):
+        created = queue.enqueue('tests.record', {'value': 1, 'token': 'secret'}, max_attempts=1)
+        queue.claim_next('worker-a')
+        Task.objects.filter(pk=created.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(queue.requeue_expired(), 1)
+        stopped = Task.objects.get(pk=created.pk)
+        self.assertEqual((stopped.status, stopped.payload), (Task.FAILED, {'value': 1}))
+
+    def test_unknown_task_names_are_rejected(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue('tests.missing')
+
+    @mock.patch.object(queue, 'lease_seconds', return_value=5)
+    def test_progress_extends_the_lease(self, lease):
+        created = queue.enqueue('tests.record', {'value': 1})
+        queue.claim_next('worker-a')
+        Task.objects.filter(pk=created.pk).update(locked_until=timezone.now())
+        queue.update_progress(created.pk, {'processed': 3})
+
+        running = Task.objects.get(pk=created.pk)
+        self.assertEqual(running.progress, {'processed': 3})
+        self.assertGreater(running.locked_until, timezone.now())
+
+    def test_worker_command_drains_queue(self):
+        queue.enqueue('tests.record', {'value': 'a'})
+        queue.enqueue('tests.record', {'value': 'b'})
+        output = StringIO()
+        call_command('run_tasks', '--once', stdout=output)
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertIn('stopped after 2 task(s)', output.getvalue())
@@ -0,0 +1,84 @@
+"""
+Test cases for the merged patient timeline
+"""
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.patients import timeline
+from utils.cursors import encode_cursor
+
+
+def paged(prefix, days, page_size=3):
+    """Fake paged upstream (newest first) recording the pages it served"""
+    rows = [{'id': f'{prefix}{day}', 'issuedDate': f'2024-03-{day:02d}T10:00:00'} for day in sorted(days, reverse=True)]
+    calls = []
+
+    def fetch(page, limit):
+        calls.append(page)
+        chunk = rows[(page - 1) * limit:page * limit]
+        total = -(-len(rows) // limit)
+        return {'success': True, 'data': {'prescriptions': chunk, 'pagination': {'totalPages': total}}}
+    return fetch, calls
+
+
+class TimelineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+    def build(self, sources, cursor=None, limit=4):
+        return timeline.build_timeline(sources, self.executor, cursor, limit)
+
+    def sources(self):
+        prescriptions, self.calls = paged('rx', range(1, 21, 2))
+        history = [{'id': f'h{day}', 'conditionName': 'Flu', 'diagnosedDate': f'2024-03-{day:02d}'} for day in (4, 18, 2)]
+        return [
+            timeline.Source('prescriptions', prescriptions, 'prescriptions', timeline.prescription_event, page_size=3),
+            timeline.Source('history', lambda page, limit: {'success': True, 'data': history}, 'history',
+                            timeline.history_event),
+        ]
+
+    def test_merges_newest_first_and_reads_only_needed_pages(self):
+        events, cursor, failed = self.build(self.sources())
+        self.assertEqual([event['id'] for event in events], ['rx19', 'h18', 'rx17', 'rx15'])
+        self.assertEqual(events[0]['at_display'], '19/03/2024 10:00')
+        self.assertEqual(failed, [])
+        # Two pages consumed (plus at most one read ahead); the last of four is never requested
+        self.assertEqual(self.calls[:2], [1, 2])
+        self.assertNotIn(4, self.calls)
+
+    def test_continuation_has_no_gaps_or_duplicates(self):
+        seen, cursor = [], None
+        while True:
+            events, cursor, _ = self.build(self.sources(), cursor)
+            seen.extend(event['id'] for event in events)
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(len(set(seen)), 13)
+        self.assertEqual(seen[-2:], ['h2', 'rx1'])
+
+    def test_continuation_resumes_each_source_at_its_page(self):
+        _, cursor, _ = self.build(self.sources(), limit=8)
+        events, _, _ = self.build(self.sources(), cursor)
+        # rx7 was the last prescription shown, on page 2; pages before it are not re-read
+        self.assertEqual(self.calls[0], 3)
+        self.assertNotIn(1, self.calls)
+        self.assertEqual([event['id'] for event in events], ['rx5', 'h4', 'rx3', 'h2'])
+
+    def test_failed_source_is_reported(self):
+        sources = self.sources()
+        sources[1].fetch_page = mock.Mock(return_value={'success': False, 'message': 'down'})
+        events, _, failed = self.build(sources)
+        self.assertEqual(failed, ['history'])
+        self.assertTrue(all(event['kind'] == 'prescription' for event in events))
+
+    def test_bad_cursor(self):
+        with self.assertRaises(ValueError):
+            self.build(self.sources(), cursor='bm90IGEgbGlzdA')
+        with self.assertRaises(ValueError):
+            self.build(self.sources(), cursor=encode_cursor({'before': ['2024-03-01', 'history', 'h1'],
+                                                             'pages': {'prescriptions': 0}}))
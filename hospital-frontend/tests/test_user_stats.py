@@ -0,0 +1,58 @@
+"""
+Test cases for the streamed user statistics
+"""
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from utils import user_stats
+
+
+def _page(users, page, total_pages):
+    return {'success': True, 'data': {'users': users, 'pagination': {'page': page, 'totalPages': total_pages}}}
+
+
+class UserStatsTests(SimpleTestCase):
+    """Role, activity and registration counts over all user pages"""
+
+    def setUp(self):
+        cache.delete(user_stats.CACHE_KEY)
+
+    def test_aggregates_every_page(self):
+        pages = [
+            _page([
+                {'role': 'admin', 'isActive': True, 'createdAt': '2025-09-08T10:00:00.000Z'},
+                {'role': 'doctor', 'isActive': True, 'createdAt': '2025-09-02T10:00:00.000Z'},
+            ], 1, 2),
+            _page([
+                {'role': 'patient', 'isActive': False, 'createdAt': '2025-06-15T10:00:00.000Z'},
+                {'role': 'patient', 'isActive': True, 'createdAt': None},
+            ], 2, 2),
+        ]
+        with mock.patch.object(user_stats.api_client, 'get_users', side_effect=pages) as get_users:
+            stats = user_stats.collect_user_stats('token', page_size=2, today=date(2025, 9, 8))
+
+        self.assertEqual(get_users.call_count, 2)
+        self.assertEqual(stats['total_users'], 4)
+        self.assertEqual(stats['active_users'], 3)
+        self.assertEqual(stats['role_stats']['patient'], 2)
+        self.assertEqual(stats['users_today'], 1)
+        self.assertEqual(stats['users_this_week'], 1)
+        self.assertEqual(stats['new_users_this_month'], 2)
+        self.assertEqual(stats['months_labels'], ['Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep'])
+        self.assertEqual(stats['monthly_registrations'], [0, 0, 1, 0, 0, 2])
+        self.assertEqual(stats['last_user_created'], 'Today')
+
+    def test_failed_page_is_not_cached(self):
+        failure = {'success': False, 'message': 'boom'}
+        with mock.patch.object(user_stats.api_client, 'get_users', return_value=failure):
+            self.assertIsNone(user_stats.get_user_stats('token'))
+        self.assertIsNone(cache.get(user_stats.CACHE_KEY))
+
+    def test_result_is_cached(self):
+        with mock.patch.object(user_stats.api_client, 'get_users', return_value=_page([], 1, 1)) as get_users:
+            user_stats.get_user_stats('token')
+            user_stats.get_user_stats('token')
+        self.assertEqual(get_users.call_count, 1)
@@ -0,0 +1,134 @@
+"""
+Test cases for doctor worklists and their change feed
+"""
+import json
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.appointments import views as appointment_views
+from apps.appointments.worklist import REFRESH_INTERVAL, Worklist, load_worklist, touch
+
+DAY = date(2025, 3, 3)
+
+
+def row(row_id, time, status='scheduled', updated='2025-03-01T10:00:00Z'):
+    return {'id': row_id, 'scheduledDate': f"2025-03-03T{time}:00", 'status': status, 'updatedAt': updated}
+
+
+class WorklistTests(SimpleTestCase):
+
+    def setUp(self):
+        self.worklist = Worklist('doc-1', DAY)
+        self.worklist.apply([row('b', '10:00'), row('a', '09:00'), row('c', '11:00')])
+
+    def ids(self):
+        return [r['id'] for r in self.worklist]
+
+    def test_rows_are_in_schedule_order(self):
+        self.assertEqual(self.ids(), ['a', 'b', 'c'])
+        self.assertEqual(self.worklist.next_id('a'), 'b')
+        self.assertIsNone(self.worklist.next_id('c'))
+
+    def test_only_rows_with_a_new_updated_at_change(self):
+        version = self.worklist.version
+        touched = self.worklist.apply([
+            row('a', '09:00', 'confirmed'),  # same updated_at: not a new revision
+            row('b', '10:00', 'confirmed', updated='2025-03-03T08:00:00Z'),
+            row('c', '11:00'),
+        ])
+        self.assertEqual(touched, ['b'])
+        changed, removed = self.worklist.changes_since(version)
+        self.assertEqual([(r['id'], r['status']) for r in changed], [('b', 'confirmed')])
+        self.assertEqual(removed, [])
+
+    def test_rescheduled_and_removed_rows(self):
+        version = self.worklist.version
+        self.worklist.apply([row('a', '12:00', updated='2025-03-03T08:00:00Z'), row('c', '11:00')])
+        self.assertEqual(self.ids(), ['c', 'a'])
+        changed, removed = self.worklist.changes_since(version)
+        self.assertEqual([r['id'] for r in changed], ['a'])
+        self.assertEqual(removed, ['b'])
+
+    def test_no_change_keeps_the_version(self):
+        version = self.worklist.version
+        self.worklist.apply([row('a', '09:00'), row('b', '10:00'), row('c', '11:00')])
+        self.assertEqual(self.worklist.version, version)
+        self.assertEqual(self.worklist.changes_since(version), ([], []))
+
+    def test_foreign_version_needs_a_reset(self):
+        self.assertIsNone(self.worklist.changes_since(Worklist('doc-1', DAY).version))
+        self.assertIsNone(self.worklist.changes_since(f"{self.worklist.generation}:99"))
+        self.assertIsNone(self.worklist.changes_since(None))
+
+
+class LoadWorklistTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = mock.Mock()
+        self.api.get_direct.return_value = {'success': True, 'data': [row('a', '09:00')]}
+
+    def test_refreshes_are_throttled(self):
+        load_worklist(self.api, 'doc-1', DAY, now=1000)
+        load_worklist(self.api, 'doc-1', DAY, now=1000 + REFRESH_INTERVAL - 1)
+        self.assertEqual(self.api.get_direct.call_count, 1)
+        load_worklist(self.api, 'doc-1', DAY, now=1000 + REFRESH_INTERVAL)
+        self.assertEqual(self.api.get_direct.call_count, 2)
+        self.assertEqual(self.api.get_direct.call_args.kwargs['params'],
+                         {'dateFrom': '2025-03-03T00:00:00', 'dateTo': '2025-03-03T23:59:59'})
+
+    def test_touch_forces_a_refresh(self):
+        with mock.patch('apps.appointments.worklist.time.time', return_value=1000):
+            load_worklist(self.api, 'doc-1', DAY)
+        with mock.patch('apps.appointments.worklist.time.time', return_value=1001):
+            touch()
+            load_worklist(self.api, 'doc-1', DAY)
+        self.assertEqual(self.api.get_direct.call_count, 2)
+
+    def test_upstream_failure_keeps_rows(self):
+        load_worklist(self.api, 'doc-1', DAY, now=1000)
+        self.api.get_direct.return_value = {'success': False, 'message': 'down'}
+        worklist = load_worklist(self.api, 'doc-1', DAY, now=2000)
+        self.assertEqual(len(worklist), 1)
+
+
+class WorklistChangesViewTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(appointment_views, 'APIClient')
+        self.api = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.api.get_direct.return_value = {'success': True, 'data': {'appointments': [row('a', '09:00'), row('b', '10:00')]}}
+        patcher = mock.patch.object(appointment_views, 'render_to_string', side_effect=lambda t, c, request: f"<tr>{c['appointment'].id}</tr>")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, session=None, **params):
+        request = self.factory.get('/appointments/worklist/changes/', dict({'date': '2025-03-03'}, **params))
+        request.session = dict({'access_token': 'token', 'user_role': 'doctor', 'user_id': 'doc-1'}, **(session or {}))
+        return json.loads(appointment_views.DoctorWorklistChangesView().get(request).content)
+
+    def test_doctors_see_their_own_worklist(self):
+        data = self.get(doctor_id='doc-2')
+        self.assertTrue(data['reset'])
+        self.assertIn('/doctor/doc-1/schedule', self.api.get_direct.call_args.args[0])
+
+    def test_sends_only_changed_rows(self):
+        version = self.get()['version']
+        touch()
+        self.api.get_direct.return_value = {'success': True, 'data': {'appointments': [
+            row('a', '09:00'), row('b', '10:00', 'confirmed', updated='2025-03-03T08:00:00Z')]}}
+        data = self.get(version=version)
+        self.assertFalse(data['reset'])
+        self.assertEqual(data['rows'], [{'id': 'b', 'before': None, 'html': '<tr>b</tr>'}])
+        self.assertEqual((data['removed'], data['count']), ([], 2))
+
+    def test_staff_must_pick_a_doctor(self):
+        request = self.factory.get('/appointments/worklist/changes/')
+        request.session = {'access_token': 'token', 'user_role': 'staff'}
+        self.assertEqual(appointment_views.DoctorWorklistChangesView().get(request).status_code, 400)
@@ -0,0 +1,183 @@
+"""
+Bulk actions for list views
+
+The per-record views (activate a user, confirm an appointment, dispense a
+prescription) each do a GET-then-mutate round trip per POST.  A bulk action
+applies the same operation to many ids at once: items run concurrently on a
+small thread pool, every item is re-read and its status transition checked
+just before it is changed (the list page the ids came from may be stale),
+and the view answers with one result row per id.  Caches the action affects
+are invalidated once, after the whole batch.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+#: Outcomes of a single item
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class BulkAction:
+    """
+    One bulk operation
+
+    ``load(item_id)`` returns the gateway response for the current record and
+    ``perform(item_id, record)`` the response of the change.  ``allowed_from``
+    lists the statuses (as returned by ``get_status(record)``) the action may
+    be applied to; ``check(record)`` can veto an item with a message, e.g.
+    for ownership rules.  ``describe(record)`` returns extra fields for the
+    item's result row, such as the owner whose caches the change affects.
+    """
+
+    def __init__(self, name, load, perform, get_status, allowed_from, label=None, check=None, describe=None):
+        self.name = name
+        self.load = load
+        self.perform = perform
+        self.get_status = get_status
+        self.allowed_from = tuple(allowed_from)
+        self.label = label or name
+        self.check = check
+        self.describe = describe
+
+    def apply(self, item_id):
+        """Re-check and apply the action to one id; returns its result row"""
+        result = {'id': item_id, 'outcome': FAILED, 'previous': None, 'message': ''}
+        try:
+            response = self.load(item_id)
+            record = response.get('data') if response.get('success') else None
+            if not isinstance(record, dict):
+                result['message'] = response.get('message') or 'Not found'
+                return result
+
+            current = self.get_status(record)
+            result['previous'] = current
+            if self.describe:
+                result.update(self.describe(record))
+            veto = self.check(record) if self.check else None
+            if veto:
+                result.update(outcome=SKIPPED, message=veto)
+                return result
+            if current not in self.allowed_from:
+                result.update(outcome=SKIPPED, message=f'Cannot {self.label} when status is {current or "unknown"}')
+                return result
+
+            response = self.perform(item_id, record)
+            if response.get('success'):
+                result.update(outcome=DONE, message=response.get('message') or '')
+            else:
+                result['message'] = response.get('message') or f'Failed to {self.label}'
+        except Exception as e:
+            logger.error(f"Bulk {self.name} failed for {item_id}: {str(e)}")
+            result['message'] = 'Unexpected error'
+        return result
+
+
+def _json_body(request):
+    if request.content_type != 'application/json':
+        return None
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ValueError('Invalid JSON body')
+    if not isinstance(body, dict):
+        raise ValueError('Invalid JSON body')
+    return body
+
+
+def bulk_option(request, name, default=''):
+    """Extra parameter of a bulk POST (e.g. ``reason``), from the JSON body or form"""
+    try:
+        body = _json_body(request)
+    except ValueError:
+        body = None
+    source = body if body is not None else request.POST
+    value = source.get(name, default)
+    return value.strip() if isinstance(value, str) else default
+
+
+def parse_bulk_request(request):
+    """
+    ``(action, ids)`` from a bulk POST
+
+    Accepts a JSON body ``{"action": ..., "ids": [...]}`` or form fields
+    ``action`` and ``ids`` (repeated or comma separated).  Ids are de-duplicated
+    in order.  Raises ``ValueError`` when there are no ids or too many.
+    """
+    body = _json_body(request)
+    if body is not None:
+        action, raw_ids = body.get('action'), body.get('ids') or []
+        if isinstance(raw_ids, str):
+            raw_ids = [raw_ids]
+    else:
+        action, raw_ids = request.POST.get('action'), request.POST.getlist('ids')
+
+    ids = list(dict.fromkeys(
+        item_id.strip() for value in raw_ids for item_id in str(value).split(',') if item_id.strip()
+    ))
+
+    limit = getattr(settings, 'BULK_ACTION_MAX_ITEMS', 200)
+    if not ids:
+        raise ValueError('No items selected')
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} items can be updated at once')
+    return action, ids
+
+
+def run_bulk_action(action, ids, workers=None):
+    """Apply ``action`` to every id with at most ``workers`` in flight; results keep the input order"""
+    workers = min(workers or getattr(settings, 'BULK_ACTION_WORKERS', 8), len(ids)) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'bulk-{action.name}') as executor:
+        return list(executor.map(action.apply, ids))
+
+
+def summarize(results):
+    counts = {DONE: 0, SKIPPED: 0, FAILED: 0}
+    for result in results:
+        counts[result['outcome']] += 1
+    return counts
+
+
+def bulk_action_response(request, actions, invalidate=None):
+    """
+    Parse a bulk POST, run the chosen action from ``actions`` and answer with JSON
+
+    ``invalidate(changed)`` is called once with the result rows of the items
+    that changed, when there are any.  The response carries ``results`` (one row per id) and ``summary`` counts.
+    """
+    try:
+        name, ids = parse_bulk_request(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    action = actions.get(name)
+    if action is None:
+        return JsonResponse({'success': False, 'message': 'Invalid action'}, status=400)
+
+    results = run_bulk_action(action, ids)
+    summary = summarize(results)
+    if summary[DONE] and invalidate:
+        try:
+            invalidate([result for result in results if result['outcome'] == DONE])
+        except Exception as e:
+            logger.error(f"Cache invalidation after bulk {name} failed: {str(e)}")
+
+    message = f"{summary[DONE]} of {len(ids)} updated"
+    if summary[SKIPPED]:
+        message += f", {summary[SKIPPED]} skipped"
+    if summary[FAILED]:
+        message += f", {summary[FAILED]} failed"
+    return JsonResponse({
+        'success': summary[FAILED] == 0,
+        'message': message,
+        'action': name,
+        'summary': summary,
+        'results': results,
+    })
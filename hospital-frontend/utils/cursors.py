@@ -0,0 +1,55 @@
+"""
+Opaque cursors for "load more" pagination
+
+A cursor is the sort key of the last row a client has already seen,
+serialized as URL-safe base64 JSON.  The next page starts strictly after that
+key instead of skipping an offset, so pages stay stable when rows are added
+while someone is paging, and clients cannot (usefully) craft their own.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(value):
+    """Serialize a JSON-compatible sort key into an opaque token"""
+    raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of ``encode_cursor``; raises ``ValueError`` for malformed tokens"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+def paginate(rows, key, cursor=None, limit=20):
+    """
+    One newest-first page of ``rows`` ordered by ``key(row)`` (a tuple)
+
+    ``cursor`` is a token from a previous page.  Returns ``(page, next_cursor)``
+    where ``next_cursor`` is None on the last page.
+    """
+    after = decode_cursor(cursor)
+    if after is not None:
+        if not isinstance(after, list):
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        after = tuple(after)
+
+    page = []
+    has_more = False
+    for row in sorted(rows, key=key, reverse=True):
+        if after is not None and key(row) >= after:
+            continue
+        if len(page) == limit:
+            has_more = True
+            break
+        page.append(row)
+
+    next_cursor = encode_cursor(list(key(page[-1]))) if has_more else None
+    return page, next_cursor
@@ -0,0 +1,211 @@
+"""
+Date parsing and formatting shared by template filters and views
+
+The API Gateway sends ISO 8601 strings such as ``2025-08-08T19:56:07.320Z``.
+Appointment, prescription and user timestamps are local wall-clock values
+with a trailing ``Z``; dates of birth are midnight values whose date part is
+the only meaningful bit.  Every helper here accepts strings, ``date`` and
+``datetime`` objects, never raises on bad input, and memoizes string parsing
+because list pages format the same handful of values over and over.
+"""
+
+import calendar
+import re
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+PARSE_CACHE_SIZE = 8192
+FORMAT_CACHE_SIZE = 256
+
+_FRACTION_RE = re.compile(r'\.(\d+)')
+_DMY_RE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_iso(value, aware):
+    text = value.strip()
+    if text[-1:] in ('Z', 'z'):
+        text = text[:-1]
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        # Older Pythons only accept 3 or 6 fractional digits
+        text = _FRACTION_RE.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text, count=1)
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    if aware and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_datetime(value, aware=False):
+    """
+    Parse an ISO 8601 value into a ``datetime``
+
+    By default a trailing ``Z`` is dropped and the wall-clock time returned
+    naive, which is how the services store appointment times.  With
+    ``aware=True`` naive results are marked UTC instead.  Returns ``None`` for
+    empty or unparseable input.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        if aware and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc if aware else None)
+    if isinstance(value, str):
+        return _parse_iso(value, aware)
+    return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date(value):
+    text = value.strip()
+    if len(text) >= 10 and text[4] == '-' and text[7] == '-':
+        try:
+            # Only the date part matters; avoids timezone shifts on DOB values
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            return None
+    match = _DMY_RE.match(text)
+    if match:
+        day, month, year = (int(part) for part in match.groups())
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+    try:
+        from dateutil.parser import parse
+        return parse(text).date()
+    except (ValueError, OverflowError, ImportError):
+        return None
+
+
+def parse_date(value):
+    """Parse a value into a ``date`` (ISO, ``DD/MM/YYYY`` or anything dateutil reads)"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return _parse_date(value)
+    return None
+
+
+def calculate_age(value, today=None):
+    """Age in whole years for a date of birth, or ``None`` if it cannot be parsed"""
+    birth = parse_date(value)
+    if birth is None:
+        return None
+    today = today or date.today()
+    return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+
+
+# Django date format characters that map straight onto strftime directives
+_STRFTIME_CODES = {
+    'd': '%d', 'D': '%a', 'l': '%A', 'w': '%w', 'z': '%j',
+    'm': '%m', 'M': '%b', 'F': '%B', 'y': '%y', 'Y': '%Y',
+    'H': '%H', 'h': '%I', 'i': '%M', 's': '%S', 'A': '%p', 'W': '%W',
+}
+
+# Characters strftime cannot express portably (no padding removal on Windows)
+_CALLABLE_CODES = {
+    'j': lambda dt: str(dt.day),
+    'n': lambda dt: str(dt.month),
+    'G': lambda dt: str(getattr(dt, 'hour', 0)),
+    'g': lambda dt: str(getattr(dt, 'hour', 0) % 12 or 12),
+    'b': lambda dt: dt.strftime('%b').lower(),
+    'a': lambda dt: 'a.m.' if getattr(dt, 'hour', 0) < 12 else 'p.m.',
+}
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def compile_format(django_format):
+    """
+    Translate a Django date format (``"d/m/Y H:i"``) into formatting parts
+
+    Returns a tuple whose items are either strftime patterns or callables.
+    Strings that already contain ``%`` directives are treated as strftime.
+    """
+    if '%' in django_format:
+        return (django_format,)
+
+    parts = []
+    pattern = []
+    escaped = False
+    for char in django_format:
+        if escaped:
+            pattern.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in _STRFTIME_CODES:
+            pattern.append(_STRFTIME_CODES[char])
+        elif char in _CALLABLE_CODES:
+            if pattern:
+                parts.append(''.join(pattern))
+                pattern = []
+            parts.append(_CALLABLE_CODES[char])
+        else:
+            pattern.append(char)
+    if pattern:
+        parts.append(''.join(pattern))
+    return tuple(parts)
+
+
+def format_value(value, django_format):
+    """Format a ``date``/``datetime`` with a Django format string"""
+    return ''.join(
+        value.strftime(part) if isinstance(part, str) else part(value)
+        for part in compile_format(django_format)
+    )
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _format_string(value, django_format, aware, date_only):
+    # strftime dominates filter cost, so the rendered text is memoized too
+    parsed = _parse_date(value) if date_only else _parse_iso(value, aware)
+    return None if parsed is None else format_value(parsed, django_format)
+
+
+def format_datetime(value, django_format='d/m/Y H:i', default='', aware=False):
+    """Parse (if needed) and format a datetime; ``default`` on failure"""
+    if isinstance(value, str):
+        formatted = _format_string(value, django_format, aware, False) if value else None
+    else:
+        parsed = parse_datetime(value, aware=aware)
+        formatted = None if parsed is None else format_value(parsed, django_format)
+    return default if formatted is None else formatted
+
+
+def format_date(value, django_format='d/m/Y', default=''):
+    """Parse (if needed) and format the date part only, ignoring time and timezone"""
+    if isinstance(value, str):
+        formatted = _format_string(value, django_format, False, True) if value else None
+    else:
+        parsed = value if isinstance(value, datetime) else parse_date(value)
+        formatted = None if parsed is None else format_value(parsed, django_format)
+    return default if formatted is None else formatted
+
+
+@lru_cache(maxsize=64)
+def month_weeks(year, month, firstweekday=6):
+    """Weeks of ``date`` objects covering a month (Sunday first by default)"""
+    weeks = calendar.Calendar(firstweekday=firstweekday).monthdatescalendar(year, month)
+    return tuple(tuple(week) for week in weeks)
+
+
+def cache_info():
+    """Hit/miss statistics for the parse caches (used by benchmarks)"""
+    return {
+        'datetime': _parse_iso.cache_info(),
+        'date': _parse_date.cache_info(),
+        'format': compile_format.cache_info(),
+        'rendered': _format_string.cache_info(),
+    }
@@ -0,0 +1,222 @@
+"""
+Stale-if-error reads while the API gateway is down
+
+``install`` wraps ``APIClient._make_request`` and ``APIClient.get_direct``.
+Successful GET responses are copied to the cache (at most once per
+``STALE_IF_ERROR_REFRESH`` seconds per request and token).  When a read fails
+with an outage - an exception, a 5xx, a timeout - or the circuit is open, the
+last copy younger than ``STALE_IF_ERROR_MAX_AGE`` is returned instead, with
+``stale: True`` and ``stale_as_of`` added.
+
+The circuit opens after ``CIRCUIT_FAILURE_THRESHOLD`` consecutive outages
+and stays open for ``CIRCUIT_OPEN_SECONDS``; while open, reads are answered
+from the copies without calling upstream, except for one probe per period.
+
+``DegradedModeMiddleware`` installs the wrappers, rejects writes while the
+circuit is open, and ``degraded_mode`` tells templates to show the banner and
+disable write actions.
+"""
+
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.http import url_has_allowed_host_and_scheme
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURES_KEY = 'degraded:circuit:failures'
+CIRCUIT_OPEN_KEY = 'degraded:circuit:open'
+CIRCUIT_PROBE_KEY = 'degraded:circuit:probe'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+UNAVAILABLE = {'success': False, 'message': 'The service is temporarily unavailable', 'status_code': 503}
+
+# Per-request record of the oldest stale copy served, for the banner.  Only
+# set by DegradedModeMiddleware, so reads outside a request (task workers,
+# management commands, executor threads) record nothing and cannot leak.
+_served_stale = contextvars.ContextVar('degraded_served_stale', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_outage(response):
+    """Whether a gateway-style response means upstream is unavailable (not a 4xx)"""
+    if not isinstance(response, dict):
+        return True
+    if response.get('success'):
+        return False
+    status = response.get('status_code') or response.get('status') or 0
+    message = str(response.get('message', '')).lower()
+    return ((isinstance(status, int) and status >= 500)
+            or any(word in message for word in ('timeout', 'timed out', 'connection', 'unavailable')))
+
+
+def opened_at():
+    """When the circuit opened (a timestamp), or ``None`` while it is closed"""
+    return cache.get(CIRCUIT_OPEN_KEY)
+
+
+def circuit_open():
+    return opened_at() is not None
+
+
+def admit():
+    """Whether a gateway call may go out: the circuit is closed, or this call is the probe"""
+    return not circuit_open() or cache.add(CIRCUIT_PROBE_KEY, 1, _setting('CIRCUIT_OPEN_SECONDS', 30))
+
+
+def record_failure():
+    if cache.add(CIRCUIT_FAILURES_KEY, 1, 300):
+        failures = 1
+    else:
+        try:
+            failures = cache.incr(CIRCUIT_FAILURES_KEY)
+        except ValueError:
+            cache.set(CIRCUIT_FAILURES_KEY, 1, 300)
+            failures = 1
+    if failures >= _setting('CIRCUIT_FAILURE_THRESHOLD', 5) and cache.add(
+            CIRCUIT_OPEN_KEY, time.time(), _setting('CIRCUIT_OPEN_SECONDS', 30)):
+        logger.warning(f"Gateway circuit opened after {failures} consecutive failures")
+
+
+def record_success():
+    if cache.get(CIRCUIT_FAILURES_KEY):
+        cache.delete_many([CIRCUIT_FAILURES_KEY, CIRCUIT_OPEN_KEY, CIRCUIT_PROBE_KEY])
+        logger.info("Gateway circuit closed")
+
+
+def copy_key(target, params, token):
+    raw = json.dumps([target, params or {}], sort_keys=True, default=str)
+    # Per token: a copy is only ever served to the session that could read it
+    scope = hashlib.sha256(str(token or '').encode('utf-8')).hexdigest()[:16]
+    return f"degraded:read:{scope}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def remember(key, response):
+    refresh = _setting('STALE_IF_ERROR_REFRESH', 60)
+    if cache.add(f"{key}:fresh", 1, refresh):
+        cache.set(key, {'response': response, 'stored_at': time.time()}, _setting('STALE_IF_ERROR_MAX_AGE', 21600))
+
+
+def stale_copy(key):
+    """The last good response for ``key`` flagged as stale, or ``None``"""
+    copy = cache.get(key)
+    if copy is None or time.time() - copy['stored_at'] > _setting('STALE_IF_ERROR_MAX_AGE', 21600):
+        return None
+    served = _served_stale.get()
+    if served is not None and copy['stored_at'] < served.get('as_of', float('inf')):
+        served['as_of'] = copy['stored_at']
+    return dict(copy['response'], stale=True, stale_as_of=copy['stored_at'])
+
+
+def stale_if_error(fetch, describe):
+    """Wrap an APIClient read; ``describe(client, args, kwargs)`` -> ``(method, target, params, token)``"""
+
+    @functools.wraps(fetch)
+    def read(client, *args, **kwargs):
+        method, target, params, token = describe(client, args, kwargs)
+        if str(method).upper() != 'GET':
+            return fetch(client, *args, **kwargs)
+
+        key = copy_key(target, params, token)
+        if not admit():
+            return stale_copy(key) or dict(UNAVAILABLE)
+
+        try:
+            response = fetch(client, *args, **kwargs)
+        except Exception as e:
+            record_failure()
+            stale = stale_copy(key)
+            if stale is None:
+                raise
+            logger.warning(f"Serving stale {target} after error: {str(e)}")
+            return stale
+
+        if is_outage(response):
+            record_failure()
+            stale = stale_copy(key)
+            if stale is not None:
+                logger.warning(f"Serving stale {target}: {response.get('message', 'Unknown error')}")
+                return stale
+            return response
+
+        record_success()
+        if response.get('success'):
+            remember(key, response)
+        return response
+
+    read.stale_if_error = True
+    return read
+
+
+def _describe_request(client, args, kwargs):
+    method = args[0] if args else kwargs.get('method', 'GET')
+    endpoint = args[1] if len(args) > 1 else kwargs.get('endpoint')
+    token = kwargs.get('token') or (args[2] if len(args) > 2 else None) or getattr(client, 'token', None)
+    return method, endpoint, kwargs.get('params'), token
+
+
+def _describe_direct(client, args, kwargs):
+    url = args[0] if args else kwargs.get('url')
+    return 'GET', url, kwargs.get('params'), getattr(client, 'token', None)
+
+
+def install(client_class):
+    """Wrap ``client_class``'s read methods once"""
+    for name, describe in (('_make_request', _describe_request), ('get_direct', _describe_direct)):
+        fetch = getattr(client_class, name, None)
+        if fetch is not None and not getattr(fetch, 'stale_if_error', False):
+            setattr(client_class, name, stale_if_error(fetch, describe))
+
+
+class DegradedModeMiddleware:
+    """Turns on stale-if-error reads and refuses writes while the circuit is open"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        from utils.api_client import APIClient
+        install(APIClient)
+
+    def __call__(self, request):
+        token = _served_stale.set({})
+        try:
+            if request.method not in SAFE_METHODS and circuit_open() and not self.exempt(request):
+                return self.refuse(request)
+            return self.get_response(request)
+        finally:
+            _served_stale.reset(token)
+
+    def exempt(self, request):
+        return request.path.startswith(tuple(_setting('DEGRADED_WRITE_EXEMPT', ('/auth/',))))
+
+    def refuse(self, request):
+        message = 'The hospital system is temporarily unavailable. Changes cannot be saved right now.'
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'json' in request.headers.get('Accept', ''):
+            return JsonResponse({'success': False, 'message': message, 'degraded': True}, status=503)
+        messages.warning(request, message)
+        referer = request.META.get('HTTP_REFERER')
+        if not url_has_allowed_host_and_scheme(referer, {request.get_host()}, request.is_secure()):
+            referer = '/'
+        return redirect(referer)
+
+
+def degraded_mode(request):
+    """Template context: ``degraded_mode`` and the age of the data shown"""
+    as_of = (_served_stale.get() or {}).get('as_of') or opened_at()
+    return {
+        'degraded_mode': as_of is not None,
+        'degraded_as_of': datetime.fromtimestamp(as_of, tz=timezone.utc) if as_of else None,
+    }
@@ -0,0 +1,173 @@
+"""
+Backend domain events, read from the RabbitMQ topic exchange
+
+The services publish through ``shared/src/rabbitmq.ts`` to the
+``hospital_notifications`` topic exchange.  Routing keys are either dotted
+(``appointment.confirmed``) or upper-case (``PRESCRIPTION_READY``); bodies
+are JSON objects carrying the entity either under ``data``/``payload`` or at
+the top level.  ``event_name`` and ``event_data`` normalise both shapes.
+
+``EventRouter`` maps routing-key patterns to handlers with the exchange's own
+topic syntax (``*`` one word, ``#`` any number), applied to the normalised
+name.  ``AMQPBroker`` reads a queue of our own bound to the exchange (with
+``#`` by default, since upper-case keys cannot be matched by prefix), so the
+notification service's queues are not drained; ``LocalBroker`` is an
+in-process stand-in with the same interface for tests and development.
+"""
+
+import collections
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def topic_matches(pattern, routing_key):
+    """AMQP topic-exchange matching of ``routing_key`` against ``pattern``"""
+    def match(pattern_words, key_words):
+        if not pattern_words:
+            return not key_words
+        head, rest = pattern_words[0], pattern_words[1:]
+        if head == '#':
+            return any(match(rest, key_words[i:]) for i in range(len(key_words) + 1))
+        if not key_words:
+            return False
+        return (head == '*' or head == key_words[0]) and match(rest, key_words[1:])
+
+    return match(pattern.split('.'), routing_key.split('.'))
+
+
+def event_name(routing_key):
+    """``PRESCRIPTION_READY`` -> ``prescription.ready``; dotted keys are kept"""
+    name = routing_key.lower()
+    if '.' not in name:
+        name = name.replace('_', '.', 1)
+    return name
+
+
+def event_data(body):
+    """The entity an event is about, as a dict"""
+    if not isinstance(body, dict):
+        return {}
+    for key in ('data', 'payload'):
+        if isinstance(body.get(key), dict):
+            return body[key]
+    return body
+
+
+class EventRouter:
+    """Routes events to every handler whose pattern matches their name"""
+
+    def __init__(self):
+        self.routes = []
+
+    def on(self, *patterns):
+        def register(handler):
+            for pattern in patterns:
+                self.routes.append((pattern, handler))
+            return handler
+        return register
+
+    @property
+    def patterns(self):
+        return list(dict.fromkeys(pattern for pattern, _ in self.routes))
+
+    def dispatch(self, routing_key, body):
+        """
+        Run the handlers for one message; returns how many ran
+
+        A failing handler is logged and does not stop the others, so one bad
+        mapping cannot leave the remaining caches stale.
+        """
+        if isinstance(body, (bytes, str)):
+            try:
+                body = json.loads(body)
+            except ValueError:
+                logger.warning(f"Dropped non-JSON event {routing_key}")
+                return 0
+        name = event_name(routing_key)
+        data = event_data(body)
+        ran = 0
+        for pattern, handler in self.routes:
+            if not topic_matches(pattern, name):
+                continue
+            try:
+                handler(name, data)
+                ran += 1
+            except Exception as e:
+                logger.error(f"Event handler {handler.__name__} failed for {name}: {str(e)}")
+        return ran
+
+
+class LocalBroker:
+    """In-process stand-in for the topic exchange and our bound queue"""
+
+    def __init__(self):
+        self.bindings = []
+        self.messages = collections.deque()
+
+    def bind(self, patterns):
+        self.bindings.extend(patterns)
+
+    def publish(self, routing_key, message):
+        # Bindings see the raw routing key, as on the real exchange
+        if any(topic_matches(pattern, routing_key) for pattern in self.bindings):
+            self.messages.append((routing_key, json.dumps(message).encode('utf-8')))
+
+    def consume(self, handle, stop=lambda: False, on_connect=None, until_idle=True):
+        """Deliver queued messages until the queue is empty or ``stop()``"""
+        if on_connect is not None:
+            on_connect()
+        while self.messages and not stop():
+            handle(*self.messages.popleft())
+
+
+class AMQPBroker:
+    """
+    A durable queue of this frontend bound to the backend's topic exchange
+
+    Messages are acknowledged after ``handle`` returns; invalidations are
+    idempotent, so a redelivery after a crash is harmless.  ``on_connect`` runs
+    once the queue is bound, before the first message; with ``until_idle``
+    consuming stops at the first second without messages.
+    """
+
+    def __init__(self, url, exchange, queue, message_ttl=3600, prefetch=50):
+        self.url = url
+        self.exchange = exchange
+        self.queue = queue
+        self.message_ttl = message_ttl
+        self.prefetch = prefetch
+        self.bindings = []
+
+    def bind(self, patterns):
+        self.bindings.extend(patterns)
+
+    def consume(self, handle, stop=lambda: False, on_connect=None, until_idle=False):
+        import pika
+
+        connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        try:
+            channel = connection.channel()
+            channel.exchange_declare(self.exchange, exchange_type='topic', durable=True)
+            # Events older than the TTL are dropped while no consumer runs,
+            # which is why on_connect is expected to reset every cache
+            channel.queue_declare(self.queue, durable=True, arguments={'x-message-ttl': self.message_ttl * 1000})
+            for pattern in self.bindings:
+                channel.queue_bind(self.queue, self.exchange, routing_key=pattern)
+            channel.basic_qos(prefetch_count=self.prefetch)
+            if on_connect is not None:
+                on_connect()
+            for method, properties, body in channel.consume(self.queue, inactivity_timeout=1):
+                if stop():
+                    break
+                if method is None:
+                    if until_idle:
+                        break
+                    continue
+                handle(method.routing_key, body)
+                channel.basic_ack(method.delivery_tag)
+            channel.cancel()
+        finally:
+            if connection.is_open:
+                connection.close()
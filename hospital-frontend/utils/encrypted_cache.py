@@ -0,0 +1,169 @@
+"""
+Encrypted-at-rest cache entries for patient data
+
+``EncryptedCache`` is a cache backend wrapping the real store
+(``OPTIONS['CACHE']``, any Django backend).  Values stored under a key that
+starts with one of ``PHI_PREFIXES`` are pickled and sealed with AES-GCM before
+they reach the store, so a shared Redis holds only ciphertext for patients,
+prescriptions, medical history and appointments.  Other keys, and integers
+under any key (generation counters rely on ``incr``), pass through untouched.
+
+A sealed value is ``MAGIC | key id (4) | nonce (12) | ciphertext + tag``.
+The cache key is the associated data, so an entry copied under another key
+does not decrypt.  The AES key is derived from ``ENCRYPTION_KEY`` with HKDF;
+``ENCRYPTION_OLD_KEYS`` are still accepted for reading, which lets the key be
+rotated without flushing the cache: new writes use the new key and entries
+sealed with an old one expire on their own.  Entries that cannot be opened
+(unknown key, tampering) read as misses.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'\xa7E1'
+
+PHI_PREFIXES = ('patients:', 'prescriptions:', 'appointments:', 'analytics:', 'degraded:read:', 'patient_import:')
+
+_HEADER = len(MAGIC) + 4 + 12
+_MISSING = object()
+
+
+def derive_key(secret):
+    """32-byte cache key for an ``ENCRYPTION_KEY`` (hex or passphrase)"""
+    try:
+        material = bytes.fromhex(secret)
+    except ValueError:
+        material = secret.encode('utf-8')
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=b'hospital-frontend cache values').derive(material)
+
+
+class SealError(Exception):
+    """A sealed value could not be opened"""
+
+
+class Sealer:
+    """AES-GCM sealing with one current key and any number of old ones"""
+
+    def __init__(self, secret, old_secrets=()):
+        self.ciphers = {}
+        for index, value in enumerate([secret, *old_secrets]):
+            key = derive_key(value)
+            key_id = hashlib.sha256(key).digest()[:4]
+            if index == 0:
+                self.current_id = key_id
+            self.ciphers.setdefault(key_id, AESGCM(key))
+
+    def seal(self, cache_key, value):
+        nonce = os.urandom(12)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        sealed = self.ciphers[self.current_id].encrypt(nonce, payload, cache_key.encode('utf-8'))
+        return b''.join((MAGIC, self.current_id, nonce, sealed))
+
+    def open(self, cache_key, token):
+        cipher = self.ciphers.get(token[len(MAGIC):len(MAGIC) + 4])
+        if cipher is None:
+            raise SealError('sealed with an unknown key')
+        try:
+            payload = cipher.decrypt(token[len(MAGIC) + 4:_HEADER], token[_HEADER:], cache_key.encode('utf-8'))
+        except InvalidTag:
+            raise SealError('authentication failed')
+        return pickle.loads(payload)
+
+
+def is_sealed(value):
+    return isinstance(value, bytes) and value.startswith(MAGIC) and len(value) > _HEADER
+
+
+class EncryptedCache(BaseCache):
+    """Cache backend sealing PHI entries before they reach ``OPTIONS['CACHE']``"""
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS') or {})
+        store = dict(options.pop('CACHE', None) or {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'})
+        self.prefixes = tuple(options.pop('PHI_PREFIXES', PHI_PREFIXES))
+        super().__init__(dict(params, OPTIONS=options))
+        self.store = import_string(store['BACKEND'])(store.get('LOCATION', ''), store)
+        self._sealer = None
+
+    @property
+    def sealer(self):
+        if self._sealer is None:
+            self._sealer = Sealer(settings.ENCRYPTION_KEY, getattr(settings, 'ENCRYPTION_OLD_KEYS', ()))
+        return self._sealer
+
+    def is_phi(self, key):
+        return str(key).startswith(self.prefixes)
+
+    def _protect(self, key, value):
+        if self.is_phi(key) and not (isinstance(value, int) and not isinstance(value, bool)):
+            return self.sealer.seal(str(key), value)
+        return value
+
+    def _reveal(self, key, value, default):
+        if not (self.is_phi(key) and is_sealed(value)):
+            return value
+        try:
+            return self.sealer.open(str(key), value)
+        except SealError as e:
+            logger.warning(f"Cache entry {key} dropped: {str(e)}")
+            return default
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store.add(key, self._protect(key, value), timeout, version)
+
+    def get(self, key, default=None, version=None):
+        value = self.store.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        return self._reveal(key, value, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store.set(key, self._protect(key, value), timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self.store.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key, value in self.store.get_many(keys, version).items():
+            value = self._reveal(key, value, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store.set_many({key: self._protect(key, value) for key, value in data.items()}, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        return self.store.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.store.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.store.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.store.decr(key, delta, version)
+
+    def clear(self):
+        return self.store.clear()
+
+    def close(self, **kwargs):
+        return self.store.close(**kwargs)
@@ -0,0 +1,54 @@
+"""
+Fragment rendering for list pages
+
+List pages wrap their results (rows, pagination and the empty state) in a
+partial template.  A request with ``?fragment=1`` (sent by
+``includes/list_fragments.html`` on filter changes, page clicks and "load
+more") gets only that partial, so the browser swaps it in without
+re-rendering base.html, and the view can skip everything that only feeds the
+page chrome, such as filter dropdown data.
+"""
+
+from django.shortcuts import render
+
+FRAGMENT_PARAM = 'fragment'
+
+
+def is_fragment_request(request):
+    return request.GET.get(FRAGMENT_PARAM) == '1'
+
+
+def page_urls(request, pagination):
+    """
+    Query strings for the previous/next pages, keeping every current filter
+
+    Returns ``{'prev': '?...' or None, 'next': '?...' or None}``.
+    """
+    pagination = pagination or {}
+    current = pagination.get('currentPage') or pagination.get('page') or 1
+    try:
+        current = int(current)
+    except (TypeError, ValueError):
+        current = 1
+
+    def url(page):
+        query = request.GET.copy()
+        query.pop(FRAGMENT_PARAM, None)
+        query['page'] = page
+        return '?' + query.urlencode()
+
+    return {
+        'prev': url(current - 1) if pagination.get('hasPrev') else None,
+        'next': url(current + 1) if pagination.get('hasNext') else None,
+    }
+
+
+def render_list(request, template_name, fragment_template, context):
+    """Render the full list page, or just its results partial for fragment requests"""
+    context.setdefault('page_urls', page_urls(request, context.get('pagination')))
+    if is_fragment_request(request):
+        response = render(request, fragment_template, context)
+        # Fragments must never be shown from the back/forward cache as a page
+        response['Cache-Control'] = 'no-store'
+        return response
+    return render(request, template_name, context)
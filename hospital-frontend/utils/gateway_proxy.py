@@ -0,0 +1,139 @@
+"""
+Streaming pass-through to the API gateway for JSON endpoints
+
+Proxy views used to call ``APIClient._make_request``, which decodes the
+gateway's JSON into dicts, only to encode them again with ``JsonResponse``.
+``proxy`` forwards the method, query string, raw body and the session's
+bearer token, and streams the upstream status, body bytes and content headers
+back unchanged - compressed bodies stay compressed - so a pass-through costs
+no JSON work in Python.
+
+Conditional headers are forwarded both ways, so upstream 304s reach the
+browser.  ``max_age`` adds ``Cache-Control`` to successful reads the gateway
+did not mark itself.  Outcomes feed the gateway circuit in ``utils.degraded``;
+bodies are never decoded, so there are no stale copies to fall back on.
+
+Payloads that are decoded anyway (cached aggregates) are sent with
+``json_response``, which encodes with orjson instead of the stdlib encoder.
+"""
+
+import logging
+import threading
+
+import orjson
+import requests
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+
+from utils import degraded
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+FORWARDED_REQUEST_HEADERS = ('Accept', 'Accept-Language', 'Content-Type', 'If-None-Match', 'If-Modified-Since')
+FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'Content-Encoding', 'Content-Length', 'ETag', 'Last-Modified',
+                              'Cache-Control', 'Vary')
+
+UNAVAILABLE = 'The service is temporarily unavailable'
+
+# One pooled session per worker thread; requests.Session is not thread-safe
+_local = threading.local()
+
+
+def session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def gateway_url(path, query_string=''):
+    url = getattr(settings, 'API_GATEWAY_BASE_URL', 'http://localhost:3000').rstrip('/') + path
+    return f"{url}?{query_string}" if query_string else url
+
+
+class UpstreamBody:
+    """The raw upstream body in chunks; Django closes it once the response is sent"""
+
+    def __init__(self, upstream, chunk_size=CHUNK_SIZE):
+        self.upstream = upstream
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self.upstream.raw.stream(self.chunk_size, decode_content=False)
+
+    def close(self):
+        self.upstream.close()
+
+
+def error_response(message, status):
+    return JsonResponse({'success': False, 'message': message}, status=status)
+
+
+def json_response(data, status=200):
+    """``JsonResponse`` for large payloads, encoded with orjson"""
+    return HttpResponse(orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS),
+                        status=status, content_type='application/json')
+
+
+def forwarded_headers(request, token=None):
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    # The body is relayed as-is, so only ask for encodings the browser accepts
+    headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
+    if request.body:
+        headers.setdefault('Content-Type', 'application/json')
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return headers
+
+
+def proxy(request, path, token=None, max_age=None, timeout=None):
+    """
+    Relay ``request`` to the gateway's ``path`` and stream the answer back
+
+    ``token`` is sent as the bearer token (``None`` for public endpoints);
+    ``max_age`` (seconds) marks successful GET responses cacheable, privately
+    when a token was sent.
+    """
+    if not degraded.admit():
+        return error_response(UNAVAILABLE, 503)
+
+    try:
+        upstream = session().request(
+            request.method,
+            gateway_url(path, request.META.get('QUERY_STRING', '')),
+            data=request.body or None,
+            headers=forwarded_headers(request, token),
+            timeout=timeout or getattr(settings, 'API_GATEWAY_TIMEOUT', 30),
+            stream=True,
+            allow_redirects=False,
+        )
+    except requests.RequestException as e:
+        degraded.record_failure()
+        logger.error(f"Gateway proxy {request.method} {path} failed: {str(e)}")
+        return error_response(UNAVAILABLE, 503)
+
+    status = upstream.status_code
+    if status >= 500:
+        degraded.record_failure()
+    else:
+        degraded.record_success()
+
+    content_type = upstream.headers.get('Content-Type', '')
+    if status >= 400 and 'json' not in content_type:
+        # Error pages from the gateway itself; callers always expect JSON
+        upstream.close()
+        logger.error(f"Gateway proxy {request.method} {path} returned {status} ({content_type or 'no content type'})")
+        return error_response(UNAVAILABLE if status >= 500 else 'Request failed', status)
+
+    response = StreamingHttpResponse(UpstreamBody(upstream), status=status, content_type=content_type or None)
+    for name in FORWARDED_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response[name] = upstream.headers[name]
+    if max_age and request.method == 'GET' and status in (200, 304) and 'Cache-Control' not in upstream.headers:
+        if token:
+            patch_cache_control(response, private=True, max_age=max_age)
+        else:
+            patch_cache_control(response, public=True, max_age=max_age)
+    return response
@@ -0,0 +1,197 @@
+"""
+Coalesced server-push updates for values that many open pages display
+
+Badges and dashboard counters used to be refreshed by every tab on its own
+timer, so N tabs meant N upstream calls per interval for the same number.
+Here each value is a *topic* (optionally keyed, e.g. per user) whose entry
+lives in the shared cache::
+
+    {'version': <hash of data>, 'data': ..., 'due_at': <timestamp>}
+
+Connections (the WebSocket consumer or the SSE stream) call
+``LivePublisher.refresh`` every ``TICK`` seconds.  That is a cache read until
+the entry is due; then one caller, elected with ``cache.add``, runs the
+topic's loader.  Only when the data hash changes is the entry's version
+bumped and an update sent to the topic's channel-layer group, so an unchanged
+value costs one upstream call per interval no matter how many tabs watch it.
+
+``mark_dirty`` brings a topic's next load forward to within ``coalesce``
+seconds, so a burst of writes (a bulk action, a queue drain) produces a single
+recomputation and a single push.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+#: Consumer handler for pushed updates is ``live_update``
+MESSAGE_TYPE = 'live.update'
+
+#: Seconds between ``refresh`` calls made by an open connection
+TICK = 2
+
+_GROUP_UNSAFE_RE = re.compile(r'[^0-9A-Za-z_.-]')
+
+
+def topic_group(name, key=None):
+    """Channel-layer group of every connection watching ``name``/``key``"""
+    group = f"live_{name}" if key is None else f"live_{name}_{key}"
+    return _GROUP_UNSAFE_RE.sub('_', group)[:99]
+
+
+def data_version(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class LiveTopic:
+    """
+    A pushed value
+
+    ``load(key, token)`` returns the JSON-serialisable value, or ``None`` when
+    it could not be loaded (the previous value is kept and the next attempt
+    waits a full ``interval``).
+    """
+
+    def __init__(self, name, load, interval=30, coalesce=2):
+        self.name = name
+        self.load = load
+        self.interval = interval
+        self.coalesce = coalesce
+
+
+class LivePublisher:
+    """Registry of topics and the cache entries behind them"""
+
+    def __init__(self, prefix='live', backend=None, channel_layer=None):
+        self.prefix = prefix
+        self.backend = backend or cache
+        self._channel_layer = channel_layer
+        self.topics = {}
+
+    def register(self, topic):
+        self.topics[topic.name] = topic
+        return topic
+
+    @property
+    def channel_layer(self):
+        if self._channel_layer is None:
+            try:
+                from channels.layers import get_channel_layer
+            except ImportError:
+                return None
+            self._channel_layer = get_channel_layer()
+        return self._channel_layer
+
+    def entry_key(self, name, key=None):
+        return f"{self.prefix}:{name}" if key is None else f"{self.prefix}:{name}:{key}"
+
+    def snapshot(self, name, key=None):
+        """The cached entry for a topic, or ``None`` before its first load"""
+        return self.backend.get(self.entry_key(name, key))
+
+    def refresh(self, name, key=None, token=None, now=None):
+        """
+        The current entry, loading it first if it is due
+
+        Only one caller per topic and key loads at a time; the others get the
+        cached entry, which is at most one interval old.
+        """
+        topic = self.topics[name]
+        now = time.time() if now is None else now
+        entry_key = self.entry_key(name, key)
+        entry = self.backend.get(entry_key)
+        if entry is not None and entry['due_at'] > now:
+            return entry
+
+        lock_key = f"{entry_key}:loading"
+        if not self.backend.add(lock_key, True, topic.interval):
+            return entry
+        try:
+            data = topic.load(key, token)
+        except Exception as e:
+            logger.error(f"Live topic {entry_key} failed to load: {str(e)}")
+            data = None
+        if data is None:
+            # The lock is left to expire, which spaces out retries by an interval
+            return entry
+
+        version = data_version(data)
+        changed = entry is None or entry['version'] != version
+        entry = {'version': version, 'data': data, 'due_at': now + topic.interval}
+        self.backend.set(entry_key, entry, max(topic.interval * 10, 300))
+        self.backend.delete(lock_key)
+        if changed:
+            self.publish(name, key, entry)
+        return entry
+
+    def mark_dirty(self, name, key=None, now=None):
+        """Reload a topic within its coalescing window (no-op if never loaded)"""
+        topic = self.topics[name]
+        now = time.time() if now is None else now
+        entry_key = self.entry_key(name, key)
+        entry = self.backend.get(entry_key)
+        if entry is None or entry['due_at'] <= now + topic.coalesce:
+            return
+        entry['due_at'] = now + topic.coalesce
+        self.backend.set(entry_key, entry, max(topic.interval * 10, 300))
+
+    def publish(self, name, key, entry):
+        layer = self.channel_layer
+        if layer is None:
+            return
+        from asgiref.sync import async_to_sync
+        try:
+            async_to_sync(layer.group_send)(topic_group(name, key), message(name, key, entry))
+        except Exception as e:
+            logger.warning(f"Live topic {name} update could not be sent: {str(e)}")
+
+
+def message(name, key, entry):
+    return {'type': MESSAGE_TYPE, 'topic': name, 'key': key, 'version': entry['version'], 'data': entry['data']}
+
+
+async def event_stream(publisher, subscriptions, token=None, duration=300, tick=TICK, keepalive=15,
+                       clock=time.time, sleep=asyncio.sleep):
+    """
+    Server-sent events for ``subscriptions`` (``[(name, key), ...]``)
+
+    Sends every topic once, then only versions the client has not seen.  An
+    async generator, so it is only served under ASGI, where waiting between
+    ticks holds no worker thread; refreshes run in the thread pool.  The
+    stream ends after ``duration`` seconds and ``EventSource`` reconnects on
+    its own after ``retry``.
+    """
+    refresh = sync_to_async(publisher.refresh, thread_sensitive=False)
+    yield 'retry: 3000\n\n'
+    sent = {}
+    started = last_write = clock()
+    while True:
+        for name, key in subscriptions:
+            entry = await refresh(name, key, token=token)
+            if entry is None or sent.get((name, key)) == entry['version']:
+                continue
+            sent[(name, key)] = entry['version']
+            payload = message(name, key, entry)
+            del payload['type']
+            last_write = clock()
+            yield f"event: update\ndata: {json.dumps(payload, default=str)}\n\n"
+        if clock() - started >= duration:
+            return
+        if clock() - last_write >= keepalive:
+            last_write = clock()
+            yield ': keepalive\n\n'
+        await sleep(tick)
+
+
+def live_updates(request):
+    """Template context: whether pages may fall back to the SSE stream"""
+    return {'live_sse_enabled': getattr(settings, 'LIVE_SSE_ENABLED', False)}
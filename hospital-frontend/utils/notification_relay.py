@@ -0,0 +1,208 @@
+"""
+Shared upstream notification sockets for WebSocket consumers
+
+The gateway's notification socket (``WEBSOCKET_URL``) authenticates each
+connection with the user's access token and only ever delivers that user's
+messages, so one socket cannot carry several users.  What can be shared is
+everything else: instead of every browser tab opening its own upstream
+connection, consumers register with the process-wide ``relay``.  The first
+tab of a user in a worker opens the upstream socket, later tabs reuse it, and
+it closes ``NOTIFICATION_RELAY_GRACE`` seconds after the last tab left (page
+navigation reconnects within that window).
+
+Upstream messages go to the user's channel-layer group (``user_group``).
+With the Redis layer that reaches the user's tabs in every worker, so a user
+with tabs on two workers has two upstream sockets; each message is forwarded
+once, by whichever relay claims its id first.  Claims are made in the channel
+layer's own Redis (``SET NX``), not the Django cache, which may be private to
+the process; with the in-memory layer there is a single process and claims
+are kept locally.
+
+``apps.dashboard.consumers.LiveUpdatesConsumer`` uses it as::
+
+    async def connect(self):
+        self.group = await relay.subscribe(user_id, access_token)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        await relay.unsubscribe(user_id)
+
+    async def notification_message(self, event):
+        await self.send_json(event['message'])
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+#: Consumer handler for forwarded messages is ``notification_message``
+MESSAGE_TYPE = 'notification.message'
+
+#: Seconds a forwarded message id stays claimed
+SEEN_TTL = 120
+
+_GROUP_UNSAFE_RE = re.compile(r'[^0-9A-Za-z_.-]')
+
+
+def user_group(user_id):
+    """Channel-layer group of every socket a user has open"""
+    return f"notifications_user_{_GROUP_UNSAFE_RE.sub('_', str(user_id))}"[:99]
+
+
+def message_id(raw, message):
+    """Stable id for an upstream message, used to forward it only once"""
+    if isinstance(message, dict) and message.get('id'):
+        return str(message['id'])
+    return hashlib.sha1(raw.encode('utf-8') if isinstance(raw, str) else raw).hexdigest()
+
+
+class _Subscription:
+
+    def __init__(self, token):
+        self.token = token
+        self.refs = 0
+        self.task = None
+        self.closing = None
+
+
+class UpstreamRelay:
+    """
+    Reference-counted upstream sockets, one per user per process
+
+    ``connect(url)`` returns an async context manager yielding an async
+    iterator of messages (``websockets.connect`` by default).
+    """
+
+    def __init__(self, url=None, connect=None, channel_layer=None, grace=None, max_backoff=None):
+        self.url = url
+        self._connect = connect
+        self._channel_layer = channel_layer
+        self.grace = grace
+        self.max_backoff = max_backoff
+        self._subscriptions = {}
+        self._claimed = {}
+
+    @property
+    def channel_layer(self):
+        if self._channel_layer is None:
+            from channels.layers import get_channel_layer
+            self._channel_layer = get_channel_layer()
+        return self._channel_layer
+
+    def _settings(self):
+        return (
+            self.url or getattr(settings, 'WEBSOCKET_URL', 'ws://localhost:3000/ws/notifications'),
+            self.grace if self.grace is not None else getattr(settings, 'NOTIFICATION_RELAY_GRACE', 30),
+            self.max_backoff or getattr(settings, 'NOTIFICATION_RELAY_MAX_BACKOFF', 60),
+        )
+
+    async def subscribe(self, user_id, token):
+        """Register one local socket of ``user_id``; returns the group to join"""
+        user_id = str(user_id)
+        subscription = self._subscriptions.get(user_id)
+        if subscription is None:
+            subscription = self._subscriptions[user_id] = _Subscription(token)
+            subscription.task = asyncio.ensure_future(self._run(user_id, subscription))
+            logger.info(f"Notification relay: opening upstream socket for user {user_id}")
+        elif token:
+            # The newest token is used for the next reconnect
+            subscription.token = token
+        subscription.refs += 1
+        if subscription.closing is not None:
+            subscription.closing.cancel()
+            subscription.closing = None
+        return user_group(user_id)
+
+    async def unsubscribe(self, user_id):
+        """Release one local socket; the upstream one closes after the grace period"""
+        user_id = str(user_id)
+        subscription = self._subscriptions.get(user_id)
+        if subscription is None:
+            return
+        subscription.refs = max(subscription.refs - 1, 0)
+        if subscription.refs == 0 and subscription.closing is None:
+            _, grace, _ = self._settings()
+            subscription.closing = asyncio.get_running_loop().call_later(grace, self._close, user_id, subscription)
+
+    def _close(self, user_id, subscription):
+        if subscription.refs:
+            return
+        subscription.task.cancel()
+        if self._subscriptions.get(user_id) is subscription:
+            del self._subscriptions[user_id]
+        logger.info(f"Notification relay: closed upstream socket for user {user_id}")
+
+    async def close(self):
+        """Close every upstream socket (worker shutdown)"""
+        for user_id, subscription in list(self._subscriptions.items()):
+            if subscription.closing is not None:
+                subscription.closing.cancel()
+            subscription.refs = 0
+            self._close(user_id, subscription)
+
+    def stats(self):
+        return {
+            'upstream_sockets': len(self._subscriptions),
+            'local_sockets': sum(s.refs for s in self._subscriptions.values()),
+        }
+
+    async def _run(self, user_id, subscription):
+        url, _, max_backoff = self._settings()
+        connect = self._connect
+        if connect is None:
+            import websockets
+            connect = websockets.connect
+        backoff = 1
+        while True:
+            try:
+                async with connect(f"{url}?token={quote(subscription.token or '')}") as socket:
+                    backoff = 1
+                    async for raw in socket:
+                        await self._forward(user_id, raw)
+                logger.warning(f"Notification relay: upstream socket for user {user_id} closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification relay: upstream socket for user {user_id} failed: {str(e)}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+    async def _forward(self, user_id, raw):
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning(f"Notification relay: dropped non-JSON message for user {user_id}")
+            return
+        if not await self.claim(f"notifications:seen:{user_id}:{message_id(raw, message)}"):
+            return
+        await self.channel_layer.group_send(user_group(user_id), {'type': MESSAGE_TYPE, 'message': message})
+
+    async def claim(self, key):
+        """True for the first relay (in any worker) to claim ``key`` within ``SEEN_TTL``"""
+        layer = self.channel_layer
+        if hasattr(layer, 'connection') and hasattr(layer, 'consistent_hash'):
+            # channels_redis: the Redis every worker already shares
+            redis = layer.connection(layer.consistent_hash(key))
+            return bool(await redis.set(key, 1, nx=True, ex=SEEN_TTL))
+
+        now = time.monotonic()
+        if len(self._claimed) > 1000:
+            self._claimed = {k: expires for k, expires in self._claimed.items() if expires > now}
+        if self._claimed.get(key, 0) > now:
+            return False
+        self._claimed[key] = now + SEEN_TTL
+        return True
+
+
+#: The process-wide relay used by notification consumers
+relay = UpstreamRelay()
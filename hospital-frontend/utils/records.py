@@ -0,0 +1,287 @@
+"""
+Compact record types for API Gateway rows
+
+The gateway returns appointments, patients and prescriptions as nested dicts.
+Calendar and list pages keep thousands of them alive per request and used to
+mutate them in place (``appointment['scheduled_date'] = datetime...``).  The
+classes below are ``__slots__`` based: each row is decoded once, snake_case and
+camelCase keys are normalized up front, and derived values (parsed datetimes,
+age, display name) are computed lazily and cached on the instance.
+
+Templates keep working unchanged: camelCase names such as ``patient.fullName``
+resolve to the normalized attribute, and ``record.get(key)`` mirrors ``dict.get``
+for view code that still expects dicts.
+"""
+
+import sys
+
+import orjson
+
+from utils import dates
+
+_MISSING = object()
+
+
+def _slots(fields, datetime_fields=(), extra=()):
+    """Build the ``__slots__`` tuple for a record class"""
+    slots = [attr for attr, _ in fields]
+    for attr, _ in datetime_fields:
+        slots.append(f'{attr}_raw')
+        slots.append(f'_{attr}')
+    return tuple(slots) + tuple(extra)
+
+
+def _compile_decoder(cls):
+    """
+    Generate a straight-line ``from_dict`` for ``cls``
+
+    Looping over the field spec with ``setattr`` costs more than the JSON
+    decode itself on a 2000-row month, so (like dataclasses) the decoder is
+    compiled once per class into plain attribute stores.
+    """
+    lines = ['def from_dict(cls, data):', '    record = new(cls)', '    get = data.get']
+
+    def load(target, attr, camel, interned=False):
+        lines.append(f'    value = get({attr!r})')
+        if camel != attr:
+            lines.append(f'    if value is None: value = get({camel!r})')
+        if interned:
+            lines.append('    if value.__class__ is str: value = intern(value)')
+        lines.append(f'    record.{target} = value')
+
+    for attr, camel in cls.FIELDS:
+        load(attr, attr, camel, attr in cls.INTERNED)
+    for attr, camel in cls.DATETIME_FIELDS:
+        load(f'{attr}_raw', attr, camel)
+        lines.append(f'    record._{attr} = MISSING')
+    for slot in cls.LAZY_SLOTS:
+        lines.append(f'    record.{slot} = MISSING')
+    for slot in cls.DISPLAY_SLOTS:
+        lines.append(f'    record.{slot} = None')
+    lines.append('    return record')
+
+    namespace = {'new': object.__new__, 'intern': sys.intern, 'MISSING': _MISSING}
+    exec('\n'.join(lines), namespace)
+    decoder = namespace['from_dict']
+    decoder.__qualname__ = f'{cls.__name__}.from_dict'
+    decoder.__doc__ = 'Decode one row, accepting either snake_case or camelCase keys'
+    return decoder
+
+
+class LazyDateTime:
+    """Descriptor parsing an ISO string slot on first access and caching the result"""
+
+    def __init__(self, name):
+        self.name = name
+        self.raw = f'{name}_raw'
+        self.cache = f'_{name}'
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.cache)
+        if value is _MISSING:
+            value = dates.parse_datetime(getattr(obj, self.raw))
+            setattr(obj, self.cache, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.raw, value)
+        setattr(obj, self.cache, _MISSING)
+
+
+class Record:
+    """
+    Base class for slot-based gateway records
+
+    Each subclass gets a ``from_dict(data)`` classmethod compiled from its
+    field tables when it is defined.
+    """
+
+    __slots__ = ()
+
+    #: ``(attribute, camelCaseKey)`` pairs copied verbatim from the payload
+    FIELDS = ()
+    #: ``(attribute, camelCaseKey)`` pairs holding ISO strings parsed on first access
+    DATETIME_FIELDS = ()
+    #: Extra slots initialised to ``_MISSING`` and filled by lazy properties
+    LAZY_SLOTS = ()
+    #: Extra slots initialised to ``None`` and filled by ``utils.presentation``
+    DISPLAY_SLOTS = ()
+
+    #: Low-cardinality attributes (status, type...) whose strings are interned
+    INTERNED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        aliases = {}
+        for attr, camel in cls.FIELDS + cls.DATETIME_FIELDS:
+            aliases[attr] = attr
+            aliases[camel] = attr
+        cls._aliases = aliases
+        for attr, _ in cls.DATETIME_FIELDS:
+            setattr(cls, attr, LazyDateTime(attr))
+        cls.from_dict = classmethod(_compile_decoder(cls))
+
+    @classmethod
+    def from_list(cls, rows):
+        """Decode a list of rows, skipping anything that is not a dict"""
+        from_dict = cls.from_dict
+        return [from_dict(row) for row in rows or () if isinstance(row, dict)]
+
+    @classmethod
+    def decode_page(cls, payload, key):
+        """
+        Decode a paginated gateway response into ``(records, pagination)``
+
+        ``payload`` may be the raw JSON body (bytes/str) or an already decoded
+        response dict of the form ``{'data': {key: [...], 'pagination': {...}}}``.
+        """
+        if isinstance(payload, (bytes, bytearray, memoryview, str)):
+            payload = orjson.loads(payload)
+        data = payload.get('data') or {}
+        return cls.from_list(data.get(key)), data.get('pagination') or {}
+
+    def __getattr__(self, name):
+        # Only reached when normal lookup fails, i.e. for camelCase aliases
+        attr = type(self)._aliases.get(name)
+        if attr is None or attr == name:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return getattr(self, attr)
+
+    def get(self, key, default=None):
+        """``dict.get`` compatible accessor"""
+        value = getattr(self, self._aliases.get(key, key), None)
+        return default if value is None else value
+
+    def to_dict(self):
+        """Serialize back to a plain dict with the original ISO strings"""
+        data = {attr: getattr(self, attr) for attr, _ in self.FIELDS}
+        for attr, _ in self.DATETIME_FIELDS:
+            data[attr] = getattr(self, f'{attr}_raw')
+        return data
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {getattr(self, 'id', None)}>"
+
+
+class AppointmentRecord(Record):
+    """Appointment row from appointment-service"""
+
+    FIELDS = (
+        ('id', 'id'),
+        ('appointment_number', 'appointmentNumber'),
+        ('patient_id', 'patientId'),
+        ('patient_name', 'patientName'),
+        ('patient_phone', 'patientPhone'),
+        ('doctor_id', 'doctorId'),
+        ('doctor_name', 'doctorName'),
+        ('doctor_specialization', 'doctorSpecialization'),
+        ('appointment_type', 'appointmentType'),
+        ('duration_minutes', 'durationMinutes'),
+        ('status', 'status'),
+        ('priority', 'priority'),
+        ('reason', 'reason'),
+        ('symptoms', 'symptoms'),
+        ('notes', 'notes'),
+        ('doctor_notes', 'doctorNotes'),
+        ('fee', 'fee'),
+    )
+    INTERNED = ('doctor_id', 'doctor_name', 'doctor_specialization', 'appointment_type', 'status', 'priority')
+    DATETIME_FIELDS = (
+        ('scheduled_date', 'scheduledDate'),
+        ('created_at', 'createdAt'),
+        ('updated_at', 'updatedAt'),
+        ('confirmed_at', 'confirmedAt'),
+        ('completed_at', 'completedAt'),
+    )
+    __slots__ = _slots(FIELDS, DATETIME_FIELDS)
+
+    @property
+    def date_key(self):
+        """``YYYY-MM-DD`` of the scheduled date, used to group calendar cells"""
+        raw = self.scheduled_date_raw
+        if isinstance(raw, str) and len(raw) >= 10 and raw[4] == '-' and raw[7] == '-':
+            # Dates are local wall-clock values, so the prefix is the calendar day
+            return raw[:10]
+        scheduled = self.scheduled_date
+        return scheduled.strftime('%Y-%m-%d') if scheduled else None
+
+
+class PatientRecord(Record):
+    """Patient row from patient-service"""
+
+    FIELDS = (
+        ('id', 'id'),
+        ('patient_code', 'patientCode'),
+        ('full_name', 'fullName'),
+        ('date_of_birth', 'dateOfBirth'),
+        ('gender', 'gender'),
+        ('phone', 'phone'),
+        ('email', 'email'),
+        ('address', 'address'),
+        ('blood_type', 'bloodType'),
+        ('allergies', 'allergies'),
+        ('medical_history', 'medicalHistory'),
+        ('emergency_contact', 'emergencyContact'),
+        ('created_at', 'createdAt'),
+        ('updated_at', 'updatedAt'),
+    )
+    INTERNED = ('gender', 'blood_type')
+    LAZY_SLOTS = ('_age',)
+    DISPLAY_SLOTS = (
+        'dob_display',
+        'created_display',
+        'phone_display',
+        'address_display',
+        'blood_type_class',
+        'gender_icon',
+    )
+    __slots__ = _slots(FIELDS, extra=LAZY_SLOTS + DISPLAY_SLOTS)
+
+    @property
+    def age(self):
+        """Age in whole years from ``date_of_birth``, or ``None``"""
+        if self._age is _MISSING:
+            self._age = dates.calculate_age(self.date_of_birth)
+        return self._age
+
+    # Templates written against the old dicts read ``calculated_age``
+    calculated_age = age
+
+    @property
+    def display_name(self):
+        return self.full_name or self.patient_code or f"Patient {str(self.id)[:8]}"
+
+
+class PrescriptionRecord(Record):
+    """Prescription row from prescription-service"""
+
+    FIELDS = (
+        ('id', 'id'),
+        ('prescription_number', 'prescriptionNumber'),
+        ('patient_id', 'patientId'),
+        ('patient_name', 'patientName'),
+        ('patient_age', 'patientAge'),
+        ('doctor_id', 'doctorId'),
+        ('doctor_name', 'doctorName'),
+        ('appointment_id', 'appointmentId'),
+        ('diagnosis', 'diagnosis'),
+        ('instructions', 'instructions'),
+        ('notes', 'notes'),
+        ('status', 'status'),
+        ('issued_date', 'issuedDate'),
+        ('valid_until', 'validUntil'),
+        ('dispensed_date', 'dispensedDate'),
+        ('total_amount', 'totalAmount'),
+        ('currency', 'currency'),
+        ('items', 'items'),
+        ('created_at', 'createdAt'),
+        ('updated_at', 'updatedAt'),
+    )
+    INTERNED = ('doctor_id', 'doctor_name', 'status', 'currency')
+    __slots__ = _slots(FIELDS)
+
+    @property
+    def item_count(self):
+        return len(self.items or ())
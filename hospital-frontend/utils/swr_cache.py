@@ -0,0 +1,151 @@
+"""
+Stale-while-revalidate cache for slow-moving gateway aggregates
+
+Analytics dashboards used to call analytics-service synchronously on every
+page load although the aggregates only change every few minutes.  Entries
+here are served straight from the Django cache; once an entry is older than
+``fresh_for`` it is still served, and a background thread refreshes it for the
+next request.  Only when nothing is cached (or the entry is older than
+``max_age``) does the caller wait for the upstream call.
+
+Every entry carries the time it was fetched and an ETag of its payload so
+views can answer conditional requests with 304 and show "as of HH:MM".
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import orjson
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResult:
+    """A payload together with its fetch time and ETag"""
+
+    __slots__ = ('data', 'fetched_at', 'etag', 'stale')
+
+    def __init__(self, data, fetched_at, etag, stale=False):
+        self.data = data
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.stale = stale
+
+    @property
+    def age(self):
+        """Seconds since the payload was fetched upstream"""
+        return max(0.0, time.time() - self.fetched_at)
+
+    @property
+    def as_of(self):
+        """Fetch time as an aware ``datetime`` (rendered with the local time zone)"""
+        return datetime.fromtimestamp(self.fetched_at, tz=timezone.utc)
+
+
+def compute_etag(data):
+    """Strong ETag of a JSON-serialisable payload"""
+    body = orjson.dumps(data, option=orjson.OPT_SORT_KEYS, default=str)
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """True if the request's ``If-None-Match`` header names ``etag``"""
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache wrapper implementing stale-while-revalidate over ``django.core.cache``
+
+    ``loader`` callables return gateway responses; only ``success`` responses
+    are stored, so an upstream failure never replaces good data.
+    """
+
+    def __init__(self, prefix, fresh_for=60, max_age=3600, backend=None):
+        self.prefix = prefix
+        self.fresh_for = fresh_for
+        self.max_age = max_age
+        self.backend = backend or cache
+
+    @property
+    def _generation_key(self):
+        return f'{self.prefix}:generation'
+
+    def make_key(self, *parts):
+        # The generation lets invalidate_all() drop every key without listing them
+        generation = self.backend.get(self._generation_key, 0)
+        return ':'.join([self.prefix, f'g{generation}'] + [str(part) for part in parts if part is not None])
+
+    def get(self, key, loader):
+        """
+        Return a ``CachedResult`` for ``key``, loading synchronously on a miss
+
+        A failed synchronous load is returned with ``etag=None`` and not cached.
+        """
+        entry = self.backend.get(key)
+        if entry is not None:
+            age = time.time() - entry['fetched_at']
+            if age < self.max_age:
+                stale = age >= self.fresh_for
+                if stale:
+                    self._refresh_in_background(key, loader)
+                return CachedResult(entry['data'], entry['fetched_at'], entry['etag'], stale)
+        return self._load(key, loader)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def invalidate_all(self):
+        """Forget every entry made with ``make_key`` (old entries simply expire)"""
+        try:
+            self.backend.incr(self._generation_key)
+        except ValueError:
+            self.backend.set(self._generation_key, 1, None)
+
+    def _store(self, key, data):
+        entry = {'data': data, 'fetched_at': time.time(), 'etag': compute_etag(data)}
+        self.backend.set(key, entry, self.max_age)
+        return entry
+
+    def _load(self, key, loader):
+        data = loader()
+        # Stale copies served during an outage (utils.degraded) are not stored
+        if not isinstance(data, dict) or not data.get('success') or data.get('stale'):
+            return CachedResult(data, time.time(), None)
+        entry = self._store(key, data)
+        return CachedResult(data, entry['fetched_at'], entry['etag'])
+
+    def _refresh_in_background(self, key, loader):
+        # cache.add is atomic, so only one request per key starts a refresh
+        lock_key = f'{key}:refreshing'
+        if not self.backend.add(lock_key, True, self.fresh_for):
+            return
+
+        def refresh():
+            try:
+                data = loader()
+                if isinstance(data, dict) and data.get('success') and not data.get('stale'):
+                    self._store(key, data)
+                else:
+                    logger.warning(f"Background refresh of {key} failed: {(data or {}).get('message', 'Unknown error')}")
+            except Exception as e:
+                logger.error(f"Background refresh of {key} failed: {str(e)}")
+            finally:
+                self.backend.delete(lock_key)
+
+        threading.Thread(target=refresh, name=f'swr-{key}', daemon=True).start()
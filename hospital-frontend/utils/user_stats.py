@@ -0,0 +1,135 @@
+"""
+Streaming user statistics for the admin analytics page
+
+UserAnalyticsView used to download ``get_users(limit=1000)`` on every view,
+count roles with one list comprehension per role and show hardcoded numbers
+for registrations.  ``UserStatsAggregator`` instead walks every page of the
+user list once, folding each page into running totals with pandas, so memory
+stays bounded by the page size rather than the user table.  The finished
+statistics are kept in the Django cache for ``USER_STATS_CACHE_TTL`` seconds.
+"""
+
+import logging
+from collections import Counter
+from datetime import date, timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from utils.api_client import api_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'analytics:user_stats'
+PAGE_SIZE = 500
+MONTHS_SHOWN = 6
+ROLES = ('admin', 'doctor', 'nurse', 'staff', 'patient')
+
+
+class UserStatsAggregator:
+    """Single-pass accumulator over pages of user dicts"""
+
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.roles = Counter({role: 0 for role in ROLES})
+        # Registrations per calendar day; bounded by the age of the system
+        self.daily = Counter()
+
+    def add_page(self, users):
+        """Fold one page of users into the running totals"""
+        if not users:
+            return
+        # Timestamps are local wall-clock values, so the date prefix is the day
+        frame = pd.DataFrame.from_records(
+            [(user.get('role'), bool(user.get('isActive')), _day_prefix(user.get('createdAt'))) for user in users],
+            columns=('role', 'active', 'created'),
+        )
+        self.total += len(frame)
+        self.active += int(frame['active'].sum())
+        self.roles.update(frame['role'].dropna().value_counts().to_dict())
+
+        created = pd.to_datetime(frame['created'], format='%Y-%m-%d', errors='coerce')
+        days = created.dropna().dt.date.value_counts()
+        self.daily.update(days.to_dict())
+
+    def result(self, today=None):
+        """Statistics in the shape of the ``users/analytics.html`` context"""
+        today = today or timezone.localdate()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+
+        months = []
+        year, month = today.year, today.month
+        for _ in range(MONTHS_SHOWN):
+            months.append((year, month))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        months.reverse()
+        monthly = Counter()
+        for day, count in self.daily.items():
+            monthly[(day.year, day.month)] += count
+
+        active_percentage = (self.active / self.total * 100) if self.total else 0
+        return {
+            'total_users': self.total,
+            'active_users': self.active,
+            'inactive_users': self.total - self.active,
+            'active_percentage': round(active_percentage, 1),
+            'role_stats': dict(self.roles),
+            'monthly_registrations': [monthly[key] for key in months],
+            'months_labels': [date(year, month, 1).strftime('%b') for year, month in months],
+            'new_users_this_month': sum(c for d, c in self.daily.items() if month_start <= d <= today),
+            'users_this_week': sum(c for d, c in self.daily.items() if week_start <= d <= today),
+            'users_today': self.daily.get(today, 0),
+            'last_user_created': _describe_day(max(self.daily) if self.daily else None, today),
+        }
+
+
+def _day_prefix(value):
+    return value[:10] if isinstance(value, str) else None
+
+
+def _describe_day(day, today):
+    if day is None:
+        return 'N/A'
+    if day == today:
+        return 'Today'
+    if day == today - timedelta(days=1):
+        return 'Yesterday'
+    return day.strftime('%b %d, %Y')
+
+
+def collect_user_stats(token, page_size=PAGE_SIZE, today=None):
+    """
+    Walk every page of the user list and aggregate it
+
+    Returns ``None`` if any page fails so partial totals are never cached.
+    """
+    aggregator = UserStatsAggregator()
+    page = 1
+    while True:
+        response = api_client.get_users(token=token, page=page, limit=page_size)
+        if not response.get('success'):
+            logger.error(f"User stats aborted on page {page}: {response.get('message', 'Unknown error')}")
+            return None
+        data = response.get('data', {})
+        users = data.get('users', [])
+        aggregator.add_page(users)
+
+        total_pages = (data.get('pagination') or {}).get('totalPages')
+        if not users or (page >= total_pages if total_pages else len(users) < page_size):
+            break
+        page += 1
+    return aggregator.result(today)
+
+
+def get_user_stats(token, refresh=False):
+    """Cached user statistics, recomputed at most once per ``USER_STATS_CACHE_TTL``"""
+    stats = None if refresh else cache.get(CACHE_KEY)
+    if stats is None:
+        stats = collect_user_stats(token)
+        if stats is not None:
+            cache.set(CACHE_KEY, stats, getattr(settings, 'USER_STATS_CACHE_TTL', 300))
+    return stats